@@ -6,6 +6,8 @@ Single block from the blockchain.
 
 """
 from blockchain.hashing.sha2 import SHA256
+from blockchain.mining import BlockMiner, BATCH_SIZE
+from blockchain.merkle import MerkleTree
 from blockchain.digital_signature.ecc import ECC, secp256k1
 from models.mining_criterion import MiningCriterion
 
@@ -13,16 +15,25 @@ import random
 import json
 from datetime import datetime
 from typing import Callable, Optional, List, Dict, Tuple
-from configs import logger
+from configs import configs, logger
 
 class Transaction:
-    def __init__(self, sender: str, receiver: str, amount: int, signature = None):#, logger=logger):
-        self.sender = sender # Sender name
-        self.receiver = receiver # Receiver name
-        self.amount = amount
+    """
+        A transfer between two users.
+
+        The hashed fields (sender, receiver, amount) are behind properties: the canonical serialization and the hash are 
+        computed once and cached, setting a field invalidates the cache. The signature is not hashed, so it can change freely.
+    """
+    __slots__ = ("_sender", "_receiver", "_amount", "signature", "_canonical_json", "_hash")
+
+    def __init__(self, sender: str, receiver: str, amount: int, signature = None):
+        self._sender = sender # Sender name
+        self._receiver = receiver # Receiver name
+        self._amount = amount
         self.signature = signature # Signed by the sender
 
-        #self.logger = logger
+        self._canonical_json: Optional[str] = None
+        self._hash: Optional[int] = None
 
     @classmethod
     def load_from_dict(cls, data: dict):
@@ -32,20 +43,72 @@ class Transaction:
             amount=data.get("amount"),
             signature=data.get("signature")
         )
-        
 
-    def hash_transaction(self) -> str:
+    def _invalidate(self):
+        self._canonical_json = None
+        self._hash = None
+
+    @property
+    def sender(self) -> str:
+        return self._sender
+    
+    @sender.setter
+    def sender(self, value: str):
+        self._sender = value
+        self._invalidate()
+
+    @property
+    def receiver(self) -> str:
+        return self._receiver
+    
+    @receiver.setter
+    def receiver(self, value: str):
+        self._receiver = value
+        self._invalidate()
+
+    @property
+    def amount(self) -> int:
+        return self._amount
+    
+    @amount.setter
+    def amount(self, value: int):
+        self._amount = value
+        self._invalidate()
+
+    def canonical_json(self) -> str:
+        """Canonical json serialization of the hashed fields (sorted keys, no whitespace), for consistant hashes."""
+        if self._canonical_json is None:
+            tx_data = {
+                "sender": self._sender,
+                "receiver": self._receiver,
+                "amount": int(self._amount)
+            }
+            self._canonical_json = json.dumps(tx_data, separators=(",", ":"), sort_keys=True)
+        return self._canonical_json
+
+    def hash_transaction(self) -> int:
         """Return the hash of the transaction."""
-        tx_data = {
-            "sender": self.sender,
-            "receiver": self.receiver,
-            "amount": int(self.amount)
-        }
-        # Canonical json serialization for consistant hashes:
-        json_data = json.dumps(tx_data, separators=(",", ":"), sort_keys=True)
-        #self.logger.info(f"Canonical JSON (backend): {json_data}")
-        #self.logger.info(f"Hash (backend): {SHA256.digest(json_data)}")
-        return int(SHA256.digest(json_data), 16)
+        if self._hash is None:
+            self._hash = int(SHA256.hexdigest(self.canonical_json().encode('utf-8')), 16)
+        return self._hash
+
+    @staticmethod
+    def hash_many(transactions: List["Transaction"]) -> List[int]:
+        """The hashes of many transactions, the ones not cached yet are computed in one batch (see SHA256.digest_many)."""
+        missing = [tx for tx in transactions if tx._hash is None]
+        for tx, digest in zip(missing, SHA256.digest_many(tx.canonical_json() for tx in missing)):
+            tx._hash = int(digest, 16)
+        return [tx._hash for tx in transactions]
+
+    def replay_key(self) -> Tuple[int, int]:
+        """
+            Identifies a signed transaction: the hash and the r part of the signature.
+            NOTE: the hash alone isn't unique (repeated payments of the same amount), and s is malleable ((r, n - s) is valid too).
+        """
+        return (self.hash_transaction(), int(self.signature[0]) if self.signature else 0)
+
+    def __repr__(self) -> str:
+        return f"Transaction(sender={self._sender!r}, receiver={self._receiver!r}, amount={self._amount!r})"
 
     def sign(self, private_key: int, curve: ECC = secp256k1):
         """Sign the transaction."""
@@ -62,33 +125,33 @@ class Transaction:
         if s == 0:
             raise ValueError("Invalid s value, retry signing")
         
+        # NOTE: (r, n - s) is also a valid signature, belonging to -R, choose the one with even R.y,
+        # so R can be recovered from r unambiguously (required for batch verification, see ECC.verify_batch)
+        if R[1] % 2 == 1:
+            s = curve.n - s
         self.signature = (r, s)
 
     def verify(self, public_key, curve: ECC = secp256k1) -> bool:
         """Verify the signature of the transaction."""
         if self.signature is None:
-            self.logger.error("Signature is None")
+            logger.error("Signature is None")
             return False
         
-        r, s = self.signature
-        r = int(r)
-        s = int(s)
         h = self.hash_transaction() % curve.n
-        if not (1 <= r < curve.n and 1 <= s < curve.n):
-            return False
-        
-        s_inv = pow(s, -1, curve.n)
-        u1 = (h * s_inv) % curve.n
-        u2 = (r * s_inv) % curve.n
-
-        # Compute P = u1*G + u2*Q
-        P = curve.add_points(
-            curve.scalar_multiply(u1, curve.G),
-            curve.scalar_multiply(u2, public_key)
-        )
-        #self.logger.info(f"r = {r}, s = {s}, h = {h}")
-        #self.logger.info(f"P = {P[0] % curve.n}")
-        return P[0] % curve.n == r  # Check if x-coord matches r
+        return curve.verify(h, self.signature, public_key)
+
+    @staticmethod
+    def verify_batch(transactions: List["Transaction"], public_keys: List[Tuple[int, int]], curve: ECC = secp256k1) -> List[bool]:
+        """
+            Verify the signatures of many transactions together (see ECC.verify_batch).
+
+            :param public_keys: The public key of each transaction's sender (None if unknown), in the same order.
+            :return: The verification result of each transaction.
+        """
+        return curve.verify_batch([
+            (tx.hash_transaction() % curve.n, tx.signature, public_key) 
+            for tx, public_key in zip(transactions, public_keys)
+        ])
     
     def json_serialize(self):
         return {
@@ -98,9 +161,13 @@ class Transaction:
             "signature": self.signature
         }
 
+# Block hash formats:
+BLOCK_VERSION_LEGACY = 1 # SHA256(previous_hash + timestamp + every transaction hash + nonce)
+BLOCK_VERSION_MERKLE = 2 # SHA256(previous_hash + timestamp + merkle root + nonce)
+
 class Block:
     # NOTE: add the ability to change the hashing logic (e.g. SHA-256, SHA-3, simple XOR based etc.) in the future
-    __slots__ = ("_index", "_previous_hash", "_data", "_timestamp", "_nonce", "_hash", "_canonical_hash","_criterion", "is_signed", "signed_by", "finalized")
+    __slots__ = ("_index", "_previous_hash", "_data", "_timestamp", "_nonce", "_hash", "_canonical_hash","_criterion", "_version", "_merkle_tree", "is_signed", "signed_by", "finalized")
     
     def __init__(
             self, 
@@ -109,11 +176,14 @@ class Block:
             data: List[Transaction], 
             criterion: MiningCriterion,
             timestamp: str = None, 
-            nonce: int = 0
+            nonce: int = 0,
+            version: int = None
         ):
         self._index = index
         self._previous_hash = previous_hash
         self._data = data
+        self._version = version if version is not None else configs.BLOCK_VERSION
+        self._merkle_tree: Optional[MerkleTree] = None # built on first use
         self._timestamp = timestamp if timestamp is not None else str(datetime.now().timestamp())
         self._nonce = nonce
         self._hash = self.compute_hash()
@@ -129,26 +199,39 @@ class Block:
     def load_from_dict(cls, data: dict):
         transactions = [Transaction.load_from_dict(tx) for tx in data["transactions"]]
         # NOTE: having a proper hash will be checked upon validating the chain
+        # NOTE: blocks stored before the versioning have no version field, they are validated with the legacy hash
         block = cls(
             index=data["id"],
             previous_hash=data["previous_hash"],
             data=transactions,
             criterion=MiningCriterion.from_dict(data["criterion"]),
             timestamp=data["timestamp"],
-            nonce=data["nonce"]
+            nonce=data["nonce"],
+            version=data.get("version", BLOCK_VERSION_LEGACY)
         )
         block.finalized = data["finalized"]
         return block
 
+    def hash_prefix(self) -> str:
+        """The nonce independent part of the hashed block content."""
+        if self._version == BLOCK_VERSION_LEGACY:
+            transaction_hashes = "".join(hex(d.hash_transaction())[2:] for d in self._data)
+            return f"{self._previous_hash}{self._timestamp}{transaction_hashes}"
+        if self._version == BLOCK_VERSION_MERKLE:
+            return f"{self._previous_hash}{self._timestamp}{self.merkle_root}"
+        raise ValueError(f"Unknown block version: {self._version}")
+
+    def hash_message(self) -> str:
+        """The hashed block content."""
+        return f"{self.hash_prefix()}{self._nonce}"
+
     def compute_hash(self) -> str:
         """Compute the block's hash based on its contents."""
-        transaction_hashes = "".join(hex(d.hash_transaction())[2:] for d in self._data)
-        return SHA256.digest(f"{self._previous_hash}{self._timestamp}{transaction_hashes}{self._nonce}")
+        return SHA256.digest(self.hash_message())
     
     def compute_canonical_hash(self) -> str:
         """Compute the canonical hash of the block."""
-        transaction_hashes = "".join(hex(d.hash_transaction())[2:] for d in self._data)
-        return SHA256.digest(f"{self._previous_hash}{self._timestamp}{transaction_hashes}")
+        return SHA256.digest(self.hash_prefix())
            
     @property
     def index(self) -> int:
@@ -173,10 +256,48 @@ class Block:
     @property
     def data(self) -> str:
         return self._data
+
+    @data.setter
+    def data(self, value: List[Transaction]):
+        self._data = value
+        self._merkle_tree = None
+        self._hash = self.compute_hash()
+        self._canonical_hash = self.compute_canonical_hash()
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    @version.setter
+    def version(self, value: int):
+        self._version = value
+        self._merkle_tree = None
+        self._hash = self.compute_hash()
+        self._canonical_hash = self.compute_canonical_hash()
+
+    @property
+    def merkle_tree(self) -> MerkleTree:
+        # NOTE: built once, reset when data is assigned. A transaction modified in place isn't tracked, 
+        # the audit rebuilds the blocks from their serialized fields (see Blockchain.validate_chain).
+        if self._merkle_tree is None:
+            self._merkle_tree = MerkleTree([tx.hash_transaction().to_bytes(32, "big") for tx in self._data])
+        return self._merkle_tree
+
+    @property
+    def merkle_root(self) -> str:
+        return self.merkle_tree.root_hex
+
+    def transaction_proof(self, position: int) -> List[Tuple[str, str]]:
+        """Inclusion proof of the transaction at the given position, verifiable against merkle_root (see MerkleTree.verify_proof)."""
+        return self.merkle_tree.proof(position)
     
     @property
     def criterion(self) -> MiningCriterion:
         return self._criterion
+
+    @criterion.setter
+    def criterion(self, value: MiningCriterion):
+        self._criterion = value # NOTE: not hashed, the hashes stay valid
     
     @property
     def timestamp(self) -> str:
@@ -207,8 +328,10 @@ class Block:
     def json_serialize(self):
         return {
             "id": self.index,
+            "version": self.version,
             "previous_hash": self.previous_hash,
             "hash": self.hash,
+            "merkle_root": self.merkle_root,
             "timestamp": self.timestamp,
             "finalized": self.finalized,
             "nonce": self.nonce,
@@ -221,12 +344,11 @@ class Block:
     # Proof of Work:
     def mine(self, criteria: Callable[[str], bool], max_iterations: int = 1000) -> Optional[str]:
         """Perform Proof-of-Work mining until the criteria is met or max iterations is reached."""
-        iterations = 0
-        while not criteria(self._hash):
-            if iterations > max_iterations:
-                return None
-            self.nonce += 1 # this should update the hash through the setter for nonce
-            iterations += 1
+        # NOTE: the nonce search runs on the cached hash prefix (see BlockMiner), the nonce is only set once a solution is found.
+        result = BlockMiner(self).search(criteria, start_nonce=self._nonce, max_iterations=max_iterations + 1, batch_size=BATCH_SIZE)
+        if result is None:
+            return None
+        self.nonce = result[0] # this should update the hash through the setter for nonce
         self.finalized = True
         return self._hash
 
@@ -238,8 +360,7 @@ class Block:
             :param public_keys: Public key registry.
             :return: True if all transactions are valid, False otherwise.
         """
-        for tx in self._data:
-            signed_public_key = public_keys.get(self.signed_by)
-            if not signed_public_key or not tx.verify(signed_public_key):
-                return False
-        return True
\ No newline at end of file
+        signed_public_key = public_keys.get(self.signed_by)
+        if not signed_public_key:
+            return False
+        return all(Transaction.verify_batch(self._data, [signed_public_key] * len(self._data)))
@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+
+Append-only block store on segment files.
+
+Layout of the store folder:
+    - blocks_<n>.dat: segments of records, record = length (4 bytes) + CRC-32 (4 bytes) + compact JSON of the block,
+      with the hashes of its transactions (tx_hashes, so the chain index can be rebuilt without hashing, see ChainIndex)
+    - index.dat: one fixed size entry per block height: segment, offset, record length, block hash
+
+LazyChain exposes a store as the chain of a Blockchain, hydrating the blocks on demand.
+
+Usage (from the app folder):
+    python -m blockchain.block_store import <BLOCKCHAIN.json> <store folder>
+    python -m blockchain.block_store export <store folder> <BLOCKCHAIN.json>
+
+"""
+import argparse
+import json
+import mmap
+import os
+import struct
+import threading
+import zlib
+from pathlib import Path
+from collections import OrderedDict
+
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+from blockchain.block import Block, Transaction
+from configs import logger
+
+RECORD_HEADER = struct.Struct(">II") # payload length, CRC-32 of the payload
+INDEX_ENTRY = struct.Struct(">IQI32s") # segment, offset, record length (with the header), block hash
+SEGMENT_SIZE = 64 * 1024 * 1024 # a new segment is started once the current one would exceed this
+BLOCK_CACHE_SIZE = 1024 # hydrated blocks kept by a LazyChain
+
+class BlockStore:
+    """
+        Blocks are appended as they are accepted, so a crash loses at most the blocks that weren't synced yet
+        (see fsync_every). Any block can be read by height through the index, without parsing the others.
+    """
+    def __init__(self, path: str, fsync_every: int = 1, segment_size: int = SEGMENT_SIZE):
+        """
+            :param path: Folder of the store, created if missing.
+            :param fsync_every: fsync the files after every n-th appended block, 0: leave it to the OS.
+            :param segment_size: Maximal size of a segment file in bytes (a single larger record gets its own segment).
+        """
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.fsync_every = fsync_every
+        self.segment_size = segment_size
+        self._unsynced = 0
+
+        index_path = self.path / "index.dat"
+        index_path.touch()
+        self._index_file = open(index_path, "r+b")
+        self._index = bytearray(self._index_file.read()) # NOTE: the entries are unpacked on demand, a bytearray keeps the index compact
+        self._maps: Dict[int, mmap.mmap] = {} # read-only memory maps by segment
+        self._read_lock = threading.Lock() # NOTE: the blocks are also read from the threads serving the streaming endpoint
+        self._recover()
+
+        self._segment, self._segment_end = self._tail()
+        self._writer = open(self._segment_path(self._segment), "ab")
+
+    def _segment_path(self, segment: int) -> Path:
+        return self.path / f"blocks_{segment:05d}.dat"
+
+    def _entry(self, height: int) -> Tuple[int, int, int, bytes]:
+        return INDEX_ENTRY.unpack_from(self._index, height * INDEX_ENTRY.size)
+
+    def _tail(self) -> Tuple[int, int]:
+        """Segment and offset after the last indexed record."""
+        if not self._index:
+            return 0, 0
+        segment, offset, length, _ = self._entry(len(self) - 1)
+        return segment, offset + length
+
+    @staticmethod
+    def _read_record(f, offset: int) -> Optional[Tuple[bytes, int]]:
+        """The payload and the record length at the offset, None if the record is incomplete or corrupt."""
+        f.seek(offset)
+        header = f.read(RECORD_HEADER.size)
+        if len(header) < RECORD_HEADER.size:
+            return None
+        length, checksum = RECORD_HEADER.unpack(header)
+        payload = f.read(length)
+        if len(payload) < length or zlib.crc32(payload) != checksum:
+            return None
+        return payload, RECORD_HEADER.size + length
+
+    def _recover(self):
+        """
+            Bring the index and the segments back in sync after a crash:
+            drop index entries without a valid record, index the valid records written after the last entry
+            and truncate the torn tail of the segment.
+        """
+        index_length = len(self._index)
+        del self._index[len(self._index) // INDEX_ENTRY.size * INDEX_ENTRY.size:] # partially written entry
+
+        # NOTE: only the last entries are checked, the earlier ones were synced before these were written
+        while self._index:
+            segment, offset, length, _ = self._entry(len(self) - 1)
+            path = self._segment_path(segment)
+            if path.is_file():
+                with open(path, "rb") as f:
+                    record = self._read_record(f, offset)
+                if record is not None and record[1] == length:
+                    break
+            del self._index[-INDEX_ENTRY.size:]
+        segment, offset = self._tail()
+        new_entries = bytearray()
+        while self._segment_path(segment).is_file():
+            with open(self._segment_path(segment), "r+b") as f:
+                while (record := self._read_record(f, offset)) is not None:
+                    payload, length = record
+                    block_hash = bytes.fromhex(json.loads(payload)["hash"])
+                    new_entries += INDEX_ENTRY.pack(segment, offset, length, block_hash)
+                    offset += length
+                f.seek(0, os.SEEK_END)
+                if f.tell() > offset:
+                    logger.warning(f"Truncating the torn tail of {self._segment_path(segment).name} at {offset}")
+                    f.truncate(offset)
+            if not self._segment_path(segment + 1).is_file():
+                break
+            segment, offset = segment + 1, 0
+        self._index += new_entries
+
+        if len(self._index) != index_length or new_entries:
+            self._index_file.seek(0)
+            self._index_file.write(self._index)
+            self._index_file.truncate(len(self._index))
+            self._index_file.flush()
+            os.fsync(self._index_file.fileno())
+        self._index_file.seek(0, os.SEEK_END)
+
+    def __len__(self) -> int:
+        return len(self._index) // INDEX_ENTRY.size
+
+    def append(self, block: Block) -> int:
+        """Append a block, returns its height in the store."""
+        record = dict(block.json_serialize(), tx_hashes=[f"{tx_hash:064x}" for tx_hash in Transaction.hash_many(block.data)])
+        payload = json.dumps(record, separators=(",", ":")).encode("utf-8")
+        record = RECORD_HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+        if self._segment_end > 0 and self._segment_end + len(record) > self.segment_size:
+            self.sync()
+            self._writer.close()
+            self._segment, self._segment_end = self._segment + 1, 0
+            self._writer = open(self._segment_path(self._segment), "ab")
+
+        # NOTE: the record is written before its index entry, a crash in between is repaired by _recover
+        self._writer.write(record)
+        entry = INDEX_ENTRY.pack(self._segment, self._segment_end, len(record), bytes.fromhex(block.hash))
+        self._index_file.write(entry)
+        self._index += entry
+        self._segment_end += len(record)
+
+        self._unsynced += 1
+        if self.fsync_every and self._unsynced >= self.fsync_every:
+            self.sync()
+        else:
+            self._writer.flush()
+            self._index_file.flush()
+        return len(self) - 1
+
+    def sync(self):
+        """Flush and fsync the segment and the index."""
+        for f in (self._writer, self._index_file):
+            f.flush()
+            os.fsync(f.fileno())
+        self._unsynced = 0
+
+    def read_dict(self, height: int, tx_hashes: bool = False) -> dict:
+        """The stored (JSON) form of the block at the height, with the transaction hashes (tx_hashes) if requested."""
+        if not 0 <= height < len(self):
+            raise IndexError(f"No block at height {height}")
+        segment, offset, length, _ = self._entry(height)
+        with self._read_lock:
+            view = self._view(segment, offset + length)
+            payload_length, checksum = RECORD_HEADER.unpack_from(view, offset)
+            payload = view[offset + RECORD_HEADER.size:offset + length]
+        if RECORD_HEADER.size + payload_length != length or zlib.crc32(payload) != checksum:
+            raise ValueError(f"Corrupt record for block at height {height}")
+        block = json.loads(payload)
+        if not tx_hashes:
+            block.pop("tx_hashes", None)
+        return block
+
+    def _view(self, segment: int, end: int) -> mmap.mmap:
+        """Memory map of the segment, covering at least the first end bytes (the active segment is remapped as it grows)."""
+        view = self._maps.get(segment)
+        if view is None or len(view) < end:
+            if view is not None:
+                view.close()
+            if segment == self._segment:
+                self._writer.flush()
+            with open(self._segment_path(segment), "rb") as f:
+                view = self._maps[segment] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return view
+
+    def read(self, height: int) -> Block:
+        return Block.load_from_dict(self.read_dict(height))
+
+    def block_hash(self, height: int) -> str:
+        """Hash of the block at the height, from the index only."""
+        if not 0 <= height < len(self):
+            raise IndexError(f"No block at height {height}")
+        return self._entry(height)[3].hex()
+
+    def iter_dicts(self, tx_hashes: bool = False) -> Iterator[dict]:
+        """The stored blocks in order, reading the segments sequentially."""
+        for height in range(len(self)):
+            yield self.read_dict(height, tx_hashes)
+
+    def __iter__(self) -> Iterator[Block]:
+        return (Block.load_from_dict(d) for d in self.iter_dicts())
+
+    def close(self):
+        self.sync()
+        self._writer.close()
+        self._index_file.close()
+        for view in self._maps.values():
+            view.close()
+        self._maps.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # Conversion from/to the JSON format (see Blockchain.json_serialize):
+    def import_json(self, json_path: str) -> int:
+        """Append the blocks of a JSON chain file, returns the number of imported blocks."""
+        with open(json_path, "r", encoding='utf-8') as bf:
+            blocks = json.load(bf).get("blocks", [])
+        for d in blocks:
+            self.append(Block.load_from_dict(d))
+        self.sync()
+        return len(blocks)
+
+    def export_json(self, json_path: str):
+        """Write the stored chain in the JSON format, one block at a time."""
+        with open(json_path, "w", encoding='utf-8') as bf:
+            bf.write('{\n    "blocks": [')
+            for height, d in enumerate(self.iter_dicts()):
+                bf.write(",\n" if height else "\n")
+                bf.write(json.dumps(d, indent=4))
+            bf.write('\n    ]\n}\n')
+
+class LazyChain:
+    """
+        List-like view of the chain in a block store: only the store index is resident, the blocks are 
+        decoded on demand and the recently used ones are kept in a bounded LRU cache.
+        Supports len, indexing (also negative), slicing, iteration and append (which writes to the store).
+    """
+    def __init__(self, store: BlockStore, cache_size: int = BLOCK_CACHE_SIZE):
+        self.store = store
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[int, Block]" = OrderedDict() # hydrated blocks by height, least recently used first
+
+    def __len__(self) -> int:
+        return len(self.store)
+
+    def _hydrate(self, height: int) -> Block:
+        block = self._cache.get(height)
+        if block is not None:
+            self._cache.move_to_end(height)
+            return block
+        block = self.store.read(height)
+        self._remember(height, block)
+        return block
+
+    def _remember(self, height: int, block: Block):
+        if self.cache_size <= 0:
+            return
+        self._cache[height] = block
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def __getitem__(self, key: Union[int, slice]) -> Union[Block, List[Block]]:
+        if isinstance(key, slice):
+            # NOTE: slices (e.g. audit windows) are decoded without going through the cache, so they don't evict the hot blocks
+            return [self._cache.get(height) or self.store.read(height) for height in range(*key.indices(len(self)))]
+        height = key + len(self) if key < 0 else key
+        if not 0 <= height < len(self):
+            raise IndexError(f"No block at height {key}")
+        return self._hydrate(height)
+
+    def __iter__(self) -> Iterator[Block]:
+        for height in range(len(self)):
+            yield self._cache.get(height) or self.store.read(height)
+
+    def append(self, block: Block):
+        self._remember(self.store.append(block), block)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert between the JSON chain file and the block store.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    import_parser = subparsers.add_parser("import", help="Append the blocks of a JSON chain file to a store.")
+    import_parser.add_argument("json_path")
+    import_parser.add_argument("store_path")
+    export_parser = subparsers.add_parser("export", help="Write a store as a JSON chain file.")
+    export_parser.add_argument("store_path")
+    export_parser.add_argument("json_path")
+    args = parser.parse_args()
+
+    with BlockStore(args.store_path, fsync_every=0) as store:
+        if args.command == "import":
+            print(f"Imported {store.import_json(args.json_path)} blocks, {len(store)} in the store.")
+        else:
+            store.export_json(args.json_path)
+            print(f"Exported {len(store)} blocks.")
@@ -4,58 +4,258 @@
 
 The main blockchain class.
 
+Full audit of a stored chain (hashes, PoW and the signatures of the users in the user file), 
+without starting the server (from the app folder):
+    python -m blockchain.blockchain <store folder> [--users <USERS.json>] [--workers <n>]
+
 """
+import argparse
 import json
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
 
-from typing import List, Callable
+from typing import List, Optional, Dict, Tuple, Union, Iterator
 from models.mining_criterion import MiningCriterion
-from blockchain.block import Block
+from blockchain.block import Block, Transaction
+from blockchain.block_store import BlockStore, LazyChain, BLOCK_CACHE_SIZE
+from blockchain.chain_index import ChainIndex
 from configs import logger
 
+MIN_AUDIT_SHARD = 256 # blocks per task of the parallel audit (at least)
+AUDIT_WINDOW = 8192 # blocks read at once by validate_chain, bounds the memory of an audit
+
+def _verify_signatures(blocks: List[Block], public_keys: Optional[Dict[str, Tuple[int, int]]]) -> List[bool]:
+    """Check the transaction signatures of every block with the senders' public keys, in one batch (the senders without a key are skipped)."""
+    if public_keys is None:
+        return [True] * len(blocks)
+    checked = [[tx for tx in block.data if tx.sender in public_keys] for block in blocks]
+    transactions = [tx for block_transactions in checked for tx in block_transactions]
+    results = iter(Transaction.verify_batch(transactions, [public_keys[tx.sender] for tx in transactions]))
+    return [all([next(results) for _ in block_transactions]) for block_transactions in checked]
+
+def _audit_shard(payloads: List[dict], public_keys: Optional[Dict[str, Tuple[int, int]]]) -> List[Tuple[str, bool, bool]]:
+    """
+    Worker task: rebuild the blocks from their stored fields, recompute the hashes and check the signatures.
+    Returns (recomputed hash, Proof-of-Work valid, signatures valid) per block.
+    """
+    blocks = [Block.load_from_dict(payload) for payload in payloads] # NOTE: the constructor recomputes the hash
+    return [
+        (block.hash, block.criterion.check(block.hash), signatures_valid) 
+        for block, signatures_valid in zip(blocks, _verify_signatures(blocks, public_keys))
+    ]
+
 class Blockchain:
     def __init__(self, criterion: MiningCriterion):
-        self.chain: List[Block] = []
+        self.chain: Union[List[Block], LazyChain] = [] # in memory, or lazily loaded from the attached store
         self.criterion = criterion
+        self.validated_index = 0 # highest block index validated against its predecessors (the genesis block is trusted)
+        self.store: Optional[BlockStore] = None
+        self._index: Optional[ChainIndex] = ChainIndex() # block and transaction lookups, kept in sync by add_block, None: not built yet
+        self._index_lock = threading.Lock() # the index can be built in a thread (see build_index), while blocks are added
 
         self.create_genesis_block()
 
+    def attach_store(self, store: BlockStore, cache_size: int = BLOCK_CACHE_SIZE, trusted: bool = True):
+        """
+            Back the chain with the block store: the stored chain is used (or the current one is written into an empty store),
+            the blocks are decoded on demand (see LazyChain) and the accepted blocks are appended to the store.
+
+            :param trusted: The stored blocks were validated before they were appended (see add_block), the validated tip 
+                            is the stored tip. False for a store of unknown origin (e.g. imported), it is validated 
+                            on the first add_block (or with validate_chain).
+        """
+        if len(store):
+            # NOTE: a trusted tip avoids re-validating the whole stored chain on the first add_block
+            self.validated_index = len(store) - 1 if trusted else 0
+        else:
+            for block in self.chain:
+                store.append(block)
+        self.chain = LazyChain(store, cache_size=cache_size)
+        self.store = store
+        self._index = None # NOTE: built by build_index (in the background), so attaching doesn't read the whole store
+
     def load_from_json(self, json_path):
         with open(json_path, "r", encoding='utf-8') as bf:
             chain_dict = json.load(bf)
 
         self.chain = [Block.load_from_dict(d) for d in chain_dict.get("blocks")]
+        self.store = None # NOTE: the loaded chain replaces the stored one, it is kept in memory
+        self.validated_index = 0 # the loaded blocks are validated on the first add_block (or with validate_chain)
+        self._index = None
+
+    @property
+    def index(self) -> ChainIndex:
+        """The chain index, built on first use if it isn't built yet (blocking, see build_index)."""
+        return self._index if self._index is not None else self.build_index()
+
+    @property
+    def index_built(self) -> bool:
+        return self._index is not None
+
+    def build_index(self) -> ChainIndex:
+        """
+            Build the chain index (from the stored transaction hashes for a stored chain), can run in a thread:
+            the blocks are indexed without holding the lock, the ones added meanwhile (see add_block) in the next round, 
+            the index is published once it covers the whole chain.
+        """
+        index, built = ChainIndex(), 0
+        while True:
+            with self._index_lock:
+                if self._index is not None: # built by another caller meanwhile
+                    return self._index
+                stop = len(self.chain)
+                if built == stop:
+                    self._index = index
+                    return index
+            for height in range(built, stop):
+                if self.store is not None:
+                    index.add_serialized(height, self.store.read_dict(height, tx_hashes=True))
+                else:
+                    index.add_block(height, self.chain[height].hash, self.chain[height].data)
+            built = stop
 
     def create_genesis_block(self):
-        self.chain.append(Block(index=0, previous_hash="0", data=[], criterion=self.criterion)) # Genesis block
+        genesis = Block(index=0, previous_hash="0", data=[], criterion=self.criterion)
+        self.chain.append(genesis) # Genesis block
+        self.index.add_block(0, genesis.hash, genesis.data)
 
-    def validate_chain(self) -> bool:
-        """Validate the entire chain's integrity and Proof-of-Work."""
-        for i in range(1, len(self.chain)):
-            current_block = self.chain[i]
-            previous_block = self.chain[i-1]
-    
-            # Check previous hash linkage
-            if current_block.previous_hash != previous_block.hash:
-                logger.error(f"Invalid hash linkage at block {current_block.index}")
-                return False
-            
-            # Recompute the hash to validate PoW
-            if current_block.compute_hash() != current_block.hash:
-                logger.error(f"Invalid PoW at block {current_block.index}")
-                return False
-    
+    @staticmethod
+    def check_block(block: Block, previous_block: Block, recomputed_hash: str, signatures_valid: bool = True) -> bool:
+        """Check a single block against its predecessor: hash linkage, hash and Proof-of-Work (and the signatures, checked beforehand)."""
+        pow_valid = recomputed_hash == block.hash and block.criterion.check(recomputed_hash)
+        return Blockchain._check_fields(block.index, block.previous_hash, previous_block.hash, pow_valid, signatures_valid)
+
+    @staticmethod
+    def _check_fields(index: int, previous_hash: str, expected_previous_hash: str, pow_valid: bool, signatures_valid: bool) -> bool:
+        # Check previous hash linkage
+        if previous_hash != expected_previous_hash:
+            logger.error(f"Invalid hash linkage at block {index}")
+            return False
+
+        # The recomputed hash has to match and satisfy the PoW criterion
+        if not pow_valid:
+            logger.error(f"Invalid PoW at block {index}")
+            return False
+
+        if not signatures_valid:
+            logger.error(f"Invalid signature at block {index}")
+            return False
         return True
-    
+
+    @staticmethod
+    def _audit_parallel(pool: ProcessPoolExecutor, workers: int, payloads: List[dict], public_keys: Optional[Dict[str, Tuple[int, int]]]) -> List[Tuple[str, bool, bool]]:
+        """Recompute the hashes and check the PoW and the signatures of the serialized blocks in the process pool, the results are in block order."""
+        shard = max(MIN_AUDIT_SHARD, -(-len(payloads) // (4 * workers))) # a few shards per worker, to balance the load
+        shards = [payloads[i:i+shard] for i in range(0, len(payloads), shard)]
+        results = pool.map(_audit_shard, shards, [public_keys] * len(shards))
+        return [result for shard_results in results for result in shard_results]
+
+    def validate_chain(
+            self, 
+            from_index: Optional[int] = None, 
+            parallel: bool = False, 
+            workers: Optional[int] = None, 
+            public_keys: Optional[Dict[str, Tuple[int, int]]] = None
+        ) -> bool:
+        """
+            Validate the chain's integrity and Proof-of-Work.
+
+            :param from_index: First position to validate, the blocks before it are trusted. 
+                               None: full audit from the genesis block.
+            :param parallel: Recompute the hashes (and check the signatures) in a process pool, 
+                             the linkage is still checked in order, so the same first invalid block is reported.
+                             Both modes check the serialized blocks, rebuilt from their fields and compared with their stored hash, 
+                             in parallel mode they aren't decoded in this process.
+            :param workers: Number of processes for the parallel mode (default: CPU count).
+            :param public_keys: Public keys by username, if given the signatures of their transactions are verified too
+                                (the transactions of the other senders can't be checked, they are skipped).
+            :return: True if every block from from_index is valid. The validated tip is moved to the last valid block.
+        """
+        start = 1 if from_index is None else max(from_index, 1)
+        if start > self.validated_index + 1:
+            # NOTE: the blocks in between would stay unchecked, so the tip can't be advanced past them
+            logger.warning(f"Validating from {start}, while the chain is only validated up to {self.validated_index}")
+
+        workers = workers or os.cpu_count() or 1
+        pool = ProcessPoolExecutor(max_workers=workers) if parallel and len(self.chain) - start > MIN_AUDIT_SHARD else None
+        try:
+            # NOTE: the chain is checked in windows of serialized blocks, so a lazily loaded chain is never hydrated at once
+            previous_hash = next(self.serialized_blocks(start - 1, start))["hash"]
+            for window_start in range(start, len(self.chain), AUDIT_WINDOW):
+                payloads = list(self.serialized_blocks(window_start, window_start + AUDIT_WINDOW))
+                if pool is not None:
+                    results = self._audit_parallel(pool, workers, payloads, public_keys)
+                else:
+                    results = _audit_shard(payloads, public_keys)
+
+                for offset, (payload, (recomputed_hash, pow_valid, signatures_valid)) in enumerate(zip(payloads, results)):
+                    # NOTE: against the stored hash, which the next block links to (a decoded block would recompute it)
+                    pow_valid = pow_valid and recomputed_hash == payload["hash"]
+                    if not self._check_fields(payload["id"], payload["previous_hash"], previous_hash, pow_valid, signatures_valid):
+                        self.validated_index = min(self.validated_index, window_start + offset - 1)
+                        return False
+                    previous_hash = payload["hash"]
+        finally:
+            if pool is not None:
+                pool.shutdown()
+
+        if start <= self.validated_index + 1:
+            self.validated_index = len(self.chain) - 1
+        return True
+
     def add_block(self, block: Block) -> bool:
-        """Add a block to the blockchain."""
-        self.chain.append(block)
-        if not self.validate_chain():
-            self.chain.pop(-1)
+        """Add a block to the blockchain, only the new block is checked against the validated tip."""
+        if self.validated_index < len(self.chain) - 1 and not self.validate_chain(from_index=self.validated_index + 1):
+            logger.error("The chain is invalid, can't add blocks to it.")
+            return False
+
+        if not self.check_block(block, self.chain[-1], block.compute_hash()):
             return False
+        with self._index_lock:
+            self.chain.append(block) # NOTE: a store backed chain writes the block to the store
+            self.validated_index = len(self.chain) - 1
+            if self._index is not None: # NOTE: otherwise the block is indexed with the others when the index is built
+                self._index.add_block(self.validated_index, block.hash, block.data)
         return True
     
+    def serialized_blocks(self, start: int = 0, stop: Optional[int] = None) -> Iterator[dict]:
+        """The JSON form of the blocks in [start, stop), one at a time (a stored chain is read from the store, without decoding the blocks)."""
+        stop = len(self.chain) if stop is None else min(stop, len(self.chain))
+        for height in range(max(start, 0), stop):
+            yield self.store.read_dict(height) if self.store is not None else self.chain[height].json_serialize()
+
+    def height_of(self, block_hash: str) -> Optional[int]:
+        """Height of the block with the hash, None if it isn't in the chain."""
+        return self.index.height_of(block_hash)
+
+    def transaction_at(self, height: int, position: int) -> dict:
+        """The JSON form of a transaction, by its location (see ChainIndex)."""
+        block = next(self.serialized_blocks(height, height + 1))
+        return block["transactions"][position]
+
     def json_serialize(self):
         return {
             "blocks": [b.json_serialize() for b in self.chain]
         }
 
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Audit the chain in a block store.")
+    parser.add_argument("store_path")
+    parser.add_argument("--users", help="JSON user file, the signatures of these users' transactions are verified too.")
+    parser.add_argument("--workers", type=int, default=None, help="Audit processes, default: CPU count, 1: serial.")
+    args = parser.parse_args()
+
+    public_keys = None
+    if args.users is not None:
+        with open(args.users, "r", encoding='utf-8') as uf:
+            public_keys = {user["username"]: tuple(user["public_key"]) for user in json.load(uf)}
+
+    with BlockStore(args.store_path, fsync_every=0) as store:
+        if not len(store):
+            raise SystemExit(f"No blocks in {args.store_path}.")
+        blockchain = Blockchain(criterion=MiningCriterion.from_dict(store.read_dict(0)["criterion"]))
+        blockchain.attach_store(store)
+        valid = blockchain.validate_chain(parallel=args.workers != 1, workers=args.workers, public_keys=public_keys)
+        print(f"Audit {'passed' if valid else 'failed'}, valid up to block {blockchain.validated_index} of {len(store) - 1}.")
+    raise SystemExit(0 if valid else 1)
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+
+In-memory lookup indexes of the chain.
+
+"""
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from blockchain.block import Transaction
+
+Location = Tuple[int, int] # (block height, position in the block)
+
+class ChainIndex:
+    """
+        Indexes of the blocks and transactions in the chain, updated block by block:
+            - block hash -> height
+            - transaction hash -> locations (the same payment can be made more than once, with different signatures)
+            - username -> locations of the transactions sent or received by the user, in chain order
+            - replay keys (see Transaction.replay_key) of the transactions in the chain
+    """
+    def __init__(self):
+        self.block_heights: Dict[str, int] = {}
+        self.transactions: Dict[int, List[Location]] = {}
+        self.user_transactions: Dict[str, List[Location]] = {}
+        self.replay_keys: Set[Tuple[int, int]] = set()
+
+    def __len__(self) -> int:
+        return len(self.block_heights)
+
+    def add_block(self, height: int, block_hash: str, transactions: List[Transaction]):
+        self._add(height, block_hash, [
+            (tx_hash, tx.sender, tx.receiver, tx.replay_key()[1]) for tx, tx_hash in zip(transactions, Transaction.hash_many(transactions))
+        ])
+
+    def _add(self, height: int, block_hash: str, entries: List[Tuple[int, str, str, int]]):
+        """Index a block from the (hash, sender, receiver, signature r) of its transactions."""
+        self.block_heights[block_hash] = height
+        for position, (tx_hash, sender, receiver, r) in enumerate(entries):
+            location = (height, position)
+            self.transactions.setdefault(tx_hash, []).append(location)
+            self.user_transactions.setdefault(sender, []).append(location)
+            if receiver != sender:
+                self.user_transactions.setdefault(receiver, []).append(location)
+            self.replay_keys.add((tx_hash, r))
+
+    def add_serialized(self, height: int, block: dict):
+        """
+            Index a block from its JSON form (see Blockchain.serialized_blocks).
+            The transaction hashes are taken from the tx_hashes field of the stored blocks (see BlockStore.append), 
+            so the transactions aren't decoded and hashed, blocks without it are hashed.
+        """
+        if "tx_hashes" not in block:
+            self.add_block(height, block["hash"], [Transaction.load_from_dict(tx) for tx in block["transactions"]])
+            return
+        self._add(height, block["hash"], [
+            (int(tx_hash, 16), tx["sender"], tx["receiver"], int(tx["signature"][0]) if tx.get("signature") else 0)
+            for tx_hash, tx in zip(block["tx_hashes"], block["transactions"])
+        ])
+
+    @classmethod
+    def from_serialized(cls, blocks: Iterable[dict]) -> "ChainIndex":
+        """Build the index from the JSON form of the blocks, in chain order (see add_serialized)."""
+        index = cls()
+        for height, block in enumerate(blocks):
+            index.add_serialized(height, block)
+        return index
+
+    def height_of(self, block_hash: str) -> Optional[int]:
+        return self.block_heights.get(block_hash)
+
+    def locate_transaction(self, tx_hash: int) -> List[Location]:
+        return self.transactions.get(tx_hash, [])
+
+    def transactions_of(self, username: str) -> List[Location]:
+        return self.user_transactions.get(username, [])
+
+    def is_replay(self, transaction: Transaction) -> bool:
+        """True if the same signed transaction is already in the chain."""
+        return transaction.replay_key() in self.replay_keys
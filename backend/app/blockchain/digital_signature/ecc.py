@@ -5,6 +5,8 @@
 Basic Elliptic Curve Cryptography (ECC) implementation.
 
 """
+import secrets
+from collections import OrderedDict
 
 class ECC:
     def __init__(self, a, b, p, G, n):
@@ -14,6 +16,10 @@ class ECC:
         self.G = G # Generator point (G_x, G_y)
         self.n = n # Order of the curve
 
+        self._generator_table = None # fixed-base table for multiples of G, built on first use
+        self._generator_odd_multiples = None # wNAF table of G, built on first use
+        self.point_cache = None # optional PointTableCache for public keys, see enable_point_cache
+
     def inverse_mod(self, k):
         """Calculate the modular inverse."""
         return pow(k, -1, self.p)
@@ -52,6 +58,423 @@ class ECC:
         return (x3, y3)
         
 
+    # Jacobian coordinates:
+    # NOTE: a point (X, Y, Z) represents the affine point (X/Z^2, Y/Z^3), Z = 0 is the infinity point.
+    # Addition and doubling then need no modular inversion (only multiplications), 
+    # the single inversion happens when converting back to affine coordinates.
+    INFINITY_JACOBIAN = (1, 1, 0)
+
+    def to_jacobian(self, P):
+        """Affine (x, y) -> Jacobian (x, y, 1)."""
+        if P == (0, 0):
+            return self.INFINITY_JACOBIAN
+        return (P[0], P[1], 1)
+
+    def to_affine(self, P):
+        """Jacobian (X, Y, Z) -> affine (X/Z^2, Y/Z^3), one modular inversion."""
+        X, Y, Z = P
+        if Z % self.p == 0:
+            return (0, 0) # infinity point
+        z_inv = self.inverse_mod(Z)
+        z_inv2 = z_inv * z_inv % self.p
+        return (X * z_inv2 % self.p, Y * z_inv2 * z_inv % self.p)
+
+    def jacobian_double(self, P):
+        """Point doubling in Jacobian coordinates."""
+        X, Y, Z = P
+        if Y == 0 or Z == 0:
+            return self.INFINITY_JACOBIAN
+        p = self.p
+        YY = Y * Y % p
+        S = 4 * X * YY % p
+        M = (3 * X * X + self.a * pow(Z, 4, p)) % p if self.a else 3 * X * X % p # a = 0 for secp256k1
+        X3 = (M * M - 2 * S) % p
+        Y3 = (M * (S - X3) - 8 * YY * YY) % p
+        Z3 = 2 * Y * Z % p
+        return (X3, Y3, Z3)
+
+    def jacobian_add(self, P, Q):
+        """Point addition in Jacobian coordinates."""
+        X1, Y1, Z1 = P
+        X2, Y2, Z2 = Q
+        if Z1 == 0:
+            return Q
+        if Z2 == 0:
+            return P
+        p = self.p
+        Z1Z1 = Z1 * Z1 % p
+        Z2Z2 = Z2 * Z2 % p
+        U1 = X1 * Z2Z2 % p
+        U2 = X2 * Z1Z1 % p
+        S1 = Y1 * Z2 * Z2Z2 % p
+        S2 = Y2 * Z1 * Z1Z1 % p
+        if U1 == U2:
+            if S1 != S2:
+                return self.INFINITY_JACOBIAN # P + (-P)
+            return self.jacobian_double(P)
+        H = (U2 - U1) % p
+        R = (S2 - S1) % p
+        HH = H * H % p
+        HHH = H * HH % p
+        V = U1 * HH % p
+        X3 = (R * R - HHH - 2 * V) % p
+        Y3 = (R * (V - X3) - S1 * HHH) % p
+        Z3 = H * Z1 * Z2 % p
+        return (X3, Y3, Z3)
+
+    def jacobian_add_affine(self, P, Q):
+        """Mixed addition: Jacobian P + affine Q (i.e. Z2 = 1, which saves a few multiplications)."""
+        X1, Y1, Z1 = P
+        if Q == (0, 0):
+            return P
+        if Z1 == 0:
+            return self.to_jacobian(Q)
+        x2, y2 = Q
+        p = self.p
+        Z1Z1 = Z1 * Z1 % p
+        U2 = x2 * Z1Z1 % p
+        S2 = y2 * Z1 * Z1Z1 % p
+        if X1 == U2:
+            if Y1 != S2:
+                return self.INFINITY_JACOBIAN # P + (-P)
+            return self.jacobian_double(P)
+        H = (U2 - X1) % p
+        R = (S2 - Y1) % p
+        HH = H * H % p
+        HHH = H * HH % p
+        V = X1 * HH % p
+        X3 = (R * R - HHH - 2 * V) % p
+        Y3 = (R * (V - X3) - Y1 * HHH) % p
+        Z3 = Z1 * H % p
+        return (X3, Y3, Z3)
+
+    def batch_to_affine(self, points):
+        """
+            Convert many Jacobian points to affine with a single modular inversion (Montgomery's trick):
+            invert the product of all Z values, then peel off the individual inverses with multiplications.
+        """
+        p = self.p
+        prefix_products = []
+        product = 1
+        for _, _, Z in points:
+            prefix_products.append(product)
+            if Z:
+                product = product * Z % p
+        inverse = self.inverse_mod(product)
+
+        result = [None] * len(points)
+        for i in range(len(points) - 1, -1, -1):
+            X, Y, Z = points[i]
+            if not Z:
+                result[i] = (0, 0)
+                continue
+            z_inv = inverse * prefix_products[i] % p # 1/Z_i
+            inverse = inverse * Z % p # 1/(Z_0 * ... * Z_{i-1})
+            z_inv2 = z_inv * z_inv % p
+            result[i] = (X * z_inv2 % p, Y * z_inv2 * z_inv % p)
+        return result
+
+    # Fixed-base multiplication (generator and cached public keys):
+    FIXED_BASE_WINDOW = 4 # bits per window
+
+    def fixed_base_table(self, P):
+        """
+            Fixed-base window table of a point.
+
+            With w = FIXED_BASE_WINDOW, row i holds j * 2^(w*i) * P for j = 0 ... 2^w - 1 (affine), so k*P is the sum of 
+            table[i][i-th w-bit digit of k]: ~bits/w additions, no doublings.
+        """
+        w = self.FIXED_BASE_WINDOW
+        rows = -(-self.n.bit_length() // w) # ceil
+        jacobian_rows = []
+        base = self.to_jacobian(P) # 2^(w*i) * P
+        for _ in range(rows):
+            row = [self.INFINITY_JACOBIAN, base]
+            for _ in range(2, 2**w):
+                row.append(self.jacobian_add(row[-1], base))
+            jacobian_rows.append(row)
+            for _ in range(w):
+                base = self.jacobian_double(base)
+
+        flat = self.batch_to_affine([point for row in jacobian_rows for point in row])
+        return [flat[i * 2**w:(i + 1) * 2**w] for i in range(rows)]
+
+    def generator_table(self):
+        """Fixed-base window table of the generator, built once per curve on first use."""
+        if self._generator_table is None:
+            self._generator_table = self.fixed_base_table(self.G)
+        return self._generator_table
+
+    def add_fixed_base(self, result, k, table):
+        """result + k*P (Jacobian), with the fixed-base table of P."""
+        w = self.FIXED_BASE_WINDOW
+        mask = 2**w - 1
+        for row in table:
+            if not k:
+                break
+            digit = k & mask
+            if digit:
+                result = self.jacobian_add_affine(result, row[digit])
+            k >>= w
+        return result
+
+    def multiply_generator(self, k):
+        """k * G using the fixed-base table."""
+        return self.to_affine(self.add_fixed_base(self.INFINITY_JACOBIAN, k % self.n, self.generator_table())) # G has order n
+
+    def enable_point_cache(self, capacity: int, build_after: int = 2):
+        """Cache fixed-base tables of frequently used public keys (see PointTableCache), capacity 0 disables it."""
+        self.point_cache = PointTableCache(capacity, build_after) if capacity > 0 else None
+
+    # Multi-scalar multiplication (Strauss-Shamir with wNAF):
+    WNAF_WINDOW = 5 # window of the variable points
+    GENERATOR_WNAF_WINDOW = 7 # G's table is cached, so it can be wider
+
+    @staticmethod
+    def wnaf(k, w):
+        """
+            Width-w non-adjacent form of k, least significant digit first.
+
+            Digits are 0 or odd values in (-2^(w-1), 2^(w-1)), and any w consecutive digits contain at most one non-zero, 
+            so a 256-bit scalar needs ~256/(w+1) additions instead of ~128.
+        """
+        digits = []
+        while k:
+            if k & 1:
+                digit = k & ((1 << w) - 1)
+                if digit >= 1 << (w - 1):
+                    digit -= 1 << w
+                k -= digit # the next w-1 bits become 0
+            else:
+                digit = 0
+            digits.append(digit)
+            k >>= 1
+        return digits
+
+    def odd_multiples_jacobian(self, P, w):
+        """[P, 3P, 5P, ..., (2^(w-1) - 1)P] in Jacobian coordinates."""
+        P = self.to_jacobian(P)
+        P2 = self.jacobian_double(P)
+        points = [P]
+        for _ in range(2**(w - 2) - 1):
+            points.append(self.jacobian_add(points[-1], P2))
+        return points
+
+    def odd_multiples(self, P, w):
+        """[P, 3P, 5P, ..., (2^(w-1) - 1)P] in affine coordinates."""
+        return self.batch_to_affine(self.odd_multiples_jacobian(P, w))
+
+    def point_table(self, P):
+        """wNAF window and precomputed odd multiples of a point, the table is None if it has to be computed."""
+        if P == self.G:
+            if self._generator_odd_multiples is None:
+                self._generator_odd_multiples = self.odd_multiples(self.G, self.GENERATOR_WNAF_WINDOW)
+            return self.GENERATOR_WNAF_WINDOW, self._generator_odd_multiples
+        return self.WNAF_WINDOW, None
+
+    def multi_scalar_multiply(self, pairs, cacheable=()):
+        """
+            Compute k_1*P_1 + k_2*P_2 + ... for [(k_1, P_1), (k_2, P_2), ...].
+
+            The scalars are written in wNAF and processed together from the most significant digit (Strauss-Shamir trick), 
+            so all products share one chain of doublings, e.g. ECDSA's u1*G + u2*Q costs about as much as a single multiplication.
+
+            :param cacheable: Points worth a cached table (public keys), if the point cache is enabled. 
+                Points with a cached fixed-base table are added with table lookups, outside of the doubling chain, 
+                and if only G is left, it uses its fixed-base table too, so there are no doublings at all.
+        """
+        p = self.p
+        fixed = [] # (k, fixed-base table)
+        variable = [] # (k, P)
+        for k, P in pairs:
+            k %= self.n
+            if k == 0 or P == (0, 0):
+                continue
+            table = self.point_cache.lookup(P, self.fixed_base_table) if self.point_cache is not None and P in cacheable else None
+            if table is not None:
+                fixed.append((k, table))
+            else:
+                variable.append((k, P))
+        if variable and all(P == self.G for _, P in variable):
+            fixed.extend((k, self.generator_table()) for k, _ in variable)
+            variable = []
+
+        result = self.INFINITY_JACOBIAN
+        for k, table in fixed:
+            result = self.add_fixed_base(result, k, table)
+        if not variable:
+            return self.to_affine(result)
+
+        terms = []
+        missing_tables = [] # (term, Jacobian table), normalized together below
+        for k, P in variable:
+            w, table = self.point_table(P)
+            term = [self.wnaf(k, w), table]
+            if table is None:
+                missing_tables.append((term, self.odd_multiples_jacobian(P, w)))
+            terms.append(term)
+
+        # One inversion for all the new tables:
+        if missing_tables:
+            flat = self.batch_to_affine([point for _, table in missing_tables for point in table])
+            offset = 0
+            for term, table in missing_tables:
+                term[1] = flat[offset:offset + len(table)]
+                offset += len(table)
+
+        # Points to add after each doubling, by digit position:
+        additions = [[] for _ in range(max(len(digits) for digits, _ in terms))]
+        for digits, table in terms:
+            for i, digit in enumerate(digits):
+                if digit > 0:
+                    additions[i].append(table[digit >> 1])
+                elif digit < 0:
+                    x, y = table[-digit >> 1]
+                    additions[i].append((x, -y % p)) # subtract: add the negated point
+
+        chain = self.INFINITY_JACOBIAN
+        for points in reversed(additions):
+            chain = self.jacobian_double(chain)
+            for point in points:
+                chain = self.jacobian_add_affine(chain, point)
+        return self.to_affine(self.jacobian_add(result, chain))
+
+    # ECDSA verification:
+    def verify(self, h, signature, public_key) -> bool:
+        """
+            Verify an ECDSA signature (r, s) of the hash h (already reduced mod n) with the public key Q.
+
+            Valid if the x-coordinate of u1*G + u2*Q is r (mod n), with u1 = h/s and u2 = r/s.
+        """
+        if signature is None or public_key is None:
+            return False
+        r, s = int(signature[0]), int(signature[1])
+        if not (1 <= r < self.n and 1 <= s < self.n):
+            return False
+
+        s_inv = pow(s, -1, self.n)
+        u1 = (h * s_inv) % self.n
+        u2 = (r * s_inv) % self.n
+
+        # Compute P = u1*G + u2*Q (one shared doubling chain)
+        Q = tuple(public_key)
+        P = self.multi_scalar_multiply([(u1, self.G), (u2, Q)], cacheable=(Q,))
+        return P != (0, 0) and P[0] % self.n == r # Check if x-coord matches r
+
+    def sqrt_mod(self, a):
+        """Square root modulo p (Tonelli-Shanks), None if a is not a quadratic residue."""
+        p = self.p
+        a %= p
+        if a == 0:
+            return 0
+        if p % 4 == 3: # secp256k1, nist_p192
+            y = pow(a, (p + 1) // 4, p)
+            return y if y * y % p == a else None
+        if pow(a, (p - 1) // 2, p) != 1:
+            return None
+
+        # General case: p - 1 = q * 2^m with q odd
+        q, m = p - 1, 0
+        while q % 2 == 0:
+            q //= 2
+            m += 1
+        z = next(z for z in range(2, p) if pow(z, (p - 1) // 2, p) == p - 1) # a non-residue
+        c, x, t = pow(z, q, p), pow(a, (q + 1) // 2, p), pow(a, q, p)
+        while t != 1:
+            i, t2 = 0, t
+            while t2 != 1:
+                t2 = t2 * t2 % p
+                i += 1
+            b = pow(c, 2**(m - i - 1), p)
+            m, c = i, b * b % p
+            x, t = x * b % p, t * b * b % p
+        return x
+
+    def recover_point(self, x):
+        """The curve point with the given x-coordinate and even y, None if there is none."""
+        y = self.sqrt_mod(x * x * x + self.a * x + self.b)
+        if y is None:
+            return None
+        return (x, y if y % 2 == 0 else self.p - y)
+
+    BATCH_VERIFY_CHUNK = 1024 # signatures per combined check
+
+    def verify_batch(self, entries):
+        """
+            Verify many ECDSA signatures together.
+
+            :param entries: List of (h, (r, s), public_key), h already reduced mod n.
+            :return: List of bools, one per entry.
+
+            Randomized linear combination check: for a valid signature R = u1*G + u2*Q, where R is the point with x-coordinate r, so 
+            sum_i a_i * (u1_i*G + u2_i*Q_i - R_i) = 0 for random 128-bit a_i. The G terms collapse into one scalar, 
+            the terms of the same public key as well, and everything is a single multi-scalar multiplication.
+            A forged signature passes this with negligible probability (~2^-128).
+
+            NOTE: from r alone the sign of R (y parity) is unknown, the check assumes even y, which Transaction.sign guarantees.
+            If the check fails, the batch is split in halves once, a half failing again is verified entry by entry with verify 
+            (bisecting further would cost more than the linear check when the bad signatures, or other-parity R-s, are spread out), 
+            so the results are always the same as verifying one by one.
+        """
+        n = self.n
+        results = [False] * len(entries)
+        well_formed = [] # (index, h, r, s, Q, R)
+        for i, (h, signature, public_key) in enumerate(entries):
+            if signature is None or public_key is None:
+                continue
+            r, s = int(signature[0]), int(signature[1])
+            if not (1 <= r < n and 1 <= s < n):
+                continue
+            R = self.recover_point(r)
+            if R is None:
+                # NOTE: R's x-coordinate can also be r + n (if < p), extremely rare, leave it to the single verification
+                results[i] = self.verify(h, (r, s), public_key)
+                continue
+            well_formed.append((i, h, r, s, tuple(public_key), R))
+
+        # Invert all the s values with a single modular inversion (Montgomery's trick, as in batch_to_affine):
+        prefix_products = []
+        product = 1
+        for entry in well_formed:
+            prefix_products.append(product)
+            product = product * entry[3] % n
+        inverse = pow(product, -1, n) if well_formed else 1
+        candidates = [None] * len(well_formed) # (index, u1, u2, Q, R)
+        for j in range(len(well_formed) - 1, -1, -1):
+            i, h, r, s, Q, R = well_formed[j]
+            s_inv = inverse * prefix_products[j] % n
+            inverse = inverse * s % n
+            candidates[j] = (i, h * s_inv % n, r * s_inv % n, Q, R)
+
+        # Checked in chunks, which also limits the work of locating a bad signature:
+        pending = [(candidates[i:i + self.BATCH_VERIFY_CHUNK], False) for i in range(0, len(candidates), self.BATCH_VERIFY_CHUNK)]
+        while pending:
+            batch, split = pending.pop()
+            if len(batch) > 2 and self._check_combination(batch):
+                for i, *_ in batch:
+                    results[i] = True
+            elif len(batch) <= 2 or split:
+                for i, u1, u2, Q, _ in batch:
+                    results[i] = self.verify(entries[i][0], entries[i][1], Q)
+            else:
+                middle = len(batch) // 2
+                pending.extend([(batch[:middle], True), (batch[middle:], True)])
+        return results
+
+    def _check_combination(self, batch) -> bool:
+        """sum_i a_i * (u1_i*G + u2_i*Q_i - R_i) == 0, with random a_i."""
+        n = self.n
+        g_coefficient = 0
+        q_coefficients = {}
+        r_terms = []
+        for _, u1, u2, Q, R in batch:
+            a = secrets.randbits(128) | 1
+            g_coefficient += a * u1
+            q_coefficients[Q] = q_coefficients.get(Q, 0) + a * u2
+            r_terms.append((a, (R[0], -R[1] % self.p))) # -R
+        pairs = [(g_coefficient % n, self.G)] + [(c % n, Q) for Q, c in q_coefficients.items()] + r_terms
+        return self.multi_scalar_multiply(pairs, cacheable=q_coefficients) == (0, 0)
+
     def scalar_multiply(self, k, P):
         """
             Scalar multiplication of a point, using Double-and-Add algorithm.
@@ -61,18 +484,78 @@ class ECC:
             - Initialize the result as the infinity point (0, 0)
             - If k_i is 0, then do nothing, just take a step, but that means we need to step in the magnitude as well, i.e. double the point
             - If k_i is 1, then add the point to the result and then take a step
+
+            NOTE: the steps are done in Jacobian coordinates, converted back to affine coordinates once at the end.
+            Multiples of the generator G use the precomputed table instead (see multiply_generator).
         """
-        result = (0, 0)
-        current_magnitude = P # where we are in the binary representation
+        if P == self.G:
+            return self.multiply_generator(k)
+        if self.point_cache is not None and P in self.point_cache:
+            return self.multi_scalar_multiply([(k, P)], cacheable=(P,))
+
+        result = self.INFINITY_JACOBIAN
+        current_magnitude = self.to_jacobian(P) # where we are in the binary representation
 
         while k: # Iterate over the bits of k
             if k & 1: # if at k we have a 1
-                result = self.add_points(result, current_magnitude)
-            current_magnitude = self.double_point(current_magnitude)
-
+                result = self.jacobian_add(result, current_magnitude)
             k >>= 1 # Move to the next bit
+            if k:
+                current_magnitude = self.jacobian_double(current_magnitude)
 
-        return result
+        return self.to_affine(result)
+    
+class PointTableCache:
+    """
+        LRU cache of fixed-base tables of frequently used points, i.e. the public keys of repeat senders.
+
+        A table costs about as much as a few verifications to build, so a point only gets one on its build_after-th use 
+        (among the recently seen points), above capacity the least recently used table is evicted.
+        NOTE: a secp256k1 table holds 1024 points, ~180 KB.
+    """
+    def __init__(self, capacity: int, build_after: int = 2):
+        self.capacity = capacity
+        self.build_after = build_after
+        self.hits = 0
+        self.misses = 0
+        self._tables = OrderedDict() # point -> table, least recently used first
+        self._uses = OrderedDict() # point -> number of uses, for points without a table (bounded as well)
+
+    def __contains__(self, P) -> bool:
+        return P in self._tables
+
+    def __len__(self) -> int:
+        return len(self._tables)
+
+    def lookup(self, P, build):
+        """The table of P, built with build(P) if P is used often enough, None otherwise."""
+        table = self._tables.get(P)
+        if table is not None:
+            self.hits += 1
+            self._tables.move_to_end(P)
+            return table
+
+        self.misses += 1
+        uses = self._uses.pop(P, 0) + 1
+        if uses < self.build_after:
+            self._uses[P] = uses
+            if len(self._uses) > 4 * self.capacity:
+                self._uses.popitem(last=False)
+            return None
+
+        table = build(P)
+        self._tables[P] = table
+        if len(self._tables) > self.capacity:
+            self._tables.popitem(last=False)
+        return table
+
+    def stats(self) -> dict:
+        return {
+            "capacity": self.capacity,
+            "size": len(self._tables),
+            "hits": self.hits,
+            "misses": self.misses
+        }
     
 # Initialize known curves:
 secp256k1 = ECC(
@@ -5,9 +5,14 @@
 Manual implementation of the SHA-256 hashing algorithm, for educational purposes.
 
 """
-from typing import List, Any
+from typing import List, Any, Iterable, Sequence, Union
 import struct
 
+try:
+    import numpy as np
+except ImportError: # optional, only used for batch hashing (falls back to the scalar path)
+    np = None
+
 class SHA256:
     # Constants, calculate them only once and store them as class variables:
     # Some explanation:
@@ -57,40 +62,51 @@ class SHA256:
     @staticmethod
     def message_schedule(block: str) -> List[int]:
         """Expands the 512-bit block to a 64-word message schedule"""
-        W = []
         # The first 16 words are the block split into 32-bit words:
-        for i in range(16):
-            W.append(int(block[i*32:(i+1)*32], 2)) # Convert to int from binary string
-            
+        W = [int(block[i*32:(i+1)*32], 2) for i in range(16)] # Convert to int from binary string
+        return SHA256.expand_message_schedule(W)
+
+    @staticmethod
+    def message_schedule_bytes(block: bytes) -> List[int]:
+        """Same as message_schedule, but for a 64-byte block (bytes or memoryview)."""
+        #NOTE: struct unpacks the 16 big-endian 32-bit words in one C call, no intermediate binary strings.
+        return SHA256.expand_message_schedule(list(struct.unpack(">16I", block)))
+
+    @staticmethod
+    def expand_message_schedule(W: List[int]) -> List[int]:
+        """Extend the first 16 words of a block to the full 64-word message schedule (in place)."""
         # The rest of the words are generated from the first 16 with nonlinear operations (rotations and XORs):
+        #NOTE: the rotations are written out inline (same formula as circular_right_rotate), in pure Python the function call overhead dominates the bit operations.
         for i in range(16, 64):
-              sigma0 = SHA256.circular_right_rotate(W[i-15], 7) ^ SHA256.circular_right_rotate(W[i-15], 18) ^ (W[i-15] >> 3)
-              sigma1 = SHA256.circular_right_rotate(W[i-2], 17) ^ SHA256.circular_right_rotate(W[i-2], 19) ^ (W[i-2] >> 10)
+              w15 = W[i-15]
+              w2 = W[i-2]
+              sigma0 = (((w15 >> 7) | (w15 << 25)) ^ ((w15 >> 18) | (w15 << 14)) ^ (w15 >> 3)) & 0xFFFFFFFF
+              sigma1 = (((w2 >> 17) | (w2 << 15)) ^ ((w2 >> 19) | (w2 << 13)) ^ (w2 >> 10)) & 0xFFFFFFFF
               W.append((W[i-16] + sigma0 + W[i-7] + sigma1) & 0xFFFFFFFF) # Ensure 32-bit int output
         return W
     
     # Compression:
     @staticmethod
-    def compression_loop(words: List[int], current_hash: List[int] = None) -> str:
+    def compression_loop(words: List[int], current_hash: List[int] = None) -> List[int]:
         """
             Main compression loop of the SHA-256 algorithm.
             
             This is where the 64 words are compressed into the 8 hash values.
         """
         if current_hash is None:
-            a,b,c,d,e,f,g,h = SHA256.INITIAL_HASH_VALUES # Initialize hash values
-        else:
-            a,b,c,d,e,f,g,h = current_hash
+            current_hash = SHA256.INITIAL_HASH_VALUES # Initialize hash values
+        a,b,c,d,e,f,g,h = current_hash
         round_constants = SHA256.ROUND_CONSTANTS
         
         assert len(words) == 64, "Message schedule should be 64 words long."
         
-        for i in range(64):
-            Sigma1 = SHA256.circular_right_rotate(e, 6) ^ SHA256.circular_right_rotate(e, 11) ^ SHA256.circular_right_rotate(e, 25)
+        #NOTE: rotations inlined here as well, see expand_message_schedule.
+        for k, w in zip(round_constants, words):
+            Sigma1 = (((e >> 6) | (e << 26)) ^ ((e >> 11) | (e << 21)) ^ ((e >> 25) | (e << 7))) & 0xFFFFFFFF
             ch = (e & f) ^ (~e & g)
-            temp1 = (h + Sigma1 + ch + round_constants[i] + words[i]) & 0xFFFFFFFF # Ensure 32-bit int output
+            temp1 = (h + Sigma1 + ch + k + w) & 0xFFFFFFFF # Ensure 32-bit int output
             
-            Sigma0 = SHA256.circular_right_rotate(a, 2) ^ SHA256.circular_right_rotate(a, 13) ^ SHA256.circular_right_rotate(a, 22)
+            Sigma0 = (((a >> 2) | (a << 30)) ^ ((a >> 13) | (a << 19)) ^ ((a >> 22) | (a << 10))) & 0xFFFFFFFF
             maj = (a & b) ^ (a & c) ^ (b & c)
             temp2 = (Sigma0 + maj) & 0xFFFFFFFF
             #NOTE: each variable is supposed to be 32 bits, which the the rotations and bitwise operations could change, so when calculating the hash values, we ensure 32 bit outputs
@@ -107,9 +123,51 @@ class SHA256:
             
         return [(val + new_val) & 0xFFFFFFFF for val, new_val in zip(current_hash, [a,b,c,d,e,f,g,h])]
     
+    # Byte-level padding:
+    @staticmethod
+    def padding(length: int) -> bytes:
+        """
+            Padding bytes for a message of the given byte length.
+
+            Same rule as add_padding, but on whole bytes: a 0x80 byte (the '1' bit followed by seven zeros), 
+            zero bytes up to 56 (mod 64) and the bit length of the message as a 64-bit big-endian integer.
+        """
+        return b"\x80" + b"\x00" * ((55 - length) % 64) + struct.pack(">Q", (length * 8) & 0xFFFFFFFFFFFFFFFF)
+
     # Complete hashing function:
+    @staticmethod
+    def digest_bytes(data: bytes) -> bytes:
+        """Hash raw bytes, return the 32-byte digest."""
+        view = memoryview(data).cast("B")
+        full_length = len(view) - len(view) % 64 # the full 64-byte blocks are read in place, only the tail is copied
+
+        hash_values = SHA256.INITIAL_HASH_VALUES # Initialize hash values
+        for offset in range(0, full_length, 64):
+            message_schedule = SHA256.message_schedule_bytes(view[offset:offset+64])
+            hash_values = SHA256.compression_loop(message_schedule, hash_values) # Update the hash values with the compression loop
+
+        tail = bytes(view[full_length:]) + SHA256.padding(len(view))
+        for offset in range(0, len(tail), 64):
+            message_schedule = SHA256.message_schedule_bytes(tail[offset:offset+64])
+            hash_values = SHA256.compression_loop(message_schedule, hash_values)
+
+        return struct.pack(">8I", *hash_values)
+
+    @staticmethod
+    def hexdigest(data: bytes) -> str:
+        """Hash raw bytes, return the digest as a hex string."""
+        return SHA256.digest_bytes(data).hex()
+
     @staticmethod
     def digest(message: str) -> str:
+        """Hash a string (UTF-8 encoded), return the digest as a hex string."""
+        return SHA256.hexdigest(message.encode('utf-8'))
+
+    @staticmethod
+    def digest_binary_string(message: str) -> str:
+        """
+            Reference implementation working on binary strings ('0'/'1' characters), slow, kept for educational purposes.
+        """
         binary_message = SHA256.convert_to_binary_string(message)
         padded_message = SHA256.add_padding(binary_message)
         blocks = SHA256.split_to_blocks(padded_message)
@@ -119,4 +177,155 @@ class SHA256:
             message_schedule = SHA256.message_schedule(block)
             hash_values = SHA256.compression_loop(message_schedule, hash_values) # Update the hash values with the compression loop
         
-        return ''.join(format(val, '08x') for val in hash_values) # Convert the hash values to hex  
\ No newline at end of file
+        return ''.join(format(val, '08x') for val in hash_values) # Convert the hash values to hex
+
+
+    # Batch hashing (NumPy lanes):
+    BATCH_THRESHOLD = 32 # below this many messages of the same length the scalar path is faster
+
+    @staticmethod
+    def compress_many(state: "np.ndarray", blocks: "np.ndarray") -> "np.ndarray":
+        """
+            Vectorized message schedule and compression loop, one lane per message.
+
+            :param state: (8, N) uint32 array, the current hash values of the N messages.
+            :param blocks: (16, N) uint32 array, the next 512-bit block of each message.
+            :return: (8, N) uint32 array, the updated hash values.
+
+            Same operations as expand_message_schedule and compression_loop, on whole arrays.
+            NOTE: uint32 arithmetic wraps around, so no masking with 0xFFFFFFFF is needed.
+        """
+        W = list(blocks)
+        for i in range(16, 64):
+            w15 = W[i-15]
+            w2 = W[i-2]
+            sigma0 = ((w15 >> 7) | (w15 << 25)) ^ ((w15 >> 18) | (w15 << 14)) ^ (w15 >> 3)
+            sigma1 = ((w2 >> 17) | (w2 << 15)) ^ ((w2 >> 19) | (w2 << 13)) ^ (w2 >> 10)
+            W.append(W[i-16] + sigma0 + W[i-7] + sigma1)
+
+        a,b,c,d,e,f,g,h = state
+        for k, w in zip(SHA256.ROUND_CONSTANTS, W):
+            Sigma1 = ((e >> 6) | (e << 26)) ^ ((e >> 11) | (e << 21)) ^ ((e >> 25) | (e << 7))
+            ch = (e & f) ^ (~e & g)
+            temp1 = h + Sigma1 + ch + np.uint32(k) + w
+
+            Sigma0 = ((a >> 2) | (a << 30)) ^ ((a >> 13) | (a << 19)) ^ ((a >> 22) | (a << 10))
+            maj = (a & b) ^ (a & c) ^ (b & c)
+            temp2 = Sigma0 + maj
+
+            h = g
+            g = f
+            f = e
+            e = d + temp1
+            d = c
+            c = b
+            b = a
+            a = temp1 + temp2
+
+        return state + np.stack([a,b,c,d,e,f,g,h])
+
+    @staticmethod
+    def digest_many(messages: Iterable[Union[str, bytes]]) -> List[str]:
+        """
+            Hash many messages at once, return the hex digests in the same order (same results as digest).
+
+            Messages of equal padded length are hashed together on NumPy uint32 lanes (if NumPy is available).
+        """
+        return SHA256Hasher().hexdigest_many([m.encode('utf-8') if isinstance(m, str) else m for m in messages])
+
+
+class SHA256Hasher:
+    """
+        Incremental (streaming) SHA-256, hashlib style: update() any number of times, then digest()/hexdigest().
+
+        Only the 8-word state and the unprocessed tail (< 64 bytes) are kept, so the memory use is constant.
+        copy() clones the state, which allows reusing the work done on a common prefix (midstate).
+    """
+    __slots__ = ("_state", "_buffer", "_length")
+
+    block_size = 64
+    digest_size = 32
+
+    def __init__(self, data: bytes = b""):
+        self._state = SHA256.INITIAL_HASH_VALUES # lists are replaced, never modified in place, so sharing is safe
+        self._buffer = b"" # unprocessed tail, always shorter than a block
+        self._length = 0 # total number of bytes hashed so far
+        if data:
+            self.update(data)
+
+    def update(self, data: bytes) -> "SHA256Hasher":
+        """Feed more data, compress every completed 64-byte block."""
+        view = memoryview(data).cast("B")
+        self._length += len(view)
+        state = self._state
+
+        offset = 0
+        if self._buffer:
+            # complete the buffered block first:
+            missing = 64 - len(self._buffer)
+            if len(view) < missing:
+                self._buffer += bytes(view)
+                return self
+            state = SHA256.compression_loop(SHA256.message_schedule_bytes(self._buffer + bytes(view[:missing])), state)
+            offset = missing
+
+        full_length = offset + (len(view) - offset) // 64 * 64
+        for block_start in range(offset, full_length, 64):
+            state = SHA256.compression_loop(SHA256.message_schedule_bytes(view[block_start:block_start+64]), state)
+
+        self._state = state
+        self._buffer = bytes(view[full_length:])
+        return self
+
+    def copy(self) -> "SHA256Hasher":
+        """Clone the hasher (midstate), the original can be updated independently."""
+        clone = SHA256Hasher.__new__(SHA256Hasher)
+        clone._state = self._state
+        clone._buffer = self._buffer
+        clone._length = self._length
+        return clone
+
+    def digest(self) -> bytes:
+        """Digest of the data so far, the hasher itself is not modified."""
+        tail = self._buffer + SHA256.padding(self._length)
+        state = self._state
+        for offset in range(0, len(tail), 64):
+            state = SHA256.compression_loop(SHA256.message_schedule_bytes(tail[offset:offset+64]), state)
+        return struct.pack(">8I", *state)
+
+    def hexdigest(self) -> str:
+        return self.digest().hex()
+
+    def hexdigest_many(self, suffixes: Sequence[bytes]) -> List[str]:
+        """
+            Hex digests of the data so far followed by each of the suffixes, e.g. a block midstate and a batch of nonces.
+
+            The padded tails are grouped by length, each group is compressed on NumPy lanes (see SHA256.compress_many), 
+            small groups (or all of them, without NumPy) go through the scalar path.
+        """
+        results: List[str] = [None] * len(suffixes)
+        groups = {}
+        for i, suffix in enumerate(suffixes):
+            tail = self._buffer + bytes(suffix) + SHA256.padding(self._length + len(suffix))
+            groups.setdefault(len(tail), []).append((i, tail))
+
+        for tail_length, group in groups.items():
+            if np is None or len(group) < SHA256.BATCH_THRESHOLD:
+                for i, tail in group:
+                    state = self._state
+                    for offset in range(0, tail_length, 64):
+                        state = SHA256.compression_loop(SHA256.message_schedule_bytes(tail[offset:offset+64]), state)
+                    results[i] = struct.pack(">8I", *state).hex()
+                continue
+
+            # (N, words) big-endian words, transposed so each word index is a contiguous lane array:
+            words = np.frombuffer(b"".join(tail for _, tail in group), dtype=">u4").reshape(len(group), tail_length // 4)
+            words = words.astype(np.uint32).T
+            state = np.repeat(np.array(self._state, dtype=np.uint32).reshape(8, 1), len(group), axis=1)
+            for block_start in range(0, tail_length // 4, 16):
+                state = SHA256.compress_many(state, words[block_start:block_start+16])
+
+            digests = state.T.astype(">u4").tobytes()
+            for j, (i, _) in enumerate(group):
+                results[i] = digests[j*32:(j+1)*32].hex()
+        return results
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+
+Merkle tree of the block transactions.
+
+"""
+from blockchain.hashing.sha2 import SHA256
+
+from typing import List, Tuple
+
+class MerkleTree:
+    """
+        Binary hash tree over the transaction hashes of a block.
+
+        - leaf = SHA256(0x00 + transaction hash), node = SHA256(0x01 + left + right), the prefixes separate leaves 
+          from internal nodes, so an internal node can't be passed off as a leaf (second preimage).
+        - a node without a sibling is promoted to the next level unchanged (no duplication, which would let 
+          two different transaction lists have the same root).
+        - the root of an empty tree is SHA256 of the empty string.
+
+        All levels are kept, so an inclusion proof is just the sibling on each level, O(log n).
+    """
+    LEAF_PREFIX = b"\x00"
+    NODE_PREFIX = b"\x01"
+
+    def __init__(self, leaves: List[bytes]):
+        self.leaves = list(leaves)
+        self.levels: List[List[bytes]] = [self._hash_all([self.LEAF_PREFIX + leaf for leaf in leaves])]
+        while len(self.levels[-1]) > 1:
+            level = self.levels[-1]
+            parents = self._hash_all([self.NODE_PREFIX + level[i] + level[i+1] for i in range(0, len(level) - 1, 2)])
+            if len(level) % 2 == 1:
+                parents.append(level[-1]) # promote the odd node
+            self.levels.append(parents)
+
+    @staticmethod
+    def _hash_all(messages: List[bytes]) -> List[bytes]:
+        # NOTE: the messages of a level have the same length, so large levels are hashed on NumPy lanes
+        return [bytes.fromhex(h) for h in SHA256.digest_many(messages)]
+
+    @classmethod
+    def from_transactions(cls, transactions) -> "MerkleTree":
+        """Tree over the (256-bit) transaction hashes."""
+        return cls([tx.hash_transaction().to_bytes(32, "big") for tx in transactions])
+
+    def __len__(self) -> int:
+        return len(self.levels[0])
+
+    @property
+    def root(self) -> bytes:
+        if not self.levels[0]:
+            return SHA256.digest_bytes(b"")
+        return self.levels[-1][0]
+
+    @property
+    def root_hex(self) -> str:
+        return self.root.hex()
+
+    def proof(self, position: int) -> List[Tuple[str, str]]:
+        """
+            Inclusion proof of the leaf at the given position.
+
+            :return: The path to the root, as (sibling hash in hex, "left" or "right": the side of the sibling).
+        """
+        if not 0 <= position < len(self):
+            raise IndexError(f"No leaf at position {position}")
+        path = []
+        for level in self.levels[:-1]:
+            sibling = position ^ 1
+            if sibling < len(level): # otherwise the node is promoted, nothing to hash on this level
+                path.append((level[sibling].hex(), "left" if sibling < position else "right"))
+            position //= 2
+        return path
+
+    @classmethod
+    def verify_proof(cls, leaf: bytes, proof: List[Tuple[str, str]], root_hex: str) -> bool:
+        """Check that the leaf (transaction hash) is included in the tree with the given root."""
+        node = SHA256.digest_bytes(cls.LEAF_PREFIX + leaf)
+        for sibling_hex, side in proof:
+            sibling = bytes.fromhex(sibling_hex)
+            if side == "left":
+                node = SHA256.digest_bytes(cls.NODE_PREFIX + sibling + node)
+            elif side == "right":
+                node = SHA256.digest_bytes(cls.NODE_PREFIX + node + sibling)
+            else:
+                return False
+        return node.hex() == root_hex
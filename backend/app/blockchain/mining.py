@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+
+Proof-of-Work nonce search.
+
+"""
+from blockchain.hashing.sha2 import SHA256Hasher
+from models.mining_criterion import MiningCriterion
+
+import os
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from dataclasses import dataclass
+from typing import Callable, Optional, Tuple
+
+class BlockMiner:
+    """
+        Nonce search for a single block.
+
+        The block hash is SHA256(prefix + nonce), where the prefix (previous hash, timestamp, transaction hashes) 
+        doesn't depend on the nonce. The prefix is hashed once, the SHA-256 state after its full 64-byte blocks 
+        (midstate) is cached, so each attempt only compresses the last 1-2 blocks, independently of the number of transactions.
+    """
+    def __init__(self, block):
+        self.midstate = SHA256Hasher(block.hash_prefix().encode('utf-8'))
+
+    def hash_for_nonce(self, nonce: int) -> str:
+        """Same as Block.compute_hash with the given nonce."""
+        return self.midstate.copy().update(str(nonce).encode('utf-8')).hexdigest()
+
+    def search(
+            self, 
+            criteria: Callable[[str], bool], 
+            start_nonce: int = 0, 
+            max_iterations: Optional[int] = None,
+            batch_size: int = 1
+        ) -> Optional[Tuple[int, str]]:
+        """
+            Try the nonces start_nonce, start_nonce + 1, ... in order.
+
+            :param criteria: Mining criterion check, e.g. MiningCriterion.check.
+            :param max_iterations: Number of nonces to try, unlimited if None.
+            :param batch_size: Number of consecutive nonces hashed together (on NumPy lanes, see SHA256Hasher.hexdigest_many).
+            :return: The first (nonce, hash) satisfying the criteria, None if not found within max_iterations.
+        """
+        midstate = self.midstate
+        nonce = start_nonce
+        end_nonce = None if max_iterations is None else start_nonce + max_iterations
+        while end_nonce is None or nonce < end_nonce:
+            batch_end = nonce + batch_size if end_nonce is None else min(nonce + batch_size, end_nonce)
+            if batch_size == 1:
+                hashes = [midstate.copy().update(str(nonce).encode('utf-8')).hexdigest()]
+            else:
+                hashes = midstate.hexdigest_many([str(n).encode('utf-8') for n in range(nonce, batch_end)])
+            for candidate, block_hash in zip(range(nonce, batch_end), hashes):
+                if criteria(block_hash):
+                    return candidate, block_hash
+            nonce = batch_end
+        return None
+
+
+@dataclass
+class MiningResult:
+    nonce: Optional[int] # None if no valid nonce was found within the budget
+    hash: Optional[str]
+    attempts: int # number of hashes computed (by all workers)
+    elapsed: float # seconds
+
+    @property
+    def hashes_per_second(self) -> float:
+        return self.attempts / self.elapsed if self.elapsed > 0 else 0.0
+
+# Shared state of the worker processes, set by the pool initializer:
+_found_nonce = None # smallest valid nonce found so far, -1 if none
+_cancelled = None # set when the search is stopped (time budget)
+_CANCEL_CHECK_INTERVAL = 1024 # nonces between checks of the shared state
+BATCH_SIZE = 256 # nonces hashed together by the workers
+
+def _init_worker(found_nonce, cancelled):
+    global _found_nonce, _cancelled
+    _found_nonce = found_nonce
+    _cancelled = cancelled
+
+def _search_chunk(miner: BlockMiner, criterion: MiningCriterion, start: int, end: int) -> Tuple[Optional[int], Optional[str], int]:
+    """
+        Worker: search the nonces [start, end) in order.
+
+        Gives up early if the search is cancelled, or if a valid nonce smaller than the remaining ones was already found 
+        (by another worker), since the serial search would have stopped there.
+    """
+    attempts = 0
+    for sub_start in range(start, end, _CANCEL_CHECK_INTERVAL):
+        found = _found_nonce.value
+        if _cancelled.is_set() or (found != -1 and found < sub_start):
+            break
+        sub_end = min(sub_start + _CANCEL_CHECK_INTERVAL, end)
+        result = miner.search(criterion.check, start_nonce=sub_start, max_iterations=sub_end - sub_start, batch_size=BATCH_SIZE)
+        if result is not None:
+            attempts += result[0] - sub_start + 1
+            with _found_nonce.get_lock():
+                if _found_nonce.value == -1 or result[0] < _found_nonce.value:
+                    _found_nonce.value = result[0]
+            return result[0], result[1], attempts
+        attempts += sub_end - sub_start
+    return None, None, attempts
+
+class ParallelMiner:
+    """
+        Multi-process nonce search.
+
+        The nonce space is cut into chunks, handed out to a process pool in increasing order. Once a worker finds a valid nonce, 
+        no new chunks are scheduled and the chunks above it are abandoned, but the chunks below it are finished, 
+        so the result is the same (first) nonce the serial BlockMiner.search returns.
+
+        The pool is kept between searches, call close() (or use it as a context manager) to shut it down.
+    """
+    def __init__(self, workers: Optional[int] = None, chunk_size: int = 16384):
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+
+        self._found_nonce = multiprocessing.Value("q", -1)
+        self._cancelled = multiprocessing.Event()
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers, 
+                initializer=_init_worker, 
+                initargs=(self._found_nonce, self._cancelled)
+            )
+        return self._pool
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+
+    def __enter__(self) -> "ParallelMiner":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def mine(
+            self, 
+            block, 
+            criterion: MiningCriterion, 
+            start_nonce: int = 0, 
+            max_iterations: Optional[int] = None, 
+            timeout: Optional[float] = None
+        ) -> MiningResult:
+        """
+            Search for the first nonce >= start_nonce for which the block hash satisfies the criterion.
+
+            :param max_iterations: Number of nonces to try, unlimited if None.
+            :param timeout: Time budget in seconds, unlimited if None. 
+                NOTE: if the budget runs out after a nonce was found, that nonce is valid, but not necessarily the first one.
+            :return: MiningResult, with nonce and hash set to None if nothing was found within the budget.
+        """
+        pool = self._get_pool()
+        miner = BlockMiner(block)
+        self._found_nonce.value = -1
+        self._cancelled.clear()
+
+        start_time = time.perf_counter()
+        deadline = None if timeout is None else start_time + timeout
+        end_nonce = None if max_iterations is None else start_nonce + max_iterations
+
+        next_start = start_nonce
+        pending = set()
+        best: Optional[Tuple[int, str]] = None
+        attempts = 0
+        while True:
+            # Keep every worker busy (two chunks each, so there is no idle time between chunks):
+            while (
+                best is None and not self._cancelled.is_set() and len(pending) < 2 * self.workers 
+                and (end_nonce is None or next_start < end_nonce)
+            ):
+                chunk_end = next_start + self.chunk_size if end_nonce is None else min(next_start + self.chunk_size, end_nonce)
+                pending.add(pool.submit(_search_chunk, miner, criterion, next_start, chunk_end))
+                next_start = chunk_end
+            if not pending:
+                break
+
+            # NOTE: once cancelled, block until the running chunks return (a zero timeout would spin)
+            wait_time = None if deadline is None or self._cancelled.is_set() else max(0.0, deadline - time.perf_counter())
+            done, pending = wait(pending, timeout=wait_time, return_when=FIRST_COMPLETED)
+            for future in done:
+                nonce, block_hash, chunk_attempts = future.result()
+                attempts += chunk_attempts
+                if nonce is not None and (best is None or nonce < best[0]):
+                    best = (nonce, block_hash)
+            if deadline is not None and time.perf_counter() >= deadline:
+                self._cancelled.set() # the running chunks return at their next check
+
+        elapsed = time.perf_counter() - start_time
+        if best is None:
+            return MiningResult(nonce=None, hash=None, attempts=attempts, elapsed=elapsed)
+        return MiningResult(nonce=best[0], hash=best[1], attempts=attempts, elapsed=elapsed)
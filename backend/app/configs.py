@@ -9,6 +9,7 @@ from dataclasses import dataclass
 import logging
 import sys
 from pathlib import Path
+from typing import Optional
 
 cwd = Path(__file__).parent
 
@@ -17,9 +18,35 @@ class Configs:
     MINING_REWARD: int = 10
     BLOCKCHAIN_LOCATION: str = str(cwd / "blockchain/BLOCKCHAIN.json")
     USER_LOCATION: str = str(cwd / "blockchain/USERS.json")
-    PENDING_TRANSACTIONS: int = 1
+    BLOCK_STORE_LOCATION: str = str(cwd / "blockchain/store") # append-only block store, the JSON chain is imported into it once
+    BLOCK_STORE_FSYNC_EVERY: int = 1 # fsync after every n-th stored block, 0: leave it to the OS
+    BLOCK_CACHE_SIZE: int = 1024 # blocks of the stored chain kept decoded in memory
+    LEDGER_SNAPSHOT_LOCATION: str = str(cwd / "blockchain/store/ledger_snapshot.json")
+    LEDGER_SNAPSHOT_EVERY: int = 1000 # blocks between two balance snapshots
+    BLOCKCHAIN_PAGE_SIZE: int = 100 # default number of blocks per /blockchain page
+    BLOCKCHAIN_MAX_PAGE_SIZE: int = 1000
+    USERS_PAGE_SIZE: int = 100 # default number of users per /users page (also listed by /info)
+    USERS_MAX_PAGE_SIZE: int = 1000
+    PENDING_TRANSACTIONS: int = 1 # transactions per block, a block is created once the mempool has this many
+    MEMPOOL_CAPACITY: int = 100000 # max pending transactions, the oldest one is evicted for a new one, 0: unbounded
+    MEMPOOL_MAX_PER_SENDER: int = 1000 # max pending transactions of a sender, 0: unlimited
+    MEMPOOL_TTL: Optional[float] = 86400 # seconds until a pending transaction expires, None: never
+    PENDING_PREVIEW_SIZE: int = 100 # pending transactions listed by /info (the first ones in hash order)
     MINING_TYPE: str = "leading_zeros"
     MINING_DIFFICULTY: int = 3
+    BLOCK_VERSION: int = 2 # hash format of new blocks, 1: legacy (all transaction hashes), 2: merkle root
+    PUBLIC_KEY_CACHE_SIZE: int = 256 # public keys with a cached precomputed table (~180 KB each), 0 to disable
+    AUDIT_ON_STARTUP: bool = False # validate the whole loaded chain (hashes, PoW, signatures) when the server starts, or run python -m blockchain.blockchain (see its __main__)
+    AUDIT_WORKERS: Optional[int] = None # processes of the audit, None: CPU count, 1: serial
+    ACTION_BATCH_SIZE: int = 256 # max actions taken from the queue and executed together
+    ACTION_BATCH_WAIT_MS: float = 0 # extra wait for a batch to fill up once the first action arrived, 0: take what is queued
+    ACTION_LOG_EVERY: int = 1000 # actions between two info level summaries of the action processor
+    VERIFICATION_WORKERS: Optional[int] = 1 # processes verifying the actions off the event loop, None: CPU count, 0: verify on the event loop
+    ACTION_QUEUE_CAPACITY: int = 10000 # max queued actions, further submissions get 429, 0: unbounded
+    ACTION_RETRY_AFTER: int = 1 # seconds, Retry-After hint of the rejected (429, 503) submissions
+    PREVERIFY_SIGNATURES: bool = False # check the transaction signatures on submission, before queueing them
+    PREVERIFY_WORKERS: Optional[int] = 1 # processes of the pre-verification, None: CPU count
+    SUBMIT_BATCH_MAX_SIZE: int = 10000 # max actions per /submit_actions request
 
 configs = Configs()
 
@@ -7,12 +7,19 @@ Async execution engine for the queued actions.
 """
 
 import asyncio
-from typing import Dict, List, Tuple
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from itertools import groupby
+from typing import Any, Callable, Dict, List, Tuple, Optional, Set
 from logging import Logger
 import json
 
 from models.user import User
 from models.mining_criterion import MiningCriterion
+from models.wallet import Ledger
+from engine.mempool import Mempool
+from engine import verification
 from blockchain.blockchain import Blockchain
 from blockchain.block import Transaction, Block
 from blockchain.digital_signature.ecc import ECC, secp256k1
@@ -21,7 +28,7 @@ from configs import configs
 
 
 class Engine:
-    def __init__(self, blockchain: Blockchain, logger: Logger):
+    def __init__(self, blockchain: Blockchain, logger: Logger, ledger: Optional[Ledger] = None):
         """
 
         The main engine of the blockchain system.
@@ -30,17 +37,33 @@ class Engine:
         self.logger = logger
         # Keep track of users:
         self.current_users: Dict[str, User] = {} # users by name, usernames should be unique!
+        self.users_by_key: Dict[Tuple[int, int], User] = {} # the same users by public key (for the login), kept in sync by add_user/remove_user
+        self.usernames: List[str] = [] # the same users in registration order (for the pages of list_users), kept in sync too
 
         # Connect to the blockchain:
         self.blockchain: Blockchain = blockchain
         self.criterion: MiningCriterion = blockchain.criterion
 
         # Temporary storage for pending transactions:
-        self.pending_transactions: List[Transaction] = []
+        self.mempool = Mempool(capacity=configs.MEMPOOL_CAPACITY, max_per_sender=configs.MEMPOOL_MAX_PER_SENDER, ttl=configs.MEMPOOL_TTL)
         self.pending_blocks: Dict[int, Block] = {} # blocks by their uuid
+        self.pending_replay_keys: Set[Tuple[int, int]] = set() # replay keys of the transactions not in the chain yet
+
+        # Balances, restored from the latest snapshot and the blocks after it:
+        self.ledger: Ledger = ledger if ledger is not None else Ledger()
+        self.ledger.restore(blockchain)
 
         # Optional control variables...
         self.max_pending_transactions = configs.PENDING_TRANSACTIONS # max number of pending transactions
+        self.processed_actions = 0 # executed actions, see execute_actions
+        self.failed_actions = 0 # actions of the batches that raised, see process_action
+        self.verification_workers = configs.VERIFICATION_WORKERS # size of the verification pool, see execute_actions_offloaded
+        self._verification_pool: Optional[ProcessPoolExecutor] = None
+        self._worker_cache_stats: Dict[int, dict] = {} # latest point cache counters by worker pid, see point_cache_stats
+        self._index_build: Optional[asyncio.Future] = None # background build of the chain index, see build_index_in_background
+
+        # Precomputed tables for the public keys of frequent senders (speeds up signature verification):
+        secp256k1.enable_point_cache(configs.PUBLIC_KEY_CACHE_SIZE)
 
     def add_user(self, user: User):
         """
@@ -48,16 +71,22 @@ class Engine:
         """
         if user.username in self.current_users:
             raise ValueError(f"Name {user.username} already taken. Choose another unique name.")
+        elif tuple(user.public_key) in self.users_by_key:
+            raise ValueError(f"Public key already registered. Generate a new key pair.")
         else:
-            self.logger.info("Adding user, from the engine btw.")
+            self.logger.debug(f"Adding user {user.username}.") # NOTE: debug level, load_users adds every user through here
             self.current_users[user.username] = user # only add if it does not exist
+            self.users_by_key[tuple(user.public_key)] = user
+            self.usernames.append(user.username)
 
     def remove_user(self, user: User):
         """
         Remove a user from the system.
         """
         if user.username in self.current_users:
-            del self.current_users[user.username]
+            removed = self.current_users.pop(user.username)
+            self.users_by_key.pop(tuple(removed.public_key), None)
+            self.usernames.remove(user.username) # NOTE: O(n), but removals are rare, unlike listing
         else:   
             self.logger.error(f"User {user.username} not found.")
 
@@ -65,10 +94,14 @@ class Engine:
         """
         Get a user by their public key.
         """
-        for user in self.current_users.values():
-            if user.public_key == public_key:
-                return user
-        raise ValueError(f"User with public key {public_key} not found.")
+        user = self.users_by_key.get(tuple(public_key))
+        if user is None:
+            raise ValueError(f"User with public key {public_key} not found.")
+        return user
+
+    def list_users(self, start: int = 0, limit: int = 100) -> List[User]:
+        """A page of the users, in registration order (O(limit), whatever the start)."""
+        return [self.current_users[username] for username in self.usernames[start:start + limit]]
 
     def verify_user(self, user: User):
         if user.username in self.current_users:
@@ -106,43 +139,237 @@ class Engine:
         if signature is None or public_key is None:
             return False
         
-        r,s = signature
         h = int(SHA256.digest(data), 16) % curve.n
-        if not (1 <= r < curve.n and 1 <= s < curve.n):
-            return False
+        return curve.verify(h, signature, public_key)
+
+    def point_cache_stats(self, curve: ECC = secp256k1) -> dict:
+        """
+        Capacity, size and hit/miss counters of the public key table cache, 
+        summed over this process and the workers of the verification pool (each has its own cache).
+        """
+        stats = {"capacity": 0, "size": 0, "hits": 0, "misses": 0}
+        caches = list(self._worker_cache_stats.values())
+        if curve.point_cache is not None:
+            caches.append(curve.point_cache.stats())
+        for cache in caches:
+            for key in stats:
+                stats[key] += cache[key]
+        return stats
+
+    def audit_chain(self, workers: Optional[int] = None) -> bool:
+        """Full audit of the chain, including the transaction signatures of the registered users (in parallel, unless workers is 1)."""
+        public_keys = {name: user.public_key for name, user in self.current_users.items()}
+        valid = self.blockchain.validate_chain(parallel=workers != 1, workers=workers, public_keys=public_keys)
+        if valid:
+            self.logger.info(f"Chain audit passed ({len(self.blockchain.chain)} blocks).")
+        else:
+            self.logger.warning(f"Chain audit failed, valid up to position {self.blockchain.validated_index}.")
+        return valid
 
-        s_inv = pow(s, -1, curve.n)
-        u1 = (h * s_inv) % curve.n
-        u2 = (r * s_inv) % curve.n
+    def build_index_in_background(self):
+        """Start building the chain index in a thread (see Blockchain.build_index), the lookups await it with wait_for_index."""
+        if not self.blockchain.index_built:
+            self._index_build = asyncio.get_running_loop().run_in_executor(None, self.blockchain.build_index)
 
-        # Compute P = u1*G + u2*Q
-        P = curve.add_points(
-            curve.scalar_multiply(u1, curve.G),
-            curve.scalar_multiply(u2, public_key)
-        )
+    async def wait_for_index(self):
+        """Wait for the background build of the chain index (if any), so a lookup doesn't build it on the event loop."""
+        if self._index_build is not None:
+            await asyncio.shield(self._index_build) # NOTE: a cancelled waiter (e.g. a disconnected client) mustn't cancel the build
 
-        return P[0] % curve.n == r  # Check if x-coord matches r
+    def is_known_transaction(self, transaction: Transaction) -> bool:
+        """True if the same signed transaction is already pending or in the chain (duplicate or replay)."""
+        return transaction.replay_key() in self.pending_replay_keys or self.blockchain.index.is_replay(transaction)
+
+    @property
+    def pending_transactions(self) -> List[Transaction]:
+        """The pending transactions in hash order (the order they are put into blocks)."""
+        return list(self.mempool)
+
+    def add_pending_transaction(self, transaction: Transaction):
+        """Add a verified transaction to the mempool, raises ValueError if the mempool rejects it (see Mempool.add)."""
+        evicted = self.mempool.add(transaction)
+        self.pending_replay_keys.add(transaction.replay_key())
+        self.ledger.add_pending(transaction)
+        self.drop_pending_transactions(evicted, "evicted")
+
+    def expire_pending_transactions(self):
+        self.drop_pending_transactions(self.mempool.expire(), "expired")
+
+    def drop_pending_transactions(self, transactions: List[Transaction], reason: str):
+        """Forget transactions removed from the mempool without being put into a block, they can be submitted again."""
+        for tx in transactions:
+            self.pending_replay_keys.discard(tx.replay_key())
+            self.ledger.remove_pending(tx)
+        if transactions:
+            self.logger.info(f"{len(transactions)} pending transactions {reason}.")
+
+    def take_pending_block(self) -> List[Transaction]:
+        """The transactions of a new block, removed from the mempool (they stay known until the block is mined or dropped)."""
+        return self.mempool.take_block(self.max_pending_transactions)
+
+    def add_block(self, block: Block) -> bool:
+        """Add a verified block to the chain and apply it to the ledger."""
+        # NOTE: checked before the block is committed, the ledger couldn't apply it afterwards (the chain and the store would be ahead of it)
+        if self.ledger.height != len(self.blockchain.chain) or self.ledger.block_hash != self.blockchain.chain[-1].hash:
+            self.logger.error(f"The ledger (height {self.ledger.height}) is out of sync with the chain ({len(self.blockchain.chain)} blocks), restoring it.")
+            self.ledger.restore(self.blockchain)
+        if not self.blockchain.add_block(block):
+            return False
+        self.ledger.apply_block(len(self.blockchain.chain) - 1, block.hash, block.data)
+        self.pending_replay_keys.difference_update(tx.replay_key() for tx in block.data) # indexed by the chain from now on
+        return True
 
     def verify_block(self, block: Block):
         """Verify the transactions inside a block."""
-        try:
-            for tx in block.data:
-                assert tx.verify(self.current_users.get(tx.sender).public_key), f"Invalid signature in transaction: {tx}"
-            return True
-        except Exception as e:
-            self.logger.error(e)
-            return False
+        senders = [self.current_users.get(tx.sender) for tx in block.data]
+        results = Transaction.verify_batch(block.data, [user.public_key if user else None for user in senders])
+        for tx, valid in zip(block.data, results):
+            if not valid:
+                self.logger.error(f"Invalid signature in transaction: {tx.json_serialize()}")
+        return all(results)
+
+    def prepare_actions(self, actions: list) -> List[Tuple[type, list, Optional[Callable], Any]]:
+        """
+        Group consecutive actions of the same type and collect their verification (see Action.prepare_batch): 
+        (action type, actions, verification function, its argument) per group.
+        """
+        groups = []
+        for action_type, group in groupby(actions, key=type):
+            group = list(group)
+            groups.append((action_type, group, *action_type.prepare_batch(group, self)))
+        return groups
+
+    def apply_actions(self, groups: List[Tuple[type, list, Optional[Callable], Any]], verified: list) -> List[bool]:
+        """Apply the verified groups to the engine state, in order."""
+        self.expire_pending_transactions()
+        results = []
+        for (action_type, group, _, argument), group_verified in zip(groups, verified):
+            results.extend(action_type.apply_batch(group, self, argument, group_verified))
+            self.processed_actions += len(group)
+        return results
+
+    def execute_actions(self, actions: list) -> List[bool]:
+        """Execute actions in order, verifying them on the spot."""
+        groups = self.prepare_actions(actions)
+        return self.apply_actions(groups, [function(argument) if function is not None else None for _, _, function, argument in groups])
+
+    def _get_verification_pool(self) -> ProcessPoolExecutor:
+        if self._verification_pool is None:
+            self._verification_pool = ProcessPoolExecutor(
+                max_workers=self.verification_workers, 
+                initializer=verification.init_worker, 
+                initargs=(configs.PUBLIC_KEY_CACHE_SIZE,)
+            )
+        return self._verification_pool
+
+    def close_verification_pool(self):
+        if self._verification_pool is not None:
+            self._verification_pool.shutdown(wait=False, cancel_futures=True)
+            self._verification_pool = None
+            self._worker_cache_stats.clear()
+
+    async def execute_actions_offloaded(self, actions: list) -> List[bool]:
+        """
+        Execute actions in order, with the verification running in the process pool, so the event loop keeps serving requests meanwhile.
+        The state changes are applied on the loop once the whole batch is verified.
+        If the pool fails (e.g. a worker died, which breaks the whole pool), the groups are verified on the loop instead 
+        and the pool is recreated for the next batch.
+        """
+        groups = self.prepare_actions(actions)
+        loop = asyncio.get_running_loop()
+        futures = []
+        for _, _, function, argument in groups:
+            future = None
+            if function is not None:
+                try:
+                    future = loop.run_in_executor(self._get_verification_pool(), verification.run_in_worker, function, argument)
+                except Exception as e: # NOTE: a broken pool already raises on submit
+                    self.logger.error(f"Verification couldn't be submitted to the worker ({e!r}), verifying on the event loop.")
+                    if isinstance(e, BrokenProcessPool):
+                        self.close_verification_pool()
+            futures.append(future)
+
+        verified = []
+        for (_, _, function, argument), future in zip(groups, futures):
+            if future is None:
+                verified.append(function(argument) if function is not None else None)
+                continue
+            try:
+                result, pid, cache_stats = await future
+            except Exception as e:
+                self.logger.error(f"Verification failed in the worker ({e!r}), verifying on the event loop.")
+                if isinstance(e, BrokenProcessPool):
+                    self.close_verification_pool()
+                verified.append(function(argument))
+                continue
+            verified.append(result)
+            if cache_stats is not None:
+                self._worker_cache_stats[pid] = cache_stats
+        return self.apply_actions(groups, verified)
 
-    async def process_action(self, queue: asyncio.Queue):
+    @staticmethod
+    async def next_batch(queue: asyncio.Queue, batch_size: int, wait_ms: float = 0) -> list:
         """
-        Process actions from the queue.
+        Wait for an action, then take the ones queued behind it, up to batch_size.
+        With wait_ms > 0 a batch that isn't full yet waits once that long for more actions.
+        """
+        batch = [await queue.get()]
+        waited = wait_ms <= 0
+        while len(batch) < batch_size:
+            try:
+                batch.append(queue.get_nowait())
+            except asyncio.QueueEmpty:
+                if waited:
+                    break
+                # NOTE: a plain sleep instead of wait_for(queue.get()), a timed out get could drop an action
+                await asyncio.sleep(wait_ms / 1000)
+                waited = True
+        return batch
+
+    async def process_action(
+            self, 
+            queue: asyncio.Queue, 
+            batch_size: Optional[int] = None, 
+            wait_ms: Optional[float] = None, 
+            workers: Optional[int] = None
+        ):
         """
+        Process actions from the queue in batches (see next_batch), verified in a process pool unless workers is 0
+        (see execute_actions_offloaded, defaults to configs.VERIFICATION_WORKERS).
+        A batch that raises is logged and counted as failed, the processing goes on with the next one.
+        """
+        batch_size = max(1, batch_size or configs.ACTION_BATCH_SIZE)
+        wait_ms = configs.ACTION_BATCH_WAIT_MS if wait_ms is None else wait_ms
+        self.verification_workers = configs.VERIFICATION_WORKERS if workers is None else workers
         self.logger.info("🚀 Action processor started!")
         self.logger.info(f"Queue size: {queue.qsize()}")
+        try:
+            await self._process_batches(queue, batch_size, wait_ms)
+        finally:
+            self.close_verification_pool()
+
+    async def _process_batches(self, queue: asyncio.Queue, batch_size: int, wait_ms: float):
+        logged = self.processed_actions
         while True:
-            action = await queue.get()
-            if action is not None:
-                self.logger.info(f"Executing action: {action.action_type}")
-                action(self)
-                self.logger.info(self.pending_transactions)
-                self.logger.info(f"Blocks to verify: {self.pending_blocks}")
\ No newline at end of file
+            batch = [action for action in await self.next_batch(queue, batch_size, wait_ms) if action is not None]
+            await self.wait_for_index() # NOTE: the replay check of the transactions looks up the chain index
+            try:
+                if self.verification_workers != 0:
+                    await self.execute_actions_offloaded(batch)
+                else:
+                    self.execute_actions(batch)
+            except Exception:
+                # NOTE: the actions applied before the error stay applied, the whole batch is reported
+                self.failed_actions += len(batch)
+                self.logger.exception(f"Batch of {len(batch)} actions failed: {batch!r}")
+                continue
+
+            # NOTE: the full pending state is only logged at debug level, formatting it per action dominated the processing
+            if self.logger.isEnabledFor(logging.DEBUG):
+                self.logger.debug(f"Executed {len(batch)} actions: {[action.action_type for action in batch]}")
+                self.logger.debug(f"Pending transactions: {self.pending_transactions}")
+                self.logger.debug(f"Blocks to verify: {self.pending_blocks}")
+            if self.processed_actions - logged >= configs.ACTION_LOG_EVERY:
+                logged = self.processed_actions
+                self.logger.info(f"Processed {self.processed_actions} actions, {len(self.mempool)} pending transactions, "
+                                 f"{len(self.pending_blocks)} blocks to verify, {queue.qsize()} queued")
\ No newline at end of file
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+
+Pool of the pending (verified, not yet in a block) transactions.
+
+"""
+import heapq
+import time
+from collections import deque
+
+from typing import Callable, Deque, Dict, Iterator, List, Optional, Tuple
+from blockchain.block import Transaction
+
+Key = Tuple[int, int] # see Transaction.replay_key
+
+class Mempool:
+    """
+        Pending transactions in deterministic hash order: a heap of the keys (transaction hash, signature r),
+        so inserting is O(log n) and take_block(n) pops the n smallest in O(n log n), without sorting the whole pool.
+
+        Removed, expired and evicted transactions are deleted lazily: they are only dropped from the dict of the entries,
+        their heap and age queue items are skipped when reached (and compacted when they outnumber the live ones).
+        NOTE: the key includes the signature, the hash alone isn't unique (repeated payments of the same amount).
+    """
+    def __init__(self, capacity: int = 0, max_per_sender: int = 0, ttl: Optional[float] = None, clock: Callable[[], float] = time.monotonic):
+        """
+            :param capacity: Max number of transactions, the oldest one is evicted to make room for a new one. 0: unbounded.
+            :param max_per_sender: Max pending transactions of a sender, further ones are rejected. 0: unlimited.
+            :param ttl: Seconds after which a pending transaction expires (see expire), None: never.
+            :param clock: Time source of the expiry.
+        """
+        self.capacity = capacity
+        self.max_per_sender = max_per_sender
+        self.ttl = ttl
+        self.clock = clock
+
+        self._entries: Dict[Key, Tuple[Transaction, int, float]] = {} # transaction, insertion number, insertion time by key
+        self._heap: List[Key] = [] # keys in hash order, with stale ones
+        self._ages: Deque[Tuple[int, Key]] = deque() # (insertion number, key) oldest first, with stale ones
+        self._senders: Dict[str, int] = {} # number of pending transactions by sender
+        self._inserted = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, transaction: Transaction) -> bool:
+        return transaction.replay_key() in self._entries
+
+    def __iter__(self) -> Iterator[Transaction]:
+        """The transactions in hash order (sorts the whole pool, see preview for the first few)."""
+        return (self._entries[key][0] for key in sorted(self._entries))
+
+    def preview(self, n: int) -> List[Transaction]:
+        """
+            The (at most) n first transactions in hash order, without removing them.
+            Walks the heap from its root (a node is only reached after its parent), so it is O(n log n) instead of sorting the whole pool.
+        """
+        preview, listed = [], set()
+        frontier = [(self._heap[0], 0)] if self._heap else [] # heap nodes to visit, by key
+        while frontier and len(preview) < n:
+            key, i = heapq.heappop(frontier)
+            if key in self._entries and key not in listed: # NOTE: a key removed and added again is in the heap twice
+                preview.append(self._entries[key][0])
+                listed.add(key)
+            for child in (2 * i + 1, 2 * i + 2):
+                if child < len(self._heap):
+                    heapq.heappush(frontier, (self._heap[child], child))
+        return preview
+
+    def pending_of(self, sender: str) -> int:
+        return self._senders.get(sender, 0)
+
+    def add(self, transaction: Transaction) -> List[Transaction]:
+        """
+            Add a transaction, returns the ones evicted to make room for it.
+            Raises ValueError for a duplicate or if the sender reached its limit.
+        """
+        key = transaction.replay_key()
+        if key in self._entries:
+            raise ValueError("Duplicate transaction.")
+        if self.max_per_sender and self.pending_of(transaction.sender) >= self.max_per_sender:
+            raise ValueError(f"Too many pending transactions from {transaction.sender}.")
+
+        evicted = []
+        while self.capacity and len(self._entries) >= self.capacity:
+            evicted.append(self._pop_oldest())
+
+        self._inserted += 1
+        self._entries[key] = (transaction, self._inserted, self.clock())
+        heapq.heappush(self._heap, key)
+        self._ages.append((self._inserted, key))
+        self._senders[transaction.sender] = self.pending_of(transaction.sender) + 1
+        return evicted
+
+    def _delete(self, key: Key) -> Transaction:
+        transaction = self._entries.pop(key)[0]
+        count = self._senders[transaction.sender] - 1
+        if count:
+            self._senders[transaction.sender] = count
+        else:
+            del self._senders[transaction.sender]
+        self._compact()
+        return transaction
+
+    def _compact(self):
+        """Rebuild the heap and the age queue once most of their items are stale."""
+        if len(self._heap) > 2 * len(self._entries) + 32:
+            self._heap = list(self._entries)
+            heapq.heapify(self._heap)
+        if len(self._ages) > 2 * len(self._entries) + 32:
+            self._ages = deque(sorted((number, key) for key, (_, number, _) in self._entries.items()))
+
+    def _live(self, number: int, key: Key) -> bool:
+        entry = self._entries.get(key)
+        return entry is not None and entry[1] == number
+
+    def _pop_oldest(self) -> Transaction:
+        while not self._live(*self._ages[0]):
+            self._ages.popleft()
+        return self._delete(self._ages.popleft()[1])
+
+    def remove(self, transaction: Transaction) -> bool:
+        """Remove a transaction, False if it isn't pending."""
+        key = transaction.replay_key()
+        if key not in self._entries:
+            return False
+        self._delete(key)
+        return True
+
+    def expire(self, now: Optional[float] = None) -> List[Transaction]:
+        """Remove the transactions older than the ttl, returns them."""
+        if self.ttl is None:
+            return []
+        deadline = (self.clock() if now is None else now) - self.ttl
+        expired = []
+        while self._ages:
+            number, key = self._ages[0]
+            if not self._live(number, key):
+                self._ages.popleft()
+            elif self._entries[key][2] <= deadline:
+                self._ages.popleft()
+                expired.append(self._delete(key))
+            else:
+                break # NOTE: the queue is in insertion order, so the rest is younger
+        return expired
+
+    def take_block(self, n: int) -> List[Transaction]:
+        """Remove and return the (at most) n first transactions in hash order, the content of a new block."""
+        taken = []
+        while self._heap and len(taken) < n:
+            key = heapq.heappop(self._heap)
+            if key in self._entries:
+                taken.append(self._delete(key))
+        return taken
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+
+Side-effect free verification of the queued actions.
+
+The functions only take and return plain (picklable) data, so the engine can run them in a process pool
+while the event loop keeps serving requests (see Engine.process_action). The results are applied to the
+engine state afterwards, in submission order (see Action.apply_batch).
+
+"""
+
+import os
+from typing import Any, Callable, List, Optional, Tuple
+
+from blockchain.block import Block, Transaction
+from blockchain.digital_signature.ecc import secp256k1
+from blockchain.hashing.sha2 import SHA256
+
+def init_worker(cache_size: int):
+    """Pool initializer: a worker process doesn't inherit the engine's public key table cache (see Engine.__init__)."""
+    secp256k1.enable_point_cache(cache_size)
+
+def run_in_worker(function: Callable[[Any], Any], argument: Any) -> Tuple[Any, int, Optional[dict]]:
+    """Run a verification function, return its result with the worker's pid and cache counters (see Engine.point_cache_stats)."""
+    result = function(argument)
+    return result, os.getpid(), secp256k1.point_cache.stats() if secp256k1.point_cache is not None else None
+
+def verify_transactions(payloads: List[Tuple[dict, Optional[Tuple[int, int]]]]) -> List[bool]:
+    """
+    Check the signatures of serialized transactions, in one batch.
+
+    :param payloads: The transaction (see Transaction.json_serialize) and its sender's public key (None if unknown).
+    """
+    transactions = [Transaction.load_from_dict(tx) for tx, _ in payloads]
+    return Transaction.verify_batch(transactions, [public_key for _, public_key in payloads])
+
+def verify_mined_block(payload: dict) -> dict:
+    """
+    Check a mined block against the pending block it claims to solve.
+
+    :param payload: block: the serialized block as proposed by the miner, canonical_hash: of the pending block,
+        public_keys: of the transaction senders, miner_key and signature: the miner's signature on the block hash.
+    :return: hash: the recomputed block hash, canonical: the proposed block has the pending block's content,
+        transactions: all transaction signatures are valid, miner_signature: the miner's signature is valid.
+    """
+    block = Block.load_from_dict(payload["block"]) # NOTE: the constructor recomputes the hashes
+    transactions_valid = all(Transaction.verify_batch(block.data, payload["public_keys"]))
+
+    miner_signature_valid = False
+    if payload["signature"] is not None and payload["miner_key"] is not None:
+        h = int(SHA256.digest(block.hash), 16) % secp256k1.n
+        miner_signature_valid = secp256k1.verify(h, payload["signature"], payload["miner_key"])
+    return {
+        "hash": block.hash,
+        "canonical": block.canonical_hash == payload["canonical_hash"],
+        "transactions": transactions_valid,
+        "miner_signature": miner_signature_valid
+    }
+
+def verify_mined_blocks(payloads: List[Optional[dict]]) -> List[Optional[dict]]:
+    """verify_mined_block for each payload, None for the blocks that weren't pending."""
+    return [verify_mined_block(payload) if payload is not None else None for payload in payloads]
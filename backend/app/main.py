@@ -6,29 +6,43 @@ Main FastAPI application for the blockchain network.
 
 """
 
-from fastapi import FastAPI, Depends, Request, HTTPException
+from fastapi import FastAPI, Depends, Request, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 import asyncio
 import uvicorn
-from contextlib import asynccontextmanager
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager, suppress
 from logging import Logger
 import json
 from pathlib import Path
+from typing import List, Optional
 
 from models.user import User, RegisteredUser
-from models.actions import Action
+from models.actions import Action, SubmitTransaction
 from models.mining_criterion import MiningCriterion
+from models.wallet import Ledger
 from engine.engine import Engine
+from engine import verification
 from blockchain.blockchain import Blockchain
+from blockchain.block_store import BlockStore
 from configs import configs, logger, get_logger
 
-# Initialize the action queue, the blockchain and the engine:
-action_queue = asyncio.Queue()
+# Initialize the blockchain and the engine:
 engine_criterion = MiningCriterion(type=configs.MINING_TYPE, difficulty=configs.MINING_DIFFICULTY)
 blockchain = Blockchain(criterion=engine_criterion)
-if Path(configs.BLOCKCHAIN_LOCATION).is_file():
-    blockchain.load_from_json(configs.BLOCKCHAIN_LOCATION) 
-engine = Engine(blockchain, logger)
+block_store = BlockStore(configs.BLOCK_STORE_LOCATION, fsync_every=configs.BLOCK_STORE_FSYNC_EVERY)
+imported = not len(block_store) and Path(configs.BLOCKCHAIN_LOCATION).is_file()
+if imported:
+    logger.info(f"Importing {configs.BLOCKCHAIN_LOCATION} into the block store.")
+    block_store.import_json(configs.BLOCKCHAIN_LOCATION)
+blockchain.attach_store(block_store, cache_size=configs.BLOCK_CACHE_SIZE, trusted=not imported)
+if imported and not blockchain.validate_chain():
+    # NOTE: validated once, here at the startup, the blocks this node stores afterwards are trusted on restarts
+    logger.warning(f"The imported chain is only valid up to block {blockchain.validated_index}.")
+ledger = Ledger(snapshot_path=configs.LEDGER_SNAPSHOT_LOCATION, snapshot_every=configs.LEDGER_SNAPSHOT_EVERY)
+engine = Engine(blockchain, logger, ledger=ledger)
 if Path(configs.USER_LOCATION).is_file():
     engine.load_users(configs.USER_LOCATION)
 
@@ -36,17 +50,31 @@ if Path(configs.USER_LOCATION).is_file():
 async def lifespan(app: FastAPI):
     # Bind the global instances (to be able to yield them):
     app.state.engine = engine
-    app.state.action_queue = action_queue
+    app.state.action_queue = asyncio.Queue(maxsize=configs.ACTION_QUEUE_CAPACITY) # NOTE: created here, a queue is bound to the event loop it is first used on
+    app.state.submission_counters = Counter() # accepted and rejected submissions by reason, see /queue
+    app.state.preverify_pool = ProcessPoolExecutor(
+        max_workers=configs.PREVERIFY_WORKERS, 
+        initializer=verification.init_worker, 
+        initargs=(configs.PUBLIC_KEY_CACHE_SIZE,)
+    ) if configs.PREVERIFY_SIGNATURES else None
+    if configs.AUDIT_ON_STARTUP:
+        # NOTE: runs here rather than at import, so the audit processes don't re-import the app
+        engine.audit_chain(workers=configs.AUDIT_WORKERS)
+    engine.build_index_in_background() # NOTE: the server starts without waiting for it, the index lookups await it
     loop = asyncio.get_event_loop()
-    loop.create_task(engine.process_action(action_queue)) # start the engine in the background
+    app.state.processor = loop.create_task(engine.process_action(app.state.action_queue)) # start the engine in the background
 
     logger.info("🚀 Engine initialized, action processor running.")
     yield
 
     logger.info("🧹 Server shutting down...")
-    # Optionally persist blockchain, save state here:
-    with open(configs.BLOCKCHAIN_LOCATION, "w", encoding='utf-8') as bf:
-        json.dump(app.state.engine.blockchain.json_serialize(), bf, indent=4)
+    app.state.processor.cancel() # NOTE: also stops the verification workers
+    with suppress(asyncio.CancelledError):
+        await app.state.processor
+    if app.state.preverify_pool is not None:
+        app.state.preverify_pool.shutdown(cancel_futures=True)
+    # NOTE: the blocks are persisted as they are accepted, only the unsynced ones have to be flushed
+    block_store.sync()
 
     with open(configs.USER_LOCATION, "w", encoding='utf-8') as uf:
         json.dump(app.state.engine.serialize_users(), uf, indent=4)
@@ -102,6 +130,79 @@ async def login_user(
         logger.error(e)
         return {"message": f"User login failed: {e}", "success": 0}
 
+@app.get("/users")
+async def list_users(
+        start: int = Query(0, alias="from", ge=0),
+        limit: int = Query(configs.USERS_PAGE_SIZE, ge=1, le=configs.USERS_MAX_PAGE_SIZE),
+        engine: Engine = Depends(get_engine)
+    ):
+    """
+    Get a page of the registered users, in registration order.
+    """
+    users = engine.list_users(start, limit)
+    total = len(engine.current_users)
+    return {
+        "users": [user.serialize() for user in users],
+        "total": total,
+        "next": start + len(users) if start + len(users) < total else None
+    }
+
+def reject(app: FastAPI, reason: str, status_code: int, detail: str, count: int = 1):
+    app.state.submission_counters[reason] += count
+    # NOTE: the client should back off on 429 and 503, the others won't succeed on a retry
+    headers = {"Retry-After": str(configs.ACTION_RETRY_AFTER)} if status_code in (429, 503) else None
+    raise HTTPException(status_code=status_code, detail=detail, headers=headers)
+
+def check_capacity(app: FastAPI, n: int):
+    """503 if the action processor isn't running, 429 if the queue has no room for n more actions."""
+    if app.state.processor.done():
+        reject(app, "unavailable", 503, "The action processor isn't running.", count=n)
+    queue: asyncio.Queue = app.state.action_queue
+    if queue.maxsize > 0 and queue.maxsize - queue.qsize() < n:
+        reject(app, "queue_full", 429, "Too many pending actions, retry later.", count=n)
+
+async def preverify(app: FastAPI, actions: List[Action]) -> List[Optional[str]]:
+    """
+    Check the signatures of the submitted transactions in the worker pool (in one batch), before they take up space in the queue.
+    Returns the error of each action, None if it passed (the other action types aren't checked here).
+    """
+    errors: List[Optional[str]] = [None] * len(actions)
+    positions, payloads = [], []
+    for position, action in enumerate(actions):
+        if not isinstance(action, SubmitTransaction):
+            continue
+        sender = app.state.engine.current_users.get(action.action_data.sender)
+        if sender is None:
+            errors[position] = "Sender doesn't exist"
+            app.state.submission_counters["unknown_sender"] += 1
+        else:
+            positions.append(position)
+            payloads.append((action.to_transaction().json_serialize(), sender.public_key))
+    if payloads:
+        loop = asyncio.get_running_loop()
+        results = await loop.run_in_executor(app.state.preverify_pool, verification.verify_transactions, payloads)
+        for position, valid in zip(positions, results):
+            if not valid:
+                errors[position] = "Transaction signature invalid."
+                app.state.submission_counters["invalid_signature"] += 1
+    return errors
+
+async def enqueue(app: FastAPI, actions: List[Action]) -> List[Optional[str]]:
+    """
+    Admit actions to the bounded queue as a unit, they are queued back to back (so they are processed in the same batches).
+    Raises 503 or 429 for the whole unit (see check_capacity), returns the error of each action that failed the optional
+    pre-verification (see configs.PREVERIFY_SIGNATURES), None for the queued ones.
+    """
+    check_capacity(app, len(actions))
+    errors = await preverify(app, actions) if app.state.preverify_pool is not None else [None] * len(actions)
+    admitted = [action for action, error in zip(actions, errors) if error is None]
+    check_capacity(app, len(admitted)) # NOTE: the queue could fill up during the pre-verification
+    queue: asyncio.Queue = app.state.action_queue
+    for action in admitted:
+        queue.put_nowait(action)
+    app.state.submission_counters["accepted"] += len(admitted)
+    return errors
+
 # Submit an action:
 @app.post("/submit_action")
 async def submit_action(request: Request):
@@ -112,18 +213,75 @@ async def submit_action(request: Request):
     action_type = raw.get("action_type") # check if the request has an action type field
 
     if not action_type or action_type not in Action.registry:
-        raise HTTPException(status_code=400, detail="Invalid or missing action_type")
+        reject(request.app, "invalid_action", 400, "Invalid or missing action_type")
     
     ActionClass = Action.registry[action_type] # select the action class
 
     try:
         action = ActionClass(**raw)
     except Exception as e:
-        raise HTTPException(status_code=422, detail=f"Invalid action payload: {e}")
+        reject(request.app, "invalid_action", 422, f"Invalid action payload: {e}")
 
-    await action_queue.put(action)
+    error, = await enqueue(request.app, [action])
+    if error is not None:
+        raise HTTPException(status_code=422, detail=error)
     return {"message": "Action submitted successfully", "action_type": action_type}
 
+# Submit many transactions at once:
+@app.post("/submit_actions")
+async def submit_actions(request: Request):
+    """
+    Submit transactions in bulk, as a JSON array or as NDJSON (one action per line, with an x-ndjson content type).
+    The valid ones are queued as a unit, the result lists the status of each item in order.
+    """
+    body = await request.body()
+    try:
+        if "ndjson" in request.headers.get("content-type", ""):
+            raw = [json.loads(line) for line in body.splitlines() if line.strip()]
+        else:
+            raw = json.loads(body)
+    except ValueError as e:
+        reject(request.app, "invalid_action", 400, f"Invalid JSON: {e}")
+    if not isinstance(raw, list):
+        reject(request.app, "invalid_action", 400, "Expected an array of actions")
+    if len(raw) > configs.SUBMIT_BATCH_MAX_SIZE:
+        reject(request.app, "invalid_action", 413, f"At most {configs.SUBMIT_BATCH_MAX_SIZE} actions per request", count=len(raw))
+
+    # Validate every item, the invalid ones are reported but don't fail the others:
+    errors: List[Optional[str]] = []
+    actions: List[SubmitTransaction] = []
+    for item in raw:
+        try:
+            if not isinstance(item, dict) or item.get("action_type") != "submit_transaction": # NOTE: not an assert, python -O strips those
+                raise ValueError("Only submit_transaction actions can be submitted in bulk")
+            actions.append(SubmitTransaction.model_validate(item))
+            errors.append(None)
+        except Exception as e:
+            errors.append(f"Invalid action payload: {e}")
+    request.app.state.submission_counters["invalid_action"] += len(raw) - len(actions)
+
+    queued_errors = iter(await enqueue(request.app, actions))
+    errors = [next(queued_errors) if error is None else error for error in errors]
+    return {
+        "accepted": errors.count(None),
+        "rejected": len(errors) - errors.count(None),
+        "results": [{"status": "queued"} if error is None else {"status": "rejected", "error": error} for error in errors]
+    }
+
+@app.get("/queue")
+async def get_queue_stats(request: Request):
+    """Depth of the action queue and the submission counters."""
+    queue: asyncio.Queue = request.app.state.action_queue
+    counters: Counter = request.app.state.submission_counters
+    return {
+        "depth": queue.qsize(),
+        "capacity": queue.maxsize,
+        "processed": request.app.state.engine.processed_actions,
+        "failed": request.app.state.engine.failed_actions,
+        "accepted": counters["accepted"],
+        "rejected": {reason: count for reason, count in counters.items() if reason != "accepted"}
+    }
+
 # Get info on the current transactions and blocks:
 @app.get("/info")
 async def get_blockchain_info(engine: Engine = Depends(get_engine)):
@@ -131,12 +289,9 @@ async def get_blockchain_info(engine: Engine = Depends(get_engine)):
     Get the current status of the system.
     """
     return {
-        "users": [
-            {   
-                "username": user.username,
-                "public_key": user.public_key,
-            } for user in engine.current_users.values()
-        ],
+        # NOTE: only the first page of the users, see /users for the rest
+        "users": [user.serialize() for user in engine.list_users(0, configs.USERS_PAGE_SIZE)],
+        "user_count": len(engine.current_users),
         "pending_blocks": [
             {
                 "index": block.index,
@@ -145,25 +300,111 @@ async def get_blockchain_info(engine: Engine = Depends(get_engine)):
                 "timestamp": block.timestamp,
                 "finalized": block.finalized,
                 "criterion": block.criterion.serialize(),
+                "version": block.version,
+                "merkleRoot": block.merkle_root,
             } for block in engine.pending_blocks.values()
         ],
+        # NOTE: only the first ones (the next to be put into a block), the mempool can hold a lot more
         "pending_transactions": [
             {
                 "sender": tx.sender,
                 "receiver": tx.receiver,
                 "amount": tx.amount
-            } for tx in engine.pending_transactions
-        ]
+            } for tx in engine.mempool.preview(configs.PENDING_PREVIEW_SIZE)
+        ],
+        "pending_count": len(engine.mempool)
     }
 
 @app.get("/blockchain")
-async def get_blockchain(engine: Engine = Depends(get_engine)):
-    """Endpoint to get the complete blockchain."""
+async def get_blockchain(
+        start: int = Query(0, alias="from", ge=0),
+        limit: int = Query(configs.BLOCKCHAIN_PAGE_SIZE, ge=1, le=configs.BLOCKCHAIN_MAX_PAGE_SIZE),
+        engine: Engine = Depends(get_engine)
+    ):
+    """Endpoint to get a page of the blockchain, from the given height."""
+    blocks = list(engine.blockchain.serialized_blocks(start, start + limit))
+    height = len(engine.blockchain.chain)
     return {
-        "blockchain": engine.blockchain.json_serialize()
+        "blockchain": {"blocks": blocks},
+        "from": start,
+        "limit": limit,
+        "height": height,
+        "next": start + len(blocks) if start + len(blocks) < height else None # start of the next page
     }
+
+@app.get("/blockchain/stream")
+def stream_blockchain(
+        start: int = Query(0, alias="from", ge=0),
+        limit: Optional[int] = Query(None, ge=1),
+        engine: Engine = Depends(get_engine)
+    ):
+    """Endpoint to stream the blockchain (from the given height) as NDJSON, one block per line."""
+    # NOTE: the end is fixed when the request arrives, the blocks are serialized one at a time in the threadpool
+    stop = len(engine.blockchain.chain) if limit is None else start + limit
+    lines = (json.dumps(block) + "\n" for block in engine.blockchain.serialized_blocks(start, stop))
+    return StreamingResponse(lines, media_type="application/x-ndjson")
+
+@app.get("/blocks/{block_id}")
+async def get_block(block_id: str, engine: Engine = Depends(get_engine)):
+    """Endpoint to get a single block by its height or its hash."""
+    await engine.wait_for_index()
+    height = int(block_id) if block_id.isdigit() and len(block_id) < 64 else engine.blockchain.height_of(block_id)
+    if height is None or height >= len(engine.blockchain.chain):
+        raise HTTPException(status_code=404, detail=f"Block {block_id} not found")
+    return {"height": height, "block": next(engine.blockchain.serialized_blocks(height, height + 1))}
     
 
+@app.get("/balance/{username}")
+async def get_balance(username: str, engine: Engine = Depends(get_engine)):
+    """Endpoint to get the balance of a user: confirmed (in the chain), pending and available (confirmed + pending)."""
+    ledger = engine.ledger
+    if username not in engine.current_users and username not in ledger.balances:
+        raise HTTPException(status_code=404, detail=f"User {username} not found")
+    return {
+        "username": username,
+        "balance": ledger.balance(username),
+        "pending": ledger.pending_delta(username),
+        "available": ledger.available(username),
+        "height": ledger.height
+    }
+
+@app.get("/transactions/{tx_hash}")
+async def get_transaction(tx_hash: str, engine: Engine = Depends(get_engine)):
+    """Endpoint to find a transaction in the chain by its hash (hex), the same payment can be in the chain more than once."""
+    await engine.wait_for_index()
+    try:
+        locations = engine.blockchain.index.locate_transaction(int(tx_hash, 16))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="The transaction hash must be a hex string")
+    if not locations:
+        raise HTTPException(status_code=404, detail=f"Transaction {tx_hash} not found")
+    found = []
+    for height, position in locations:
+        block = next(engine.blockchain.serialized_blocks(height, height + 1))
+        found.append({"height": height, "position": position, "block_hash": block["hash"], "transaction": block["transactions"][position]})
+    return {"hash": tx_hash, "locations": found}
+
+@app.get("/users/{username}/transactions")
+async def get_user_transactions(
+        username: str,
+        start: int = Query(0, alias="from", ge=0),
+        limit: int = Query(configs.BLOCKCHAIN_PAGE_SIZE, ge=1, le=configs.BLOCKCHAIN_MAX_PAGE_SIZE),
+        engine: Engine = Depends(get_engine)
+    ):
+    """Endpoint to get a page of the transactions sent or received by a user, in chain order."""
+    await engine.wait_for_index()
+    locations = engine.blockchain.index.transactions_of(username)
+    page = locations[start:start + limit]
+    return {
+        "username": username,
+        "total": len(locations),
+        "transactions": [
+            {"height": height, "position": position, "transaction": engine.blockchain.transaction_at(height, position)} 
+            for height, position in page
+        ],
+        "next": start + len(page) if start + len(page) < len(locations) else None
+    }
+
 if __name__ == "__main__":
     server_config = uvicorn.Config(
         "main:app",
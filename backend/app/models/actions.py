@@ -7,10 +7,12 @@ Models for available actions.
 """
 
 from pydantic import BaseModel, Field, field_validator
-from typing import Tuple, Dict, Type, Literal, ClassVar
+from typing import Tuple, Dict, Type, Literal, ClassVar, List, Optional, Callable, Any
 from uuid import uuid4
+from copy import copy
 
 from engine.engine import Engine
+from engine import verification
 from blockchain.block import Block, Transaction
 from models.mining_criterion import MiningCriterion
 from configs import configs, logger
@@ -29,6 +31,27 @@ class Action(BaseModel):
         if hasattr(cls, "action_type"):
             Action.registry[cls.action_type.__args__[0]] = cls
 
+    # Execution in two phases (see Engine.execute_actions): a side-effect free verification, which can run in a worker process, 
+    # then the state changes, applied on the event loop in submission order.
+    @classmethod
+    def prepare_batch(cls, actions: List["Action"], engine: Engine) -> Tuple[Optional[Callable], Any]:
+        """
+        The verification of consecutive actions of this type: a picklable function (see engine.verification) and its argument,
+        collected from the current engine state. (None, None) if there is nothing to verify upfront.
+        """
+        return None, None
+
+    @classmethod
+    def apply_batch(cls, actions: List["Action"], engine: Engine, argument: Any, verified: Any) -> List[bool]:
+        """Apply the actions to the engine state in order, given the prepared argument and the result of the verification."""
+        return [action(engine) for action in actions]
+
+    @classmethod
+    def execute_batch(cls, actions: List["Action"], engine: Engine) -> List[bool]:
+        """Verify and apply the actions right away."""
+        function, argument = cls.prepare_batch(actions, engine)
+        return cls.apply_batch(actions, engine, argument, function(argument) if function is not None else None)
+
 #------------------------------------------TRANSACTION-----------------------------------------
 
 class TransactionData(BaseModel):
@@ -52,37 +75,63 @@ class SubmitTransaction(Action):
     # Action data has the fields: sender, receiver, amount, signature:
     action_data: TransactionData
 
+    def to_transaction(self) -> Transaction:
+        return Transaction(
+            sender=self.action_data.sender, 
+            receiver=self.action_data.receiver,
+            amount=self.action_data.amount,
+            signature=(int(self.action_data.signature[0]), int(self.action_data.signature[1]))
+        )
+
     def __call__(self, engine: Engine):
-        try:
-            transaction = Transaction(
-                sender=self.action_data.sender, 
-                receiver=self.action_data.receiver,
-                amount=self.action_data.amount,
-                signature=(int(self.action_data.signature[0]), int(self.action_data.signature[1]))
-            ) 
-
-            # Verify transaction:
-            assert transaction.verify(engine.current_users.get(self.action_data.sender).public_key), "Transaction signature invalid."
-            # Verify if sender and receiver exist:
-            assert transaction.sender in engine.current_users and transaction.receiver in engine.current_users, "Sender or receiver doesn't exist"
-
-            # Optionally add the check to check the balances (for now we allow negative wallets).
-
-            if len(engine.pending_transactions) < engine.max_pending_transactions:
-                engine.pending_transactions.append(transaction)
-                engine.pending_transactions.sort(key=lambda tx: tx.hash_transaction()) # sort the transactions deterministically
-            if len(engine.pending_transactions) >= engine.max_pending_transactions:
-                # create a block from the pending transactions:
-                index = str(uuid4()) # create a unique ID for the block
-                new_block = Block(index=index, previous_hash=engine.blockchain.chain[-1].hash, data=engine.pending_transactions, criterion=engine.criterion)
-                engine.pending_blocks[index] = new_block
-
-                # reset the pending transactions and add the new one:
-                engine.pending_transactions = []
-            return True
-        except Exception as e:
-            logger.error(f"Error during transaction submission: {e}")
-            return False
+        return self.execute_batch([self], engine)[0]
+
+    @classmethod
+    def prepare_batch(cls, actions: List["SubmitTransaction"], engine: Engine) -> Tuple[Optional[Callable], Any]:
+        """The signatures are verified together (see Transaction.verify_batch), with the senders' current public keys."""
+        payloads = []
+        for action in actions:
+            sender = engine.current_users.get(action.action_data.sender)
+            payloads.append((action.to_transaction().json_serialize(), sender.public_key if sender else None))
+        return verification.verify_transactions, payloads
+
+    @classmethod
+    def apply_batch(cls, actions: List["SubmitTransaction"], engine: Engine, argument: Any, verified: List[bool]) -> List[bool]:
+        """
+        Add the verified transactions to the mempool, in order.
+        """
+        results = []
+        for action, (_, public_key), valid_signature in zip(actions, argument, verified):
+            transaction = action.to_transaction()
+            try:
+                # Verify if sender and receiver exist:
+                assert transaction.sender in engine.current_users and transaction.receiver in engine.current_users, "Sender or receiver doesn't exist"
+                # Verify transaction:
+                # NOTE: the sender's key could change while the batch was verified in a worker, verify again with the new one then
+                sender_key = engine.current_users[transaction.sender].public_key
+                if sender_key != public_key:
+                    valid_signature = transaction.verify(sender_key)
+                assert valid_signature, "Transaction signature invalid."
+                # Reject duplicates and replays of already accepted transactions:
+                assert not engine.is_known_transaction(transaction), "Duplicate transaction."
+
+                # Optionally add the check to check the balances (for now we allow negative wallets, see engine.ledger.available).
+
+                engine.add_pending_transaction(transaction) # NOTE: raises if the sender has too many pending transactions
+                if len(engine.mempool) >= engine.max_pending_transactions:
+                    cls.create_block(engine)
+                results.append(True)
+            except Exception as e:
+                logger.error(f"Error during transaction submission: {e}")
+                results.append(False)
+        return results
+
+    @staticmethod
+    def create_block(engine: Engine):
+        """Create a block from the pending transactions (in hash order, see Mempool.take_block)."""
+        index = str(uuid4()) # create a unique ID for the block
+        new_block = Block(index=index, previous_hash=engine.blockchain.chain[-1].hash, data=engine.take_pending_block(), criterion=engine.criterion)
+        engine.pending_blocks[index] = new_block
 
 # -----------------------------------------MINING-----------------------------------------
 
@@ -111,6 +160,42 @@ class MinedBlockValidation(Action):
     action_data: BlockValidationData
         
     def __call__(self, engine: Engine):
+        return self.execute_batch([self], engine)[0]
+
+    def verification_payload(self, engine: Engine) -> Optional[dict]:
+        """The argument of verification.verify_mined_block, None if the block isn't pending."""
+        backend_version = engine.pending_blocks.get(self.action_data.index)
+        if backend_version is None:
+            return None
+        # The proposed block to add to the blockchain:
+        proposed = backend_version.json_serialize()
+        proposed.update(
+            previous_hash=self.action_data.previous_hash,
+            timestamp=self.action_data.timestamp,
+            nonce=self.action_data.nonce,
+            criterion=self.action_data.criterion.serialize()
+        )
+        senders = [engine.current_users.get(tx.sender) for tx in backend_version.data]
+        miner = engine.current_users.get(self.action_data.miner)
+        return {
+            "block": proposed,
+            "canonical_hash": backend_version.canonical_hash,
+            "public_keys": [user.public_key if user else None for user in senders],
+            "miner_key": miner.public_key if miner else None,
+            "signature": (int(self.action_data.signature[0]), int(self.action_data.signature[1]))
+        }
+
+    @classmethod
+    def prepare_batch(cls, actions: List["MinedBlockValidation"], engine: Engine) -> Tuple[Optional[Callable], Any]:
+        payloads = [action.verification_payload(engine) for action in actions]
+        return verification.verify_mined_blocks, payloads
+
+    @classmethod
+    def apply_batch(cls, actions: List["MinedBlockValidation"], engine: Engine, argument: Any, verified: List[Optional[dict]]) -> List[bool]:
+        return [action.apply(engine, payload, result) for action, payload, result in zip(actions, argument, verified)]
+
+    def apply(self, engine: Engine, payload: Optional[dict], verified: Optional[dict]) -> bool:
+        """Add the block to the blockchain, if the verification (see verification.verify_mined_block) passed."""
         try:
             # get the relevant block from the engine:
             backend_version = engine.pending_blocks.get(self.action_data.index)
@@ -118,35 +203,32 @@ class MinedBlockValidation(Action):
                 logger.error(f"Block not found with ID: {self.action_data.index}")
                 return False
             
-            # The proposed block to add to the blockchain:
-            to_be_verified = Block(
-                index=self.action_data.index, 
-                previous_hash=self.action_data.previous_hash, 
-                data=backend_version.data, 
-                criterion=MiningCriterion.from_dict(self.action_data.criterion.serialize()), 
-                timestamp=self.action_data.timestamp, 
-                nonce=self.action_data.nonce
-            )
+            # NOTE: the block or the keys could change while the verification ran in a worker (e.g. a block created earlier in the batch), verify again then
+            current_payload = self.verification_payload(engine)
+            if verified is None or current_payload["public_keys"] != payload["public_keys"] or current_payload["miner_key"] != payload["miner_key"]:
+                verified = verification.verify_mined_block(current_payload)
 
             # Verify the block:
             # Verify the canonical hash: 
             # NOTE: this prevents maliciously redirecting the block into one containing different transactions.
-            assert to_be_verified.canonical_hash == backend_version.canonical_hash, "Invalid previous hash."
+            assert verified["canonical"], "Invalid previous hash."
 
             #Verify transactions:
-            assert engine.verify_block(to_be_verified), "Invalid transactions in block."
+            assert verified["transactions"], "Invalid transactions in block."
             # Verify PoW:
-            assert engine.criterion.check(to_be_verified.compute_hash()), f"Block hash doesn't satisfy PoW: {to_be_verified.nonce}"
+            assert engine.criterion.check(verified["hash"]), f"Block hash doesn't satisfy PoW: {self.action_data.nonce}"
             # Verify miner identity and signature:
-            signature_data = to_be_verified.compute_hash()
-            int_signature = (int(self.action_data.signature[0]), int(self.action_data.signature[1]))
-            assert engine.verify_signature(signature_data, int_signature, engine.current_users.get(self.action_data.miner).public_key), "Miner signature invalid"
+            assert verified["miner_signature"], "Miner signature invalid"
 
             # Finalize the block:
+            # NOTE: the proposed block has the pending block's content (checked above), only the nonce and the criterion differ
+            to_be_verified = copy(backend_version)
+            to_be_verified.nonce = self.action_data.nonce
+            to_be_verified.criterion = MiningCriterion.from_dict(self.action_data.criterion.serialize())
             to_be_verified.finalized = True
 
             # Add the block to the blockchain:
-            assert engine.blockchain.add_block(to_be_verified), "Block doesn't match the blockchain."
+            assert engine.add_block(to_be_verified), "Block doesn't match the blockchain."
 
             # Remove the block from the pending blocks:
             engine.logger.info(f"Block {self.action_data.index} mined by {self.action_data.miner}, added to the blockchain.")
@@ -155,7 +237,7 @@ class MinedBlockValidation(Action):
         except Exception as e:
             logger.error(f"Error during Mined Block Validation: {e}")
             return False
-        
+
 #action_lookup = {
 #    "submit_transaction": SubmitTransaction,
 #    "mined_block_validation": BlockValidationData
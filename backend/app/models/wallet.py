@@ -4,4 +4,102 @@
 
 Balance and asset tracking.
 
-"""
\ No newline at end of file
+"""
+import json
+import os
+from pathlib import Path
+
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from blockchain.block import Transaction
+from configs import logger
+
+class Ledger:
+    """
+        Per-user balances, updated block by block (the sender pays the amount to the receiver), 
+        and the pending deltas of the transactions not in the chain yet.
+
+        Every snapshot_every blocks the balances are written to the snapshot file, so on startup only the blocks 
+        after the latest snapshot have to be replayed (see restore).
+        NOTE: negative balances are allowed for now, the ledger only tracks them.
+    """
+    def __init__(self, snapshot_path: Optional[str] = None, snapshot_every: int = 1000):
+        """
+            :param snapshot_path: JSON file of the snapshots, None: no snapshots.
+            :param snapshot_every: Blocks between two snapshots.
+        """
+        self.balances: Dict[str, int] = {} # confirmed balances (from the chain)
+        self.pending: Dict[str, int] = {} # balance changes of the pending transactions
+        self._pending_keys: Set[Tuple[int, int]] = set() # replay keys of the pending transactions (see Transaction.replay_key)
+        self.height = 0 # number of applied blocks, i.e. the height of the next block
+        self.block_hash: Optional[str] = None # hash of the last applied block
+        self.snapshot_path = Path(snapshot_path) if snapshot_path else None
+        self.snapshot_every = snapshot_every
+
+    @staticmethod
+    def _add(deltas: Dict[str, int], transactions: Iterable[Transaction], sign: int = 1):
+        for tx in transactions:
+            amount = int(tx.amount) * sign
+            deltas[tx.sender] = deltas.get(tx.sender, 0) - amount
+            deltas[tx.receiver] = deltas.get(tx.receiver, 0) + amount
+
+    def balance(self, username: str) -> int:
+        return self.balances.get(username, 0)
+
+    def pending_delta(self, username: str) -> int:
+        return self.pending.get(username, 0)
+
+    def available(self, username: str) -> int:
+        """Confirmed balance with the pending transactions applied."""
+        return self.balance(username) + self.pending_delta(username)
+
+    def add_pending(self, transaction: Transaction):
+        self._pending_keys.add(transaction.replay_key())
+        self._add(self.pending, [transaction])
+
+    def remove_pending(self, transaction: Transaction):
+        """Revert the pending delta of a transaction that won't make it into a block (e.g. expired)."""
+        if transaction.replay_key() in self._pending_keys:
+            self._pending_keys.discard(transaction.replay_key())
+            self._add(self.pending, [transaction], sign=-1)
+            for user in (transaction.sender, transaction.receiver):
+                if self.pending.get(user) == 0:
+                    del self.pending[user]
+
+    def apply_block(self, height: int, block_hash: str, transactions: List[Transaction]):
+        """Apply the block at the height, its transactions are no longer pending."""
+        if height != self.height:
+            raise ValueError(f"Block at height {height} can't be applied to the ledger at height {self.height}")
+        self._add(self.balances, transactions)
+        for tx in transactions if self._pending_keys else (): # NOTE: the replay keys need the transaction hashes
+            self.remove_pending(tx)
+        self.height, self.block_hash = height + 1, block_hash
+
+        if self.snapshot_path is not None and self.height % self.snapshot_every == 0:
+            self.snapshot()
+
+    def snapshot(self):
+        """Write the confirmed balances (atomically: a crash leaves the previous snapshot intact)."""
+        self.snapshot_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.snapshot_path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding='utf-8') as sf:
+            json.dump({"height": self.height, "block_hash": self.block_hash, "balances": self.balances}, sf)
+            sf.flush()
+            os.fsync(sf.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+
+    def restore(self, blockchain):
+        """Restore the balances from the latest snapshot (if it belongs to this chain) and replay the blocks after it."""
+        self.balances, self.height, self.block_hash = {}, 0, None
+        if self.snapshot_path is not None and self.snapshot_path.is_file():
+            with open(self.snapshot_path, "r", encoding='utf-8') as sf:
+                snapshot = json.load(sf)
+            height = snapshot["height"]
+            if 0 < height <= len(blockchain.chain) and next(blockchain.serialized_blocks(height - 1, height))["hash"] == snapshot["block_hash"]:
+                self.balances, self.height, self.block_hash = snapshot["balances"], height, snapshot["block_hash"]
+            else:
+                logger.warning("The ledger snapshot doesn't match the chain, replaying the whole chain.")
+
+        replayed = len(blockchain.chain) - self.height
+        for height, block in enumerate(blockchain.serialized_blocks(self.height), start=self.height):
+            self.apply_block(height, block["hash"], [Transaction.load_from_dict(tx) for tx in block["transactions"]])
+        logger.info(f"Ledger restored at height {self.height} ({replayed} blocks replayed).")
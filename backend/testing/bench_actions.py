@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+
+Benchmark: actions/sec of the action processor, driving the queue directly. 
+The previous loop (one action at a time, full pending state logged after each) vs Engine.process_action at several batch sizes 
+(verifying on the event loop, see bench_info_latency.py for the worker process).
+Run from the testing folder: python bench_actions.py
+
+"""
+
+import asyncio
+import logging
+import os
+import time
+
+import sys
+from pathlib import Path
+parent_dir = Path.cwd().parent
+sys.path.append(str(parent_dir))
+sys.path.append(str(parent_dir / "app"))
+
+from configs import logger
+from blockchain.block import Transaction
+from blockchain.blockchain import Blockchain
+from blockchain.digital_signature.ecc import secp256k1
+from engine.engine import Engine
+from models.actions import SubmitTransaction
+from models.mining_criterion import MiningCriterion
+from models.user import User
+
+N_ACTIONS = 2_000
+N_SENDERS = 50
+POOL_SIZE = 100 # transactions per pending block
+BATCH_SIZES = [1, 16, 256]
+
+# The log records are formatted as in the server, but written to /dev/null:
+logger.handlers = [logging.StreamHandler(open(os.devnull, "w"))]
+logger.handlers[0].setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+logger.setLevel(logging.INFO)
+
+def new_engine() -> Engine:
+    engine = Engine(Blockchain(criterion=MiningCriterion(type="leading_zeros", difficulty=0)), logger)
+    for i in range(N_SENDERS):
+        engine.add_user(User(username=f"user{i}", public_key=secp256k1.multiply_generator(1000 + i)))
+    engine.max_pending_transactions = POOL_SIZE
+    return engine
+
+def submissions():
+    actions = []
+    for i in range(N_ACTIONS):
+        sender, receiver = i % N_SENDERS, (i + 1) % N_SENDERS
+        tx = Transaction(f"user{sender}", f"user{receiver}", i + 1)
+        tx.sign(1000 + sender, secp256k1)
+        actions.append(SubmitTransaction(action_type="submit_transaction", action_data={
+            "sender": tx.sender, "receiver": tx.receiver, "amount": tx.amount, "signature": (str(tx.signature[0]), str(tx.signature[1]))
+        }))
+    return actions
+
+async def previous_loop(engine: Engine, queue: asyncio.Queue):
+    """The previous Engine.process_action."""
+    while True:
+        action = await queue.get()
+        if action is not None:
+            engine.logger.info(f"Executing action: {action.action_type}")
+            action(engine)
+            engine.logger.info(engine.pending_transactions)
+            engine.logger.info(f"Blocks to verify: {engine.pending_blocks}")
+            engine.processed_actions += 1
+
+async def drain(engine: Engine, processor, actions) -> float:
+    queue = asyncio.Queue()
+    for action in actions:
+        queue.put_nowait(action)
+    start = time.perf_counter()
+    task = asyncio.create_task(processor(queue))
+    while engine.processed_actions < len(actions):
+        await asyncio.sleep(0)
+    elapsed = time.perf_counter() - start
+    task.cancel()
+    return len(actions) / elapsed
+
+if __name__ == "__main__":
+    actions = submissions()
+    print(f"{'processor':>18} | {'actions/s':>10}")
+    engine = new_engine()
+    print(f"{'previous loop':>18} | {asyncio.run(drain(engine, lambda queue: previous_loop(engine, queue), actions)):>10.0f}")
+    for batch_size in BATCH_SIZES:
+        engine = new_engine()
+        rate = asyncio.run(drain(engine, lambda queue: engine.process_action(queue, batch_size=batch_size, workers=0), actions))
+        print(f"{'batch ' + str(batch_size):>18} | {rate:>10.0f}")
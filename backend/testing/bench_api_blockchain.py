@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+
+Load test of the chain endpoints (page, NDJSON stream, single block by height and by hash) on synthetic
+store-backed chains of growing length: the latency and the memory allocated per request should stay flat.
+Run from the testing folder: python bench_api_blockchain.py
+
+"""
+
+import hashlib
+import statistics
+import tempfile
+import time
+import tracemalloc
+
+import sys
+from pathlib import Path
+parent_dir = Path.cwd().parent
+sys.path.append(str(parent_dir))
+sys.path.append(str(parent_dir / "app"))
+
+from configs import configs, logger
+configs.AUDIT_ON_STARTUP = False
+configs.BLOCK_STORE_LOCATION = tempfile.mkdtemp() # keep the node's own store untouched
+logger.setLevel("WARNING")
+
+from fastapi.testclient import TestClient
+import main
+from blockchain.block import Block, Transaction
+from blockchain.block_store import BlockStore
+from blockchain.blockchain import Blockchain
+from engine.engine import Engine
+from models.mining_criterion import MiningCriterion
+
+CHAIN_LENGTHS = [10_000, 100_000, 1_000_000]
+N_REQUESTS = 200
+STREAM_BLOCKS = 1000
+criterion = MiningCriterion(type="leading_zeros", difficulty=0)
+
+class SyntheticBlock:
+    """Stored form of a template block with a distinct hash per height (building real blocks for 1M heights takes hours)."""
+    def __init__(self, template: dict, height: int, transactions):
+        self.data = transactions # NOTE: the store records their hashes
+        self.hash = hashlib.sha256(str(height).encode()).hexdigest()
+        self.record = dict(template, id=height, hash=self.hash)
+
+    def json_serialize(self) -> dict:
+        return self.record
+
+def build_store(path: Path, n: int):
+    transactions = [Transaction(f"user{j}", f"user{j+1}", j) for j in range(5)]
+    template = Block(index=0, previous_hash="0", data=transactions, criterion=criterion, timestamp="0").json_serialize()
+    with BlockStore(path, fsync_every=0) as store:
+        for height in range(n):
+            store.append(SyntheticBlock(template, height, transactions))
+
+def measure(client: TestClient, request_for):
+    """Median and p99 latency (ms), and the peak memory allocated by one request (KB)."""
+    latencies = []
+    for i in range(N_REQUESTS):
+        url, params = request_for(i)
+        start = time.perf_counter()
+        response = client.get(url, params=params)
+        latencies.append((time.perf_counter() - start) * 1000)
+        assert response.status_code == 200
+    url, params = request_for(0)
+    tracemalloc.start()
+    client.get(url, params=params)
+    peak = tracemalloc.get_traced_memory()[1] / 1024
+    tracemalloc.stop()
+    latencies.sort()
+    return statistics.median(latencies), latencies[int(0.99 * len(latencies)) - 1], peak
+
+if __name__ == "__main__":
+    print(f"{N_REQUESTS} requests per endpoint, the stream returns {STREAM_BLOCKS} blocks")
+    print(f"{'blocks':>9} | {'endpoint':>14} | {'median (ms)':>11} | {'p99 (ms)':>8} | {'peak alloc (KB)':>15}")
+    with TestClient(main.app) as client:
+        for n in CHAIN_LENGTHS:
+            with tempfile.TemporaryDirectory() as tmp:
+                build_store(Path(tmp), n)
+                blockchain = Blockchain(criterion=criterion)
+                blockchain.attach_store(BlockStore(tmp, fsync_every=0))
+                main.app.state.engine = Engine(blockchain, logger) # the endpoints get the engine from the app state
+                step = n // N_REQUESTS
+                endpoints = {
+                    "page": lambda i: ("/blockchain", {"from": i * step}),
+                    "stream": lambda i: ("/blockchain/stream", {"from": i * step, "limit": STREAM_BLOCKS}),
+                    "block/height": lambda i: (f"/blocks/{i * step}", None),
+                    "block/hash": lambda i: (f"/blocks/{blockchain.store.block_hash(i * step)}", None),
+                }
+                for name, request_for in endpoints.items():
+                    median, p99, peak = measure(client, request_for)
+                    print(f"{n:>9} | {name:>14} | {median:>11.2f} | {p99:>8.2f} | {peak:>15.0f}")
+                blockchain.store.close()
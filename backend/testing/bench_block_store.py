@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+
+Benchmark: persisting the chain with the block store (per-block append, by fsync policy) vs the whole-file JSON dump,
+and reading a single block by height vs loading the whole JSON file.
+Run from the testing folder: python bench_block_store.py
+
+"""
+
+import json
+import tempfile
+import time
+
+import sys
+from pathlib import Path
+parent_dir = Path.cwd().parent
+sys.path.append(str(parent_dir))
+sys.path.append(str(parent_dir / "app"))
+
+from app.blockchain.block import Block, Transaction
+from app.blockchain.block_store import BlockStore
+from app.models.mining_criterion import MiningCriterion
+
+N_BLOCKS = 10_000
+N_TRANSACTIONS = 5
+FSYNC_POLICIES = [0, 100, 1] # fsync every n-th block (0: never)
+criterion = MiningCriterion(type="leading_zeros", difficulty=0)
+
+def build_blocks(n: int):
+    blocks, previous_hash = [], "0"
+    for i in range(n):
+        transactions = [Transaction(f"user{j}", f"user{j+1}", i) for j in range(N_TRANSACTIONS)]
+        block = Block(index=i, previous_hash=previous_hash, data=transactions, criterion=criterion, timestamp=str(i))
+        blocks.append(block)
+        previous_hash = block.hash
+    return blocks
+
+if __name__ == "__main__":
+    blocks = build_blocks(N_BLOCKS)
+    print(f"{N_BLOCKS} blocks, {N_TRANSACTIONS} transactions per block")
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        start = time.perf_counter()
+        with open(tmp / "chain.json", "w", encoding="utf-8") as bf:
+            json.dump({"blocks": [b.json_serialize() for b in blocks]}, bf, indent=4)
+        dump_time = time.perf_counter() - start
+        print(f"JSON dump of the whole chain: {dump_time:.2f}s (on every shutdown)")
+
+        start = time.perf_counter()
+        with open(tmp / "chain.json", "r", encoding="utf-8") as bf:
+            json.load(bf)
+        print(f"JSON load of the whole chain: {time.perf_counter() - start:.2f}s (to read any block)")
+
+        for fsync_every in FSYNC_POLICIES:
+            with BlockStore(tmp / f"store_{fsync_every}", fsync_every=fsync_every) as store:
+                start = time.perf_counter()
+                for block in blocks:
+                    store.append(block)
+                elapsed = time.perf_counter() - start
+            print(f"Store append, fsync every {fsync_every:>3}: {elapsed:.2f}s, {N_BLOCKS / elapsed:.0f} blocks/s")
+
+        with BlockStore(tmp / "store_0") as store:
+            start = time.perf_counter()
+            for height in range(0, N_BLOCKS, 10):
+                store.read_dict(height)
+            elapsed = (time.perf_counter() - start) / (N_BLOCKS // 10)
+            print(f"Store read by height: {elapsed * 1e6:.1f}us per block")
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+
+Benchmark: add_block throughput with the incremental (validated tip) check, and the per-block cost of the
+previous add_block, which re-validated the whole chain (measured as one full validate_chain at that length),
+and the full audit with signatures (serial vs parallel, by worker count).
+Run from the testing folder: python bench_blockchain.py
+
+"""
+
+import os
+import time
+
+import sys
+from pathlib import Path
+parent_dir = Path.cwd().parent
+sys.path.append(str(parent_dir))
+sys.path.append(str(parent_dir / "app"))
+
+from app.blockchain.block import Block, Transaction
+from app.blockchain.blockchain import Blockchain
+from app.models.mining_criterion import MiningCriterion
+from app.blockchain.digital_signature.ecc import secp256k1
+
+CHAIN_LENGTHS = [1_000, 10_000, 100_000]
+AUDIT_LENGTH = 5_000 # signed blocks for the audit benchmark
+N_TRANSACTIONS = 2
+criterion = MiningCriterion(type="leading_zeros", difficulty=0) # every hash is valid, only the validation is measured
+
+def build_blocks(chain: Blockchain, n: int):
+    """Linked blocks on top of the chain (not added yet)."""
+    blocks, previous_hash = [], chain.chain[-1].hash
+    for i in range(1, n + 1):
+        transactions = [Transaction(f"user{j}", f"user{j+1}", i) for j in range(N_TRANSACTIONS)]
+        block = Block(index=i, previous_hash=previous_hash, data=transactions, criterion=criterion, timestamp=str(i))
+        blocks.append(block)
+        previous_hash = block.hash
+    return blocks
+
+if __name__ == "__main__":
+    print(f"{N_TRANSACTIONS} transactions per block")
+    print(f"{'blocks':>8} | {'add time (s)':>12} | {'adds/s':>8} | {'full scan (s)':>13} | {'old add/s at tip':>16}")
+    for n in CHAIN_LENGTHS:
+        chain = Blockchain(criterion=criterion)
+        blocks = build_blocks(chain, n)
+
+        start = time.perf_counter()
+        for block in blocks:
+            assert chain.add_block(block)
+        add_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        assert chain.validate_chain()
+        scan_time = time.perf_counter() - start
+
+        print(f"{n:>8} | {add_time:>12.3f} | {n / add_time:>8.0f} | {scan_time:>13.3f} | {1 / scan_time:>16.2f}")
+
+    print(f"\nFull audit of {AUDIT_LENGTH} blocks with signatures")
+    private_key = 12345
+    public_keys = {f"user{j}": secp256k1.scalar_multiply(private_key, secp256k1.G) for j in range(N_TRANSACTIONS)}
+    chain = Blockchain(criterion=criterion)
+    blocks = build_blocks(chain, AUDIT_LENGTH)
+    for block in blocks:
+        for tx in block.data:
+            tx.sign(private_key, secp256k1)
+    chain.chain.extend(blocks)
+    print(f"{'workers':>8} | {'time (s)':>9} | {'blocks/s':>9}")
+    worker_counts = [1] + [w for w in (2, 4, 8, 16) if w <= (os.cpu_count() or 1)]
+    for workers in worker_counts:
+        start = time.perf_counter()
+        assert chain.validate_chain(parallel=workers > 1, workers=workers, public_keys=public_keys)
+        elapsed = time.perf_counter() - start
+        print(f"{workers:>8} | {elapsed:>9.2f} | {AUDIT_LENGTH / elapsed:>9.0f}")
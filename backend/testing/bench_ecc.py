@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+
+Benchmark of the ECC scalar multiplication: affine double-and-add (one inversion per step) vs Jacobian coordinates,
+the fixed-base generator table (construction time, memory, speedup) and the 
+ECDSA verification product u1*G + u2*Q (two multiplications vs Strauss-Shamir),
+with and without a cached table for Q (repeat senders).
+Run from the testing folder: python bench_ecc.py
+
+"""
+
+import random
+import time
+import timeit
+
+import sys
+from pathlib import Path
+parent_dir = Path.cwd().parent
+sys.path.append(str(parent_dir))
+
+from app.blockchain.digital_signature.ecc import ECC, secp256k1, nist_p192
+
+def table_size(table) -> int:
+    """Approximate memory footprint of the table in bytes (lists, tuples and ints)."""
+    size = sys.getsizeof(table)
+    for row in table:
+        size += sys.getsizeof(row)
+        for point in row:
+            size += sys.getsizeof(point) + sum(sys.getsizeof(c) for c in point)
+    return size
+
+CURVES = {"secp256k1": secp256k1, "nist_p192": nist_p192}
+NUMBER = 50
+
+def affine_scalar_multiply(curve: ECC, k, P):
+    """The previous double-and-add, with affine add_points/double_point."""
+    result = (0, 0)
+    while k:
+        if k & 1:
+            result = curve.add_points(result, P)
+        P = curve.double_point(P)
+        k >>= 1
+    return result
+
+def jacobian_scalar_multiply(curve: ECC, k, P):
+    """Double-and-add in Jacobian coordinates (what scalar_multiply does for points other than G)."""
+    result = curve.INFINITY_JACOBIAN
+    P = curve.to_jacobian(P)
+    while k:
+        if k & 1:
+            result = curve.jacobian_add(result, P)
+        P = curve.jacobian_double(P)
+        k >>= 1
+    return curve.to_affine(result)
+
+def timed(function, scalars) -> float:
+    """Average seconds per call."""
+    iterator = iter(scalars)
+    return min(timeit.repeat(lambda: function(next(iterator)), number=NUMBER, repeat=1)) / NUMBER
+
+if __name__ == "__main__":
+    print(f"{'curve':>10} | {'affine (ms)':>11} | {'jacobian (ms)':>13} | {'speedup':>7}")
+    for name, curve in CURVES.items():
+        scalars = [random.randint(1, curve.n - 1) for _ in range(NUMBER)]
+        affine = timed(lambda k: affine_scalar_multiply(curve, k, curve.G), scalars)
+        jacobian = timed(lambda k: jacobian_scalar_multiply(curve, k, curve.G), scalars)
+        print(f"{name:>10} | {affine * 1000:>11.3f} | {jacobian * 1000:>13.3f} | {affine / jacobian:>6.2f}x")
+
+    print(f"\n{'curve':>10} | {'table build (ms)':>16} | {'points':>6} | {'memory (KB)':>11} | {'k*G (ms)':>8} | {'vs jacobian':>11}")
+    for name, curve in CURVES.items():
+        scalars = [random.randint(1, curve.n - 1) for _ in range(NUMBER)]
+        jacobian = timed(lambda k: jacobian_scalar_multiply(curve, k, curve.G), scalars)
+
+        curve._generator_table = None # force a rebuild
+        start = time.perf_counter()
+        table = curve.generator_table()
+        build = time.perf_counter() - start
+        fixed_base = timed(lambda k: curve.scalar_multiply(k, curve.G), scalars)
+        points = sum(len(row) for row in table)
+        print(f"{name:>10} | {build * 1000:>16.1f} | {points:>6} | {table_size(table) / 1024:>11.1f} | {fixed_base * 1000:>8.3f} | {jacobian / fixed_base:>10.2f}x")
+
+    print(f"\n{'curve':>10} | {'separate (ms)':>13} | {'multi-scalar (ms)':>17} | {'speedup':>7}")
+    for name, curve in CURVES.items():
+        Q = curve.scalar_multiply(random.randint(1, curve.n - 1), curve.G)
+        scalars = [(random.randint(1, curve.n - 1), random.randint(1, curve.n - 1)) for _ in range(NUMBER)]
+        separate = timed(lambda u: curve.add_points(curve.scalar_multiply(u[0], curve.G), curve.scalar_multiply(u[1], Q)), scalars)
+        multi = timed(lambda u: curve.multi_scalar_multiply([(u[0], curve.G), (u[1], Q)]), scalars)
+        print(f"{name:>10} | {separate * 1000:>13.3f} | {multi * 1000:>17.3f} | {separate / multi:>6.2f}x")
+
+    print(f"\n{'curve':>10} | {'uncached (ms)':>13} | {'cached key (ms)':>15} | {'speedup':>7}")
+    for name, curve in CURVES.items():
+        Q = curve.scalar_multiply(random.randint(1, curve.n - 1), curve.G)
+        scalars = [(random.randint(1, curve.n - 1), random.randint(1, curve.n - 1)) for _ in range(NUMBER)]
+        curve.enable_point_cache(0)
+        uncached = timed(lambda u: curve.multi_scalar_multiply([(u[0], curve.G), (u[1], Q)], cacheable=(Q,)), scalars)
+        curve.enable_point_cache(capacity=16, build_after=1)
+        curve.multi_scalar_multiply([(1, curve.G), (1, Q)], cacheable=(Q,)) # build the table
+        cached = timed(lambda u: curve.multi_scalar_multiply([(u[0], curve.G), (u[1], Q)], cacheable=(Q,)), scalars)
+        print(f"{name:>10} | {uncached * 1000:>13.3f} | {cached * 1000:>15.3f} | {uncached / cached:>6.2f}x")
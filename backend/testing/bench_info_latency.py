@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+
+Latency test: /info while the action processor works through a verification heavy backlog (transaction submissions 
+from many distinct senders, so no public key table helps). With the verification on the event loop every request waits 
+for the batch being verified, with the verification in a worker process the latency should stay flat.
+Run from the testing folder: python bench_info_latency.py
+
+"""
+
+import statistics
+import tempfile
+import time
+
+import sys
+from pathlib import Path
+parent_dir = Path.cwd().parent
+sys.path.append(str(parent_dir))
+sys.path.append(str(parent_dir / "app"))
+
+from configs import configs, logger
+configs.AUDIT_ON_STARTUP = False
+configs.BLOCK_STORE_LOCATION = tempfile.mkdtemp() # keep the node's own store untouched
+configs.USER_LOCATION = str(Path(tempfile.mkdtemp()) / "USERS.json") # the users of the bench aren't written to the node's file
+logger.setLevel("WARNING")
+
+from fastapi.testclient import TestClient
+import main
+from blockchain.block import Transaction
+from blockchain.blockchain import Blockchain
+from blockchain.digital_signature.ecc import secp256k1
+from engine.engine import Engine
+from models.mining_criterion import MiningCriterion
+from models.actions import SubmitTransaction
+from models.user import User
+
+N_ACTIONS = 600
+N_IDLE_REQUESTS = 100
+WORKERS = [0, 1] # 0: verification on the event loop (as before)
+
+def new_engine() -> Engine:
+    engine = Engine(Blockchain(criterion=MiningCriterion(type="leading_zeros", difficulty=0)), logger)
+    for i in range(N_ACTIONS):
+        engine.add_user(User(username=f"user{i}", public_key=secp256k1.multiply_generator(1000 + i)))
+    engine.max_pending_transactions = N_ACTIONS + 1 # NOTE: no block creation, only the verification is measured
+    return engine
+
+def submissions():
+    actions = []
+    for i in range(N_ACTIONS):
+        tx = Transaction(f"user{i}", f"user{(i + 1) % N_ACTIONS}", i + 1)
+        tx.sign(1000 + i, secp256k1)
+        actions.append(SubmitTransaction(action_type="submit_transaction", action_data={
+            "sender": tx.sender, "receiver": tx.receiver, "amount": tx.amount, "signature": (str(tx.signature[0]), str(tx.signature[1]))
+        }))
+    return actions
+
+async def enqueue(actions):
+    """Queue the whole backlog at once (runs on the server's event loop)."""
+    for action in actions:
+        main.app.state.action_queue.put_nowait(action)
+
+def info_latencies(client: TestClient, until=None, n=None):
+    latencies = []
+    while (until is not None and not until()) or (n is not None and len(latencies) < n):
+        start = time.perf_counter()
+        assert client.get("/info").status_code == 200
+        latencies.append((time.perf_counter() - start) * 1000)
+    return sorted(latencies)
+
+def p99(latencies):
+    return latencies[max(0, int(0.99 * len(latencies)) - 1)]
+
+if __name__ == "__main__":
+    actions = submissions()
+    print(f"{'workers':>7} | {'idle p99 (ms)':>13} | {'loaded median (ms)':>18} | {'loaded p99 (ms)':>15} | {'requests':>8} | {'actions/s':>9}")
+    for workers in WORKERS:
+        configs.VERIFICATION_WORKERS = workers
+        main.engine = engine = new_engine() # NOTE: the processor started by the lifespan runs on main.engine
+        with TestClient(main.app) as client:
+            idle = info_latencies(client, n=N_IDLE_REQUESTS)
+            start = time.perf_counter()
+            client.portal.call(enqueue, actions)
+            loaded = info_latencies(client, until=lambda: engine.processed_actions >= N_ACTIONS)
+            rate = N_ACTIONS / (time.perf_counter() - start)
+        assert len(engine.pending_transactions) == N_ACTIONS
+        print(f"{workers:>7} | {p99(idle):>13.2f} | {statistics.median(loaded):>18.2f} | {p99(loaded):>15.2f} | {len(loaded):>8} | {rate:>9.0f}")
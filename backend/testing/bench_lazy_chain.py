@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+
+Benchmark: startup time and peak RSS of a node loading synthetic chains from the block store,
+eagerly (every Block decoded, the previous behaviour) vs lazily (LazyChain, only the index is resident).
+Every measurement runs in a fresh process. Run from the testing folder: python bench_lazy_chain.py
+
+"""
+
+import resource
+import subprocess
+import tempfile
+import time
+
+import sys
+from pathlib import Path
+parent_dir = Path.cwd().parent
+sys.path.append(str(parent_dir))
+sys.path.append(str(parent_dir / "app"))
+
+from app.blockchain.block import Block, Transaction
+from app.blockchain.block_store import BlockStore
+from app.blockchain.blockchain import Blockchain
+from app.models.mining_criterion import MiningCriterion
+
+CHAIN_LENGTHS = [10_000, 100_000, 1_000_000]
+MAX_EAGER_LENGTH = 100_000 # decoding every block of longer chains takes over an hour
+N_TRANSACTIONS = 5
+criterion = MiningCriterion(type="leading_zeros", difficulty=0)
+
+def build_store(path: Path, n: int):
+    """Synthetic store: the same block content at every height (only the loading is measured, not the validation)."""
+    transactions = [Transaction(f"user{j}", f"user{j+1}", j) for j in range(N_TRANSACTIONS)]
+    block = Block(index=0, previous_hash="0", data=transactions, criterion=criterion, timestamp="0")
+    with BlockStore(path, fsync_every=0) as store:
+        for _ in range(n):
+            store.append(block)
+
+def load(mode: str, path: str):
+    """Child process: load the chain like the server does, touch the tip, report the time and the peak RSS."""
+    start = time.perf_counter()
+    blockchain = Blockchain(criterion=criterion)
+    store = BlockStore(path, fsync_every=0)
+    if mode == "eager":
+        blockchain.chain = list(store)
+        blockchain._index = None # rebuilt from the decoded blocks
+    else:
+        blockchain.attach_store(store)
+    tip = blockchain.chain[-1]
+    elapsed = time.perf_counter() - start
+    start = time.perf_counter()
+    assert blockchain.height_of(tip.hash) is not None # the first lookup builds the chain index
+    index_elapsed = time.perf_counter() - start
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024 # KB on Linux
+    print(f"{elapsed:.3f} {rss:.1f} {index_elapsed:.3f} {len(blockchain.chain)} {tip.index}")
+
+if __name__ == "__main__":
+    if len(sys.argv) == 4 and sys.argv[1] == "--child":
+        load(sys.argv[2], sys.argv[3])
+        sys.exit(0)
+
+    print(f"{N_TRANSACTIONS} transactions per block")
+    print(f"{'blocks':>9} | {'mode':>5} | {'startup (s)':>11} | {'peak RSS (MB)':>13} | {'first index lookup (s)':>22}")
+    for n in CHAIN_LENGTHS:
+        with tempfile.TemporaryDirectory() as tmp:
+            build_store(Path(tmp), n)
+            for mode in ["eager", "lazy"]:
+                if mode == "eager" and n > MAX_EAGER_LENGTH:
+                    print(f"{n:>9} | {mode:>5} | {'skipped':>11} | {'':>13} | {'':>22}")
+                    continue
+                output = subprocess.run([sys.executable, __file__, "--child", mode, tmp], capture_output=True, text=True, check=True).stdout
+                elapsed, rss, index_elapsed, *_ = output.split()
+                print(f"{n:>9} | {mode:>5} | {float(elapsed):>11.3f} | {float(rss):>13.1f} | {float(index_elapsed):>22.3f}")
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+
+Benchmark: ledger block application and balance queries vs scanning the chain (the previous frontend inventory),
+and the startup restore from a snapshot vs replaying the whole chain.
+Run from the testing folder: python bench_ledger.py
+
+"""
+
+import random
+import tempfile
+import time
+
+import sys
+from pathlib import Path
+parent_dir = Path.cwd().parent
+sys.path.append(str(parent_dir))
+sys.path.append(str(parent_dir / "app"))
+
+from app.blockchain.block import Transaction
+from app.models.wallet import Ledger
+
+N_BLOCKS = 2_500
+TRANSACTIONS_PER_BLOCK = 100 # 250k transactions
+N_USERS = 1_000
+N_QUERIES = 10_000
+SNAPSHOT_EVERY = 1_000
+
+class StoredChain:
+    """Minimal stand-in of Blockchain for Ledger.restore: the JSON form of the blocks (no hashing, only the ledger is measured)."""
+    def __init__(self, blocks):
+        self.chain = blocks
+
+    def serialized_blocks(self, start=0, stop=None):
+        for block in self.chain[start:stop]:
+            yield block
+
+if __name__ == "__main__":
+    rng = random.Random(0)
+    users = [f"user{i}" for i in range(N_USERS)]
+    blocks = [
+        {"hash": f"{height:064x}", "transactions": [
+            {"sender": rng.choice(users), "receiver": rng.choice(users), "amount": rng.randint(1, 100), "signature": [height, position]}
+            for position in range(TRANSACTIONS_PER_BLOCK)
+        ]} for height in range(N_BLOCKS)
+    ]
+    transactions = [[Transaction.load_from_dict(tx) for tx in block["transactions"]] for block in blocks]
+    print(f"{N_BLOCKS} blocks x {TRANSACTIONS_PER_BLOCK} transactions, {N_USERS} users")
+
+    ledger = Ledger()
+    start = time.perf_counter()
+    for height, (block, txs) in enumerate(zip(blocks, transactions)):
+        ledger.apply_block(height, block["hash"], txs)
+    elapsed = time.perf_counter() - start
+    print(f"apply_block: {elapsed:.2f}s, {N_BLOCKS * TRANSACTIONS_PER_BLOCK / elapsed:,.0f} transactions/s")
+
+    queried = [rng.choice(users) for _ in range(N_QUERIES)]
+    start = time.perf_counter()
+    for user in queried:
+        ledger.available(user)
+    print(f"balance query (ledger): {(time.perf_counter() - start) / N_QUERIES * 1e6:.2f}us")
+
+    start = time.perf_counter()
+    for user in queried[:10]:
+        balance = 0
+        for block in blocks:
+            for tx in block["transactions"]:
+                balance += (tx["receiver"] == user) * tx["amount"] - (tx["sender"] == user) * tx["amount"]
+        assert balance == ledger.balance(user)
+    print(f"balance query (chain scan): {(time.perf_counter() - start) / 10 * 1e3:.1f}ms")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        chain = StoredChain(blocks)
+        snapshot = Path(tmp) / "ledger.json"
+        Ledger(snapshot_path=snapshot, snapshot_every=SNAPSHOT_EVERY).restore(chain) # writes the snapshots
+        for name, path in [("full replay", None), ("snapshot + replay", snapshot)]:
+            start = time.perf_counter()
+            restored = Ledger(snapshot_path=path, snapshot_every=SNAPSHOT_EVERY)
+            restored.restore(chain)
+            assert restored.balances == ledger.balances
+            print(f"restore ({name}): {time.perf_counter() - start:.3f}s")
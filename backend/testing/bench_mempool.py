@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+
+Benchmark: the mempool at pool sizes of 1k to 1M pending transactions vs the previous sorted list
+(append, then re-sort the whole list on every submission): insert, take_block and remove costs,
+and listing the pool for /info (the full sorted pool vs the preview of the first ones).
+Run from the testing folder: python bench_mempool.py
+
+"""
+
+import hashlib
+import random
+import time
+
+import sys
+from pathlib import Path
+parent_dir = Path.cwd().parent
+sys.path.append(str(parent_dir))
+sys.path.append(str(parent_dir / "app"))
+
+from blockchain.block import Transaction
+from engine.mempool import Mempool
+
+POOL_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+N_OPERATIONS = 1_000
+N_LIST_INSERTS = 20 # the re-sort is slow at large pool sizes
+BLOCK_SIZE = 100
+PREVIEW_SIZE = 100
+
+def synthetic(n: int, offset: int = 0):
+    transactions = []
+    for i in range(offset, offset + n):
+        tx = Transaction(f"user{i % 1000}", f"user{(i + 1) % 1000}", i, signature=(i, 1))
+        # NOTE: hashlib instead of the pure Python SHA256, hashing 1M transactions with it would dominate the run
+        tx._hash = int.from_bytes(hashlib.sha256(str(i).encode()).digest(), "big")
+        transactions.append(tx)
+    return transactions
+
+def us_per_op(function, arguments) -> float:
+    start = time.perf_counter()
+    for argument in arguments:
+        function(argument)
+    return (time.perf_counter() - start) / len(arguments) * 1e6
+
+if __name__ == "__main__":
+    rng = random.Random(0)
+    print(f"{'pool size':>9} | {'add (us)':>8} | {'remove (us)':>11} | {f'take_block({BLOCK_SIZE}) (us)':>20} | {'list add+sort (us)':>18} | {'list all (ms)':>13} | {f'preview({PREVIEW_SIZE}) (ms)':>17}")
+    for n in POOL_SIZES:
+        pool = Mempool()
+        transactions = synthetic(n)
+        for tx in transactions:
+            pool.add(tx)
+        extra = synthetic(N_OPERATIONS, offset=n)
+
+        add = us_per_op(pool.add, extra)
+        remove = us_per_op(pool.remove, rng.sample(transactions, N_OPERATIONS))
+        take = us_per_op(lambda _: pool.take_block(BLOCK_SIZE), range(N_OPERATIONS // BLOCK_SIZE))
+        list_all = us_per_op(lambda _: list(pool), range(3)) / 1000
+        preview = us_per_op(lambda _: pool.preview(PREVIEW_SIZE), range(3)) / 1000
+
+        pending = list(transactions)
+        pending.sort(key=lambda tx: tx.hash_transaction())
+        def list_add(tx):
+            """The previous pending list."""
+            pending.append(tx)
+            pending.sort(key=lambda tx: tx.hash_transaction())
+        list_add_time = us_per_op(list_add, extra[:N_LIST_INSERTS])
+        print(f"{n:>9} | {add:>8.2f} | {remove:>11.2f} | {take:>20.0f} | {list_add_time:>18.0f} | {list_all:>13.1f} | {preview:>17.1f}")
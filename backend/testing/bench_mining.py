@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+
+Benchmark: nonce search through the Block.nonce setter (full re-hash per attempt) vs the midstate BlockMiner,
+and the hash rate of the ParallelMiner by worker count.
+Run from the testing folder: python bench_mining.py
+
+"""
+
+import os
+import time
+
+import sys
+from pathlib import Path
+parent_dir = Path.cwd().parent
+sys.path.append(str(parent_dir))
+sys.path.append(str(parent_dir / "app"))
+
+from app.blockchain.block import Block, Transaction
+from app.blockchain.mining import BlockMiner, ParallelMiner, BATCH_SIZE
+from app.models.mining_criterion import MiningCriterion
+
+N_TRANSACTIONS = 50
+TIME_BUDGET = 10.0 # seconds per difficulty and method
+
+def setter_loop(block: Block, criterion: MiningCriterion, deadline: float):
+    """The previous Block.mine loop: every nonce goes through the setter, which re-hashes all transactions."""
+    attempts = 0
+    block.nonce = 0
+    while not criterion.check(block.hash):
+        if time.perf_counter() > deadline:
+            return None, attempts
+        block.nonce += 1
+        attempts += 1
+    return block.nonce, attempts + 1
+
+def midstate_loop(block: Block, criterion: MiningCriterion, deadline: float, batch_size: int = 1):
+    miner = BlockMiner(block)
+    nonce, attempts, chunk = 0, 0, 2048
+    while time.perf_counter() < deadline:
+        result = miner.search(criterion.check, start_nonce=nonce, max_iterations=chunk, batch_size=batch_size)
+        if result is not None:
+            return result[0], attempts + result[0] - nonce + 1
+        nonce += chunk
+        attempts += chunk
+    return None, attempts
+
+if __name__ == "__main__":
+    transactions = [Transaction(f"user{i}", f"user{i+1}", i) for i in range(N_TRANSACTIONS)]
+    print(f"{N_TRANSACTIONS} transactions per block, {TIME_BUDGET:.0f}s budget per run")
+    print(f"{'difficulty':>10} | {'method':>8} | {'nonce':>8} | {'time (s)':>9} | {'hashes/s':>9} | {'expected time (s)':>17}")
+    for difficulty in range(2, 6):
+        criterion = MiningCriterion(type="leading_zeros", difficulty=difficulty)
+        batched_loop = lambda block, criterion, deadline: midstate_loop(block, criterion, deadline, batch_size=BATCH_SIZE)
+        for name, loop in [("setter", setter_loop), ("midstate", midstate_loop), ("batched", batched_loop)]:
+            block = Block(index=1, previous_hash="ab" * 32, data=transactions, criterion=criterion, timestamp="1744038097.574308")
+            start = time.perf_counter()
+            nonce, attempts = loop(block, criterion, start + TIME_BUDGET)
+            elapsed = time.perf_counter() - start
+            rate = attempts / elapsed
+            print(f"{difficulty:>10} | {name:>8} | {str(nonce):>8} | {elapsed:>9.2f} | {rate:>9.0f} | {16**difficulty / rate:>17.1f}")
+
+    print("\nParallel miner hash rate (difficulty 64, i.e. never solved, 5s budget):")
+    print(f"{'workers':>7} | {'hashes/s':>9} | {'scaling':>7}")
+    impossible = MiningCriterion(type="leading_zeros", difficulty=64)
+    block = Block(index=1, previous_hash="ab" * 32, data=transactions, criterion=impossible, timestamp="1744038097.574308")
+    base_rate = None
+    workers = 1
+    while workers <= (os.cpu_count() or 1):
+        with ParallelMiner(workers=workers) as miner:
+            miner.mine(block, impossible, max_iterations=workers) # warm up the pool
+            rate = miner.mine(block, impossible, timeout=5.0).hashes_per_second
+        base_rate = base_rate or rate
+        print(f"{workers:>7} | {rate:>9.0f} | {rate / base_rate:>6.2f}x")
+        workers *= 2
@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+
+Micro-benchmark: binary string SHA-256 (reference) vs the bytes based path, 
+and the scalar path vs the batched (NumPy) path for many equal length messages.
+Run from the testing folder: python bench_sha2.py
+
+"""
+
+import timeit
+
+import sys
+from pathlib import Path
+parent_dir = Path.cwd().parent
+sys.path.append(str(parent_dir))
+
+from app.blockchain.hashing.sha2 import SHA256
+
+SIZES = {"64 B": 64, "1 KB": 1024, "1 MB": 1024 * 1024}
+
+if __name__ == "__main__":
+    print(f"{'input':>8} | {'binary string (s)':>18} | {'bytes (s)':>10} | {'speedup':>7}")
+    for label, size in SIZES.items():
+        message = "a" * size
+        data = message.encode("utf-8")
+        number = max(1, 2**16 // size) # fewer repetitions for the larger inputs
+
+        old = min(timeit.repeat(lambda: SHA256.digest_binary_string(message), number=number, repeat=3)) / number
+        new = min(timeit.repeat(lambda: SHA256.digest_bytes(data), number=number, repeat=3)) / number
+        print(f"{label:>8} | {old:>18.6f} | {new:>10.6f} | {old / new:>6.2f}x")
+
+    print(f"\n{'batch':>8} | {'scalar (s/hash)':>15} | {'batched (s/hash)':>16} | {'speedup':>7}")
+    for batch in [16, 256, 4096]:
+        messages = [f"{'ab' * 40}{nonce}".encode("utf-8") for nonce in range(10**6, 10**6 + batch)]
+        old = min(timeit.repeat(lambda: [SHA256.digest_bytes(m) for m in messages], number=1, repeat=3)) / batch
+        new = min(timeit.repeat(lambda: SHA256.digest_many(messages), number=1, repeat=3)) / batch
+        print(f"{batch:>8} | {old:>15.7f} | {new:>16.7f} | {old / new:>6.2f}x")
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+
+Benchmark: transactions/sec accepted by /submit_action (one per request) vs /submit_actions (JSON array and NDJSON)
+at several batch sizes, through the TestClient. Only the admission is measured, the queue isn't consumed.
+Run from the testing folder: python bench_submit.py
+
+"""
+
+import asyncio
+import json
+import tempfile
+import time
+
+import sys
+from pathlib import Path
+parent_dir = Path.cwd().parent
+sys.path.append(str(parent_dir))
+sys.path.append(str(parent_dir / "app"))
+
+from configs import configs, logger
+configs.AUDIT_ON_STARTUP = False
+configs.BLOCK_STORE_LOCATION = tempfile.mkdtemp() # keep the node's own store untouched
+configs.USER_LOCATION = str(Path(tempfile.mkdtemp()) / "USERS.json")
+logger.setLevel("WARNING")
+
+from fastapi.testclient import TestClient
+import main
+from blockchain.block import Transaction
+from blockchain.digital_signature.ecc import secp256k1
+
+N_TRANSACTIONS = 2_000
+BATCH_SIZES = [10, 100, 1000]
+PRIVATE_KEY = 424242
+
+def payloads():
+    items = []
+    for i in range(N_TRANSACTIONS):
+        tx = Transaction("alice", "bob", i + 1)
+        tx.sign(PRIVATE_KEY, secp256k1)
+        items.append({"action_type": "submit_transaction", "action_data": {
+            "sender": tx.sender, "receiver": tx.receiver, "amount": tx.amount, "signature": [str(tx.signature[0]), str(tx.signature[1])]
+        }})
+    return items
+
+def fresh_queue():
+    # NOTE: swapped in on the running server, the processor keeps waiting on the original queue
+    main.app.state.action_queue = asyncio.Queue()
+
+def rate(run) -> float:
+    fresh_queue()
+    start = time.perf_counter()
+    run()
+    elapsed = time.perf_counter() - start
+    assert main.app.state.action_queue.qsize() == N_TRANSACTIONS
+    return N_TRANSACTIONS / elapsed
+
+if __name__ == "__main__":
+    items = payloads()
+    print(f"{'submission':>24} | {'tx/s':>8}")
+    with TestClient(main.app) as client:
+        def single():
+            for item in items:
+                assert client.post("/submit_action", json=item).status_code == 200
+        print(f"{'single':>24} | {rate(single):>8.0f}")
+
+        for batch_size in BATCH_SIZES:
+            batches = [items[i:i+batch_size] for i in range(0, N_TRANSACTIONS, batch_size)]
+            def array():
+                for batch in batches:
+                    assert client.post("/submit_actions", json=batch).json()["accepted"] == len(batch)
+            ndjson_batches = ["\n".join(json.dumps(item) for item in batch) for batch in batches]
+            def ndjson():
+                for batch in ndjson_batches:
+                    assert client.post("/submit_actions", content=batch, headers={"content-type": "application/x-ndjson"}).json()["accepted"] > 0
+            print(f"{f'array of {batch_size}':>24} | {rate(array):>8.0f}")
+            print(f"{f'ndjson of {batch_size}':>24} | {rate(ndjson):>8.0f}")
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+
+Benchmark: block construction and pending pool sorting with cached transaction hashes 
+vs recomputing the canonical JSON and hash on every call (the previous behaviour).
+Run from the testing folder: python bench_transaction.py
+
+"""
+
+import json
+import time
+
+import sys
+from pathlib import Path
+parent_dir = Path.cwd().parent
+sys.path.append(str(parent_dir))
+sys.path.append(str(parent_dir / "app"))
+
+from app.blockchain.block import Block, Transaction
+from app.blockchain.hashing.sha2 import SHA256
+from app.models.mining_criterion import MiningCriterion
+
+SIZES = [10, 100, 1000]
+
+class UncachedTransaction(Transaction):
+    """Transaction without the cache: serializes and hashes on every call."""
+    __slots__ = ()
+
+    def hash_transaction(self) -> int:
+        tx_data = {"sender": self.sender, "receiver": self.receiver, "amount": int(self.amount)}
+        return int(SHA256.digest(json.dumps(tx_data, separators=(",", ":"), sort_keys=True)), 16)
+
+def build_block(transactions):
+    """Block construction as in SubmitTransaction, plus the setter updates of MinedBlockValidation/mining."""
+    block = Block(index="id", previous_hash="ab" * 32, data=transactions, criterion=MiningCriterion(type="leading_zeros", difficulty=3))
+    block.previous_hash = "cd" * 32
+    block.nonce = 1
+    return block
+
+def fill_pending_pool(transactions):
+    """SubmitTransaction: append, then sort the pending list by hash, per submission."""
+    pending = []
+    for tx in transactions:
+        pending.append(tx)
+        pending.sort(key=lambda tx: tx.hash_transaction())
+    return pending
+
+def timed(function, *args) -> float:
+    start = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - start
+
+if __name__ == "__main__":
+    print(f"{'transactions':>12} | {'operation':>12} | {'uncached (s)':>12} | {'cached (s)':>10} | {'speedup':>7}")
+    for size in SIZES:
+        for name, operation in [("block", build_block), ("pending sort", fill_pending_pool)]:
+            uncached = timed(operation, [UncachedTransaction(f"user{i}", f"user{i+1}", i) for i in range(size)])
+            cached = timed(operation, [Transaction(f"user{i}", f"user{i+1}", i) for i in range(size)])
+            print(f"{size:>12} | {name:>12} | {uncached:>12.4f} | {cached:>10.4f} | {uncached / cached:>6.1f}x")
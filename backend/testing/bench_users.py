@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+
+Benchmark: login lookup by public key, indexed (Engine.get_user) vs the previous linear scan over the users,
+the /login endpoint latency, and the last page of the user list (Engine.list_users vs the previous islice over the users),
+at growing numbers of registered users.
+Run from the testing folder: python bench_users.py
+
+"""
+
+import random
+import statistics
+import tempfile
+import time
+from itertools import islice
+
+import sys
+from pathlib import Path
+parent_dir = Path.cwd().parent
+sys.path.append(str(parent_dir))
+sys.path.append(str(parent_dir / "app"))
+
+from configs import configs, logger
+configs.AUDIT_ON_STARTUP = False
+configs.BLOCK_STORE_LOCATION = tempfile.mkdtemp() # keep the node's own store untouched
+logger.setLevel("WARNING")
+
+from fastapi.testclient import TestClient
+import main
+from blockchain.blockchain import Blockchain
+from engine.engine import Engine
+from models.mining_criterion import MiningCriterion
+from models.user import User
+
+USER_COUNTS = [1_000, 100_000, 1_000_000]
+N_LOOKUPS = 1_000
+N_SCANS = 20 # the linear scan is slow at large user counts
+PAGE_SIZE = 100
+
+def linear_scan(engine: Engine, public_key):
+    """The previous Engine.get_user."""
+    for user in engine.current_users.values():
+        if user.public_key == public_key:
+            return user
+
+def islice_page(engine: Engine, start: int):
+    """The previous Engine.list_users."""
+    return list(islice(engine.current_users.values(), start, start + PAGE_SIZE))
+
+def per_call_us(function, arguments):
+    start = time.perf_counter()
+    for argument in arguments:
+        function(argument)
+    return (time.perf_counter() - start) / len(arguments) * 1e6
+
+if __name__ == "__main__":
+    rng = random.Random(0)
+    print(f"{'users':>9} | {'indexed (us)':>12} | {'scan (us)':>10} | {'/login median (ms)':>18} | {'/login p99 (ms)':>15} | {'last page (us)':>14} | {'islice page (us)':>16}")
+    with TestClient(main.app) as client:
+        for n in USER_COUNTS:
+            engine = Engine(Blockchain(criterion=MiningCriterion(type="leading_zeros", difficulty=0)), logger)
+            # NOTE: synthetic keys, the lookup doesn't check that they are on the curve
+            for i in range(n):
+                engine.add_user(User(username=f"user{i}", public_key=(i, i + 1)))
+            main.app.state.engine = engine
+            keys = [(i, i + 1) for i in (rng.randrange(n) for _ in range(N_LOOKUPS))]
+
+            indexed = per_call_us(engine.get_user, keys)
+            scan = per_call_us(lambda key: linear_scan(engine, key), keys[:N_SCANS])
+            latencies = []
+            for key in keys:
+                start = time.perf_counter()
+                assert client.post("/login", json={"public_key": list(key)}).json()["success"] == 1
+                latencies.append((time.perf_counter() - start) * 1000)
+            latencies.sort()
+            last_page = per_call_us(lambda start: engine.list_users(start, PAGE_SIZE), [n - PAGE_SIZE] * N_SCANS)
+            islice_last_page = per_call_us(lambda start: islice_page(engine, start), [n - PAGE_SIZE] * N_SCANS)
+            print(f"{n:>9} | {indexed:>12.2f} | {scan:>10.0f} | {statistics.median(latencies):>18.2f} | {latencies[int(0.99 * len(latencies)) - 1]:>15.2f} | {last_page:>14.1f} | {islice_last_page:>16.0f}")
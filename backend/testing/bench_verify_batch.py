@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+
+Benchmark: verifying a block's transactions one by one vs Transaction.verify_batch.
+Run from the testing folder: python bench_verify_batch.py
+
+"""
+
+import random
+import time
+
+import sys
+from pathlib import Path
+parent_dir = Path.cwd().parent
+sys.path.append(str(parent_dir))
+sys.path.append(str(parent_dir / "app"))
+
+from app.blockchain.digital_signature.ecc import secp256k1
+from app.blockchain.block import Transaction
+
+BLOCK_SIZES = [100, 1000, 10000]
+LOOP_SAMPLE = 1000 # the one by one loop is timed on at most this many transactions and extrapolated
+ODD_R_TRANSACTIONS = 300
+
+def signed_transactions(n_transactions: int, n_senders: int):
+    keys = [random.randint(1, secp256k1.n - 1) for _ in range(n_senders)]
+    public = [secp256k1.scalar_multiply(k, secp256k1.G) for k in keys]
+    transactions, public_keys = [], []
+    for i in range(n_transactions):
+        sender = random.randrange(n_senders)
+        tx = Transaction(f"sender{sender}", "receiver", i)
+        tx.sign(keys[sender], secp256k1)
+        transactions.append(tx)
+        public_keys.append(public[sender])
+    return transactions, public_keys
+
+if __name__ == "__main__":
+    print(f"{'transactions':>12} | {'senders':>7} | {'loop (s)':>9} | {'batch (s)':>9} | {'speedup':>7}")
+    for n_transactions in BLOCK_SIZES:
+        for n_senders in [20, n_transactions]:
+            transactions, public_keys = signed_transactions(n_transactions, n_senders)
+
+            sample = min(n_transactions, LOOP_SAMPLE)
+            start = time.perf_counter()
+            assert all(tx.verify(pk, secp256k1) for tx, pk in zip(transactions[:sample], public_keys[:sample]))
+            loop = (time.perf_counter() - start) * n_transactions / sample
+
+            start = time.perf_counter()
+            assert all(Transaction.verify_batch(transactions, public_keys, secp256k1))
+            batch = time.perf_counter() - start
+            extrapolated = "*" if sample < n_transactions else " "
+            print(f"{n_transactions:>12} | {n_senders:>7} | {loop:>8.2f}{extrapolated} | {batch:>9.2f} | {loop / batch:>6.2f}x")
+    print("* extrapolated from the first", LOOP_SAMPLE, "transactions")
+
+    # Worst case: signatures that aren't normalized to an even R (legacy data, other clients), every combined check fails
+    print(f"\n{'odd R':>12} | {'senders':>7} | {'loop (s)':>9} | {'batch (s)':>9} | {'speedup':>7}")
+    for n_senders in [20, ODD_R_TRANSACTIONS]:
+        transactions, public_keys = signed_transactions(ODD_R_TRANSACTIONS, n_senders)
+        for tx in transactions:
+            tx.signature = (tx.signature[0], secp256k1.n - tx.signature[1]) # still valid, with -R
+        start = time.perf_counter()
+        assert all(tx.verify(pk, secp256k1) for tx, pk in zip(transactions, public_keys))
+        loop = time.perf_counter() - start
+        start = time.perf_counter()
+        assert all(Transaction.verify_batch(transactions, public_keys, secp256k1))
+        batch = time.perf_counter() - start
+        print(f"{ODD_R_TRANSACTIONS:>12} | {n_senders:>7} | {loop:>9.2f} | {batch:>9.2f} | {loop / batch:>6.2f}x")
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+
+Tests for the batched execution of the queued actions.
+
+"""
+
+import asyncio
+import os
+import random
+import pytest
+from copy import copy
+from concurrent.futures import ProcessPoolExecutor, wait
+
+import sys
+from pathlib import Path
+parent_dir = Path.cwd().parent
+sys.path.append(str(parent_dir))
+sys.path.append(str(parent_dir / "app"))
+
+from app.blockchain.block import Transaction
+from app.blockchain.blockchain import Blockchain
+from app.blockchain.digital_signature.ecc import secp256k1
+from app.engine.engine import Engine
+from app.blockchain.hashing.sha2 import SHA256
+from app.models.actions import SubmitTransaction, MinedBlockValidation
+from app.models.mining_criterion import MiningCriterion
+from app.models.user import User
+from app.configs import logger
+
+private_keys = {"Alice": 1111, "Bob": 2222, "Carol": 3333}
+
+def new_engine():
+    engine = Engine(Blockchain(criterion=MiningCriterion(type="leading_zeros", difficulty=0)), logger)
+    for username, private_key in private_keys.items():
+        engine.add_user(User(username=username, public_key=secp256k1.multiply_generator(private_key)))
+    engine.max_pending_transactions = 3
+    return engine
+
+def submission(sender, receiver, amount, signer=None):
+    tx = Transaction(sender, receiver, amount)
+    tx.sign(private_keys[signer or sender], secp256k1)
+    return SubmitTransaction(action_type="submit_transaction", action_data={
+        "sender": sender, "receiver": receiver, "amount": amount, "signature": (str(tx.signature[0]), str(tx.signature[1]))
+    })
+
+@pytest.fixture(scope="module")
+def actions():
+    valid = [submission("Alice", "Bob", i) for i in range(1, 5)]
+    return [
+        *valid[:2],
+        submission("Bob", "Carol", 5, signer="Alice"), # signed with the wrong key
+        valid[0], # duplicate
+        submission("Carol", "Alice", 1),
+        *valid[2:],
+    ]
+
+def state(engine: Engine):
+    pending = [tx.hash_transaction() for tx in engine.pending_transactions]
+    blocks = [[tx.hash_transaction() for tx in block.data] for block in engine.pending_blocks.values()]
+    return pending, blocks
+
+def test_batch_matches_sequential(actions):
+    sequential, batched = new_engine(), new_engine()
+    expected = [action(sequential) for action in actions]
+    assert expected == [True, True, False, False, True, True, True]
+    assert batched.execute_actions(actions) == expected
+    assert state(batched) == state(sequential)
+    assert len(batched.pending_blocks) == 1 and len(batched.pending_transactions) == 2
+    assert batched.processed_actions == len(actions)
+
+def test_unknown_sender(actions):
+    engine = new_engine()
+    engine.remove_user(engine.current_users["Carol"])
+    assert engine.execute_actions(actions) == [True, True, False, False, False, True, True]
+
+def test_expired_transactions_are_forgotten(actions):
+    engine = new_engine()
+    engine.max_pending_transactions = 100
+    now = [0.0]
+    engine.mempool.ttl, engine.mempool.clock = 10, lambda: now[0]
+    assert engine.execute_actions(actions[:2]) == [True, True]
+    assert engine.ledger.pending_delta("Alice") == -3
+
+    now[0] = 11
+    assert engine.execute_actions(actions[:1]) == [True] # expired before the batch, so it isn't a duplicate anymore
+    assert len(engine.mempool) == 1 and actions[0].to_transaction() in engine.mempool
+    assert engine.ledger.pending_delta("Alice") == -1
+
+def mined(engine: Engine, miner: str, nonce: int = 7, signer=None) -> MinedBlockValidation:
+    """Solve the (only) pending block, the test criterion accepts any nonce."""
+    block = copy(next(iter(engine.pending_blocks.values())))
+    block.nonce = nonce
+    h = int(SHA256.digest(block.hash), 16) % secp256k1.n
+    k = random.randint(1, secp256k1.n - 1)
+    r = secp256k1.scalar_multiply(k, secp256k1.G)[0] % secp256k1.n
+    s = pow(k, -1, secp256k1.n) * (h + private_keys[signer or miner] * r) % secp256k1.n
+    return MinedBlockValidation(action_type="mined_block_validation", action_data={
+        "index": block.index, "previous_hash": block.previous_hash, "timestamp": block.timestamp, "nonce": nonce,
+        "criterion": block.criterion.serialize(), "miner": miner, "signature": (str(r), str(s))
+    })
+
+def test_mined_block_validation(actions):
+    engine = new_engine()
+    engine.execute_actions(actions)
+    forged = mined(engine, "Bob", signer="Alice")
+    assert engine.execute_actions([forged, mined(engine, "Bob")]) == [False, True]
+    assert len(engine.blockchain.chain) == 2 and not engine.pending_blocks
+    assert engine.blockchain.chain[-1].nonce == 7 and engine.blockchain.chain[-1].finalized
+    assert engine.blockchain.validate_chain()
+
+@pytest.mark.parametrize("workers", [0, 1])
+def test_process_action_batches(actions, workers):
+    engine = new_engine()
+    sequential = new_engine()
+    sequential.execute_actions(actions)
+    pending_block = next(iter(sequential.pending_blocks))
+
+    async def run():
+        queue = asyncio.Queue()
+        for action in actions:
+            queue.put_nowait(action)
+        processor = asyncio.create_task(engine.process_action(queue, batch_size=4, workers=workers))
+        while engine.processed_actions < len(actions):
+            await asyncio.sleep(0.01)
+        # NOTE: the block ids are random, mine the block created by this engine
+        queue.put_nowait(mined(engine, "Carol"))
+        while engine.processed_actions < len(actions) + 1:
+            await asyncio.sleep(0.01)
+        processor.cancel()
+
+    asyncio.run(run())
+    assert state(engine) == ([tx.hash_transaction() for tx in sequential.pending_transactions], [])
+    assert [tx.hash_transaction() for tx in engine.blockchain.chain[-1].data] == [tx.hash_transaction() for tx in sequential.pending_blocks[pending_block].data]
+
+def test_broken_pool_falls_back_to_the_event_loop(actions):
+    engine = new_engine()
+    sequential = new_engine()
+    expected = sequential.execute_actions(actions)
+
+    broken = ProcessPoolExecutor(max_workers=1)
+    wait([broken.submit(os._exit, 1)]) # the worker dies, which breaks the pool
+    engine._verification_pool = broken
+    try:
+        assert asyncio.run(engine.execute_actions_offloaded(actions)) == expected
+        assert state(engine) == state(sequential)
+        assert engine._verification_pool is None # recreated by the next batch
+        assert asyncio.run(engine.execute_actions_offloaded([submission("Bob", "Alice", 1)])) == [True]
+        assert engine._verification_pool is not None
+    finally:
+        engine.close_verification_pool()
+
+def test_point_cache_stats_include_the_workers(actions):
+    engine = new_engine()
+    parent = engine.point_cache_stats()
+    try:
+        asyncio.run(engine.execute_actions_offloaded(actions))
+        assert len(engine._worker_cache_stats) == 1 # verified in the worker, with its own cache
+        stats = engine.point_cache_stats()
+        assert stats["capacity"] == 2 * parent["capacity"]
+        assert stats["hits"] + stats["misses"] > parent["hits"] + parent["misses"]
+    finally:
+        engine.close_verification_pool()
+
+def test_failed_batch_does_not_stop_the_processor(actions):
+    engine = new_engine()
+
+    async def run():
+        queue = asyncio.Queue()
+        queue.put_nowait("not an action") # its batch raises
+        for action in actions:
+            queue.put_nowait(action)
+        processor = asyncio.create_task(engine.process_action(queue, batch_size=1, workers=0))
+        while engine.processed_actions < len(actions):
+            await asyncio.sleep(0.01)
+        processor.cancel()
+
+    asyncio.run(run())
+    assert engine.failed_actions == 1 and engine.processed_actions == len(actions)
+
+def test_ledger_out_of_sync_is_restored_before_adding_a_block(actions):
+    engine = new_engine()
+    engine.execute_actions(actions)
+    engine.ledger.height -= 1 # e.g. a block applied to the chain, but not to the ledger
+    assert engine.execute_actions([mined(engine, "Bob")]) == [True]
+    assert engine.ledger.height == len(engine.blockchain.chain) == 2
+    assert engine.ledger.block_hash == engine.blockchain.chain[-1].hash
+
@@ -19,7 +19,10 @@ from uuid import uuid4
 from app.blockchain.block import Transaction
 from app.blockchain.digital_signature.ecc import secp256k1, ECC
 from app.main import app
+from configs import configs # NOTE: the module the app uses
+import asyncio
 import random
+import json
 
 # To ensure unique usernames:
 user1 = f"testuser_{uuid4().hex[:6]}"
@@ -52,6 +55,16 @@ def test_register_users():
         assert r2.status_code == 200
         assert r2.json()["success"] == 1
 
+def test_login_and_user_list():
+    with TestClient(app) as client:
+        login = client.post("/login", json={"public_key": pub_test}).json()
+        assert login["success"] == 1 and login["username"] == user1
+        assert client.post("/login", json={"public_key": [1, 2]}).json()["success"] == 0
+
+        page = client.get("/users", params={"from": 0, "limit": 1000}).json()
+        assert user1 in [user["username"] for user in page["users"]]
+        assert page["total"] == client.get("/info").json()["user_count"]
+
 def test_submit_transaction():
 
     tx = Transaction("testuser", "Ubulka", 100)
@@ -71,12 +84,115 @@ def test_submit_transaction():
         assert r.status_code == 200
         assert r.json()["action_type"] == "submit_transaction"
 
+def signed_payload(private_key, sender=None, receiver=None, amount=1):
+    tx = Transaction(sender or user1, receiver or user2, amount)
+    tx.sign(private_key)
+    return {
+        "action_type": "submit_transaction",
+        "action_data": {"sender": tx.sender, "receiver": tx.receiver, "amount": tx.amount, "signature": (str(tx.signature[0]), str(tx.signature[1]))}
+    }
+
+def test_submission_backpressure():
+    with TestClient(app) as client:
+        queue = app.state.action_queue = asyncio.Queue(maxsize=1) # NOTE: not consumed by the processor
+        assert client.post("/submit_action", json=signed_payload(priv_test)).status_code == 200
+        full = client.post("/submit_action", json=signed_payload(priv_test, amount=2))
+        assert full.status_code == 429 and full.headers["Retry-After"] == str(configs.ACTION_RETRY_AFTER)
+        assert client.post("/submit_action", json={"action_type": "nope"}).status_code == 400
+
+        stats = client.get("/queue").json()
+        assert stats["depth"] == 1 and stats["capacity"] == 1
+        assert stats["accepted"] == 1 and stats["rejected"] == {"queue_full": 1, "invalid_action": 1}
+
+        client.portal.call(app.state.processor.cancel)
+        client.portal.call(asyncio.sleep, 0)
+        stopped = client.post("/submit_action", json=signed_payload(priv_test, amount=3))
+        assert stopped.status_code == 503 and "Retry-After" in stopped.headers
+        assert queue.qsize() == 1
+
+def test_submission_preverification():
+    configs.PREVERIFY_SIGNATURES = True
+    try:
+        with TestClient(app) as client:
+            assert client.post("/submit_action", json=signed_payload(priv_test)).status_code == 200
+            forged = client.post("/submit_action", json=signed_payload(priv_ubulka)) # signed with the receiver's key
+            assert forged.status_code == 422 and "Retry-After" not in forged.headers
+            unknown = client.post("/submit_action", json=signed_payload(priv_test, sender=f"nobody_{uuid4().hex[:6]}"))
+            assert unknown.status_code == 422
+            assert client.get("/queue").json()["rejected"] == {"invalid_signature": 1, "unknown_sender": 1}
+    finally:
+        configs.PREVERIFY_SIGNATURES = False
+
+def test_bulk_submission():
+    items = [
+        signed_payload(priv_test, amount=10),
+        {"action_type": "submit_transaction", "action_data": {"sender": user1}}, # incomplete
+        {"action_type": "mined_block_validation", "action_data": {}},
+        signed_payload(priv_test, amount=11),
+    ]
+    configs.PREVERIFY_SIGNATURES = True
+    try:
+        with TestClient(app) as client:
+            result = client.post("/submit_actions", json=items).json()
+            assert (result["accepted"], result["rejected"]) == (2, 2)
+            assert [item["status"] for item in result["results"]] == ["queued", "rejected", "rejected", "queued"]
+            assert "Only submit_transaction" in result["results"][2]["error"]
+
+            forged = signed_payload(priv_ubulka, amount=12)
+            ndjson = "\n".join(json.dumps(item) for item in [forged, signed_payload(priv_test, amount=13)])
+            result = client.post("/submit_actions", content=ndjson, headers={"content-type": "application/x-ndjson"}).json()
+            assert result["results"] == [{"status": "rejected", "error": "Transaction signature invalid."}, {"status": "queued"}]
+
+            stats = client.get("/queue").json()
+            assert stats["accepted"] == 3 and stats["rejected"] == {"invalid_action": 2, "invalid_signature": 1}
+            assert client.post("/submit_actions", json={"not": "a list"}).status_code == 400
+            assert client.post("/submit_actions", content="{", headers={"content-type": "application/x-ndjson"}).status_code == 400
+    finally:
+        configs.PREVERIFY_SIGNATURES = False
+
 def test_info_and_blockchain():
     with TestClient(app) as client:
         info = client.get("/info")
         assert info.status_code == 200
         assert "users" in info.json()
+        assert info.json()["pending_count"] >= len(info.json()["pending_transactions"])
 
         chain = client.get("/blockchain")
         assert chain.status_code == 200
-        assert "blockchain" in chain.json()
\ No newline at end of file
+        assert "blockchain" in chain.json()
+
+def test_blockchain_pages_and_stream():
+    with TestClient(app) as client:
+        first = client.get("/blockchain", params={"from": 0, "limit": 2}).json()
+        height = first["height"]
+        assert len(first["blockchain"]["blocks"]) == min(2, height)
+        assert first["next"] == (2 if height > 2 else None)
+
+        streamed = client.get("/blockchain/stream", params={"from": 1})
+        assert streamed.headers["content-type"].startswith("application/x-ndjson")
+        lines = [json.loads(line) for line in streamed.text.splitlines()]
+        assert len(lines) == height - 1
+        if height > 2:
+            assert lines[0] == first["blockchain"]["blocks"][1]
+
+        tip = client.get(f"/blocks/{height - 1}").json()
+        assert tip["height"] == height - 1
+        by_hash = client.get(f"/blocks/{tip['block']['hash']}").json()
+        assert by_hash["block"] == tip["block"]
+        assert client.get(f"/blocks/{height}").status_code == 404
+        assert client.get(f"/blocks/{'ab' * 32}").status_code == 404
+        assert client.get("/blockchain", params={"limit": 0}).status_code == 422
+
+        assert client.get("/transactions/not-hex").status_code == 400
+        assert client.get(f"/transactions/{'ab' * 32}").status_code == 404
+        for block in lines:
+            for tx in block["transactions"]:
+                located = client.get(f"/transactions/{Transaction.load_from_dict(tx).hash_transaction():x}").json()
+                assert tx in [location["transaction"] for location in located["locations"]]
+                history = client.get(f"/users/{tx['sender']}/transactions", params={"limit": 1000}).json()
+                assert tx in [entry["transaction"] for entry in history["transactions"]]
+
+        balance = client.get(f"/balance/{user1}").json()
+        assert balance["available"] == balance["balance"] + balance["pending"]
+        assert client.get(f"/balance/nobody_{uuid4().hex[:6]}").status_code == 404
+
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+
+Tests for the append-only block store.
+
+"""
+
+import pytest
+import json
+
+import sys
+from pathlib import Path
+parent_dir = Path.cwd().parent
+sys.path.append(str(parent_dir))
+sys.path.append(str(parent_dir / "app"))
+
+from app.blockchain.block import Block, Transaction
+from app.blockchain.blockchain import Blockchain
+from app.blockchain.block_store import BlockStore, LazyChain, INDEX_ENTRY
+from app.blockchain import blockchain as blockchain_module
+from app.models.mining_criterion import MiningCriterion
+
+criterion = MiningCriterion(type="leading_zeros", difficulty=0)
+
+def make_blocks(n: int):
+    blocks, previous_hash = [], "0"
+    for i in range(n):
+        block = Block(index=i, previous_hash=previous_hash, data=[Transaction("Alice", "Bob", i)], criterion=criterion, timestamp=str(i))
+        blocks.append(block)
+        previous_hash = block.hash
+    return blocks
+
+def test_append_and_read(tmp_path):
+    blocks = make_blocks(20)
+    with BlockStore(tmp_path, segment_size=2048) as store:
+        for height, block in enumerate(blocks):
+            assert store.append(block) == height
+        assert store.read(7).hash == blocks[7].hash
+        with pytest.raises(IndexError):
+            store.read(20)
+    assert len(list(tmp_path.glob("blocks_*.dat"))) > 1 # rolled over to new segments
+
+    with BlockStore(tmp_path, segment_size=2048) as store:
+        assert len(store) == 20
+        assert [block.hash for block in store] == [block.hash for block in blocks]
+        assert store.block_hash(19) == blocks[19].hash
+        store.append(make_blocks(21)[-1])
+        assert store.read(20).index == 20
+
+def test_torn_tail_is_truncated(tmp_path):
+    blocks = make_blocks(5)
+    with BlockStore(tmp_path) as store:
+        for block in blocks:
+            store.append(block)
+    segment = tmp_path / "blocks_00000.dat"
+    size = segment.stat().st_size
+    with open(segment, "ab") as f:
+        f.write(b"\x00\x00\x01\x00garbage") # record header without the full payload
+
+    with BlockStore(tmp_path) as store:
+        assert len(store) == 5
+        assert segment.stat().st_size == size
+        store.append(make_blocks(6)[-1])
+    with BlockStore(tmp_path) as store:
+        assert store.read(5).index == 5
+
+def test_missing_index_entries_are_rebuilt(tmp_path):
+    blocks = make_blocks(5)
+    with BlockStore(tmp_path) as store:
+        for block in blocks:
+            store.append(block)
+    index = tmp_path / "index.dat"
+    index.write_bytes(index.read_bytes()[:2 * INDEX_ENTRY.size + 5]) # crash while writing the index
+
+    with BlockStore(tmp_path) as store:
+        assert len(store) == 5
+        assert store.block_hash(4) == blocks[4].hash
+
+def test_corrupt_record_is_dropped(tmp_path):
+    blocks = make_blocks(3)
+    with BlockStore(tmp_path) as store:
+        for block in blocks:
+            store.append(block)
+    segment = tmp_path / "blocks_00000.dat"
+    data = bytearray(segment.read_bytes())
+    data[-3] ^= 0xFF # the checksum of the last record no longer matches
+    segment.write_bytes(data)
+
+    with BlockStore(tmp_path) as store:
+        assert len(store) == 2
+
+def test_json_round_trip(tmp_path):
+    chain = {"blocks": [block.json_serialize() for block in make_blocks(4)]}
+    json_path = tmp_path / "chain.json"
+    json_path.write_text(json.dumps(chain))
+    with BlockStore(tmp_path / "store") as store:
+        assert store.import_json(json_path) == 4
+        store.export_json(tmp_path / "exported.json")
+    assert json.loads((tmp_path / "exported.json").read_text()) == chain
+
+def test_blockchain_persists_accepted_blocks(tmp_path):
+    chain = Blockchain(criterion=criterion)
+    chain.attach_store(BlockStore(tmp_path))
+    for i in range(1, 4):
+        block = Block(index=i, previous_hash=chain.chain[-1].hash, data=[], criterion=criterion, timestamp=str(i))
+        assert chain.add_block(block)
+    assert not chain.add_block(Block(index=4, previous_hash="ab" * 32, data=[], criterion=criterion, timestamp="4"))
+    chain.store.close()
+
+    reloaded = Blockchain(criterion=criterion)
+    reloaded.attach_store(BlockStore(tmp_path))
+    assert [block.hash for block in reloaded.chain] == [block.hash for block in chain.chain]
+    assert reloaded.validated_index == 3 # the stored tip is trusted, the next block is checked against it only
+    assert reloaded.validate_chain()
+    reloaded.store.close()
+
+    untrusted = Blockchain(criterion=criterion)
+    untrusted.attach_store(BlockStore(tmp_path), trusted=False)
+    assert untrusted.validated_index == 0
+    assert untrusted.add_block(Block(index=4, previous_hash=untrusted.chain[-1].hash, data=[], criterion=criterion, timestamp="4"))
+    assert untrusted.validated_index == 4
+    untrusted.store.close()
+
+def test_lazy_chain(tmp_path):
+    blocks = make_blocks(30)
+    with BlockStore(tmp_path) as store:
+        chain = LazyChain(store, cache_size=4)
+        for block in blocks[:-1]:
+            chain.append(block)
+        assert len(chain) == 29
+        assert chain[-1] is blocks[28] # just appended, still cached
+        assert len(chain._cache) == 4
+        assert chain[3].hash == blocks[3].hash
+        assert chain[3] is chain[3] # hydrated once, then served from the cache
+        assert [block.hash for block in chain[10:13]] == [block.hash for block in blocks[10:13]]
+        assert [block.hash for block in chain] == [block.hash for block in blocks[:-1]]
+        assert len(chain._cache) == 4
+        with pytest.raises(IndexError):
+            chain[29]
+        chain.append(blocks[-1])
+        assert chain[-1].hash == blocks[-1].hash and len(store) == 30
+
+def test_store_backed_audit_in_windows(tmp_path, monkeypatch):
+    monkeypatch.setattr(blockchain_module, "AUDIT_WINDOW", 7)
+    chain = Blockchain(criterion=criterion)
+    chain.attach_store(BlockStore(tmp_path), cache_size=8)
+    for i in range(1, 40):
+        block = Block(index=i, previous_hash=chain.chain[-1].hash, data=[Transaction("Alice", "Bob", i)], criterion=criterion, timestamp=str(i))
+        assert chain.add_block(block)
+    assert chain.validate_chain()
+    assert chain.validate_chain(parallel=True, workers=2)
+    assert chain.validated_index == 39
+    chain.store.close()
+
+def test_serial_and_parallel_audit_agree_on_a_corrupted_record(tmp_path, monkeypatch):
+    monkeypatch.setattr(blockchain_module, "MIN_AUDIT_SHARD", 4) # small enough for the pool to be used
+    chain = Blockchain(criterion=criterion)
+    chain.attach_store(BlockStore(tmp_path), cache_size=8)
+    for i in range(1, 40):
+        block = Block(index=i, previous_hash=chain.chain[-1].hash, data=[Transaction("Alice", "Bob", i)], criterion=criterion, timestamp=str(i))
+        assert chain.add_block(block)
+
+    read_dict = chain.store.read_dict
+    def corrupted(height, tx_hashes=False):
+        """Block 20 with a changed amount, its stored hash and the link of block 21 unchanged."""
+        block = read_dict(height, tx_hashes)
+        if height == 20:
+            block["transactions"][0]["amount"] = 1000
+        return block
+    monkeypatch.setattr(chain.store, "read_dict", corrupted)
+
+    for parallel in [False, True]:
+        chain.validated_index = 39
+        assert not chain.validate_chain(parallel=parallel, workers=2)
+        assert chain.validated_index == 19
+    chain.store.close()
+
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+
+Tests for the chain validation (incremental add_block and the full audit).
+
+"""
+
+import pytest
+
+import sys
+from pathlib import Path
+parent_dir = Path.cwd().parent
+sys.path.append(str(parent_dir))
+sys.path.append(str(parent_dir / "app"))
+
+from app.blockchain.block import Block, Transaction
+from app.blockchain.blockchain import Blockchain
+from app.models.mining_criterion import MiningCriterion
+from app.blockchain.digital_signature.ecc import secp256k1
+
+criterion = MiningCriterion(type="leading_zeros", difficulty=1)
+
+def next_block(chain: Blockchain, i: int) -> Block:
+    block = Block(index=i, previous_hash=chain.chain[-1].hash, data=[Transaction("Alice", "Bob", i)], criterion=criterion, timestamp=str(i))
+    block.mine(criterion.check)
+    return block
+
+@pytest.fixture
+def chain():
+    chain = Blockchain(criterion=criterion)
+    for i in range(1, 6):
+        assert chain.add_block(next_block(chain, i))
+    return chain
+
+def test_add_block_moves_tip(chain):
+    assert chain.validated_index == 5
+    assert chain.validate_chain()
+    assert chain.validate_chain(from_index=3)
+
+def test_add_block_rejects_invalid(chain):
+    bad_link = Block(index=6, previous_hash="ab" * 32, data=[], criterion=criterion, timestamp="6")
+    bad_link.mine(criterion.check)
+    assert not chain.add_block(bad_link)
+
+    unmined = Block(index=6, previous_hash=chain.chain[-1].hash, data=[], criterion=criterion, timestamp="6")
+    unmined.nonce = next(n for n in range(100) if not criterion.check(Block(6, chain.chain[-1].hash, [], criterion, "6", n).hash))
+    assert not chain.add_block(unmined)
+    assert len(chain.chain) == 6 and chain.validated_index == 5
+
+def test_full_audit_finds_tampering(chain):
+    chain.chain[2].data[0].amount = 1000 # changes the hash of block 2, breaking the linkage of block 3
+    assert chain.validate_chain(from_index=4) # only the blocks after the tampered one
+    assert not chain.validate_chain()
+    assert chain.validated_index == 1
+
+def test_loaded_chain_is_validated_before_adding(chain, tmp_path):
+    path = tmp_path / "chain.json"
+    chain.chain[3].data[0].amount = 1000
+    import json
+    path.write_text(json.dumps(chain.json_serialize()))
+
+    loaded = Blockchain(criterion=criterion)
+    loaded.load_from_json(path)
+    assert loaded.validated_index == 0
+    assert not loaded.add_block(next_block(loaded, 6))
+    assert loaded.validated_index < 4
+
+def build_chain(n: int) -> Blockchain:
+    """Chain of n blocks, accepting every hash (difficulty 0), long enough for the parallel audit."""
+    zero_difficulty = MiningCriterion(type="leading_zeros", difficulty=0)
+    chain = Blockchain(criterion=zero_difficulty)
+    for i in range(1, n + 1):
+        block = Block(index=i, previous_hash=chain.chain[-1].hash, data=[Transaction("Alice", "Bob", i)], criterion=zero_difficulty, timestamp=str(i))
+        assert chain.add_block(block)
+    return chain
+
+def test_parallel_audit_matches_serial():
+    chain = build_chain(700)
+    assert chain.validate_chain(parallel=True, workers=2)
+    assert chain.validated_index == 700
+
+    chain.chain[450].data[0].amount = 1000 # the cached hash of block 450 is now stale
+    chain.chain[600].previous_hash = "ab" * 32
+    assert not chain.validate_chain(parallel=True, workers=2)
+    parallel_index = chain.validated_index
+    chain.validated_index = 700
+    assert not chain.validate_chain()
+    assert parallel_index == chain.validated_index == 449
+
+def test_audit_signatures():
+    private_key = 12345
+    public_keys = {"Alice": secp256k1.scalar_multiply(private_key, secp256k1.G)}
+    chain = build_chain(300)
+    for block in chain.chain[1:]:
+        block.data[0].sign(private_key, secp256k1)
+    assert chain.validate_chain(parallel=True, workers=2, public_keys=public_keys)
+
+    chain.chain[123].data[0].signature = chain.chain[124].data[0].signature
+    for parallel in [False, True]:
+        assert not chain.validate_chain(parallel=parallel, workers=2, public_keys=public_keys)
+        assert chain.validated_index == 122
+
+def test_audit_skips_unregistered_senders():
+    private_key = 12345
+    public_keys = {"Alice": secp256k1.scalar_multiply(private_key, secp256k1.G)}
+    chain = build_chain(300)
+    for block in chain.chain[1:]:
+        block.data[0].sign(private_key, secp256k1)
+    unregistered = Transaction("Mallory", "Bob", 1) # unsigned, from a sender without a key
+    block = Block(index=301, previous_hash=chain.chain[-1].hash, data=[unregistered], criterion=chain.criterion, timestamp="301")
+    assert chain.add_block(block)
+    for parallel in [False, True]:
+        assert chain.validate_chain(parallel=parallel, workers=2, public_keys=public_keys)
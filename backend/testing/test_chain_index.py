@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+
+Tests for the chain indexes (block, transaction and user lookups, replay detection).
+
+"""
+
+import asyncio
+import pytest
+import threading
+
+import sys
+from pathlib import Path
+parent_dir = Path.cwd().parent
+sys.path.append(str(parent_dir))
+sys.path.append(str(parent_dir / "app"))
+
+from app.blockchain.block import Block, Transaction
+from app.blockchain.blockchain import Blockchain
+from app.blockchain.block_store import BlockStore
+from app.blockchain.digital_signature.ecc import secp256k1
+from app.models.mining_criterion import MiningCriterion
+
+criterion = MiningCriterion(type="leading_zeros", difficulty=0)
+private_key = 424242
+
+def signed(sender, receiver, amount):
+    tx = Transaction(sender, receiver, amount)
+    tx.sign(private_key, secp256k1)
+    return tx
+
+def extend(chain: Blockchain, transactions_per_block):
+    for transactions in transactions_per_block:
+        block = Block(index=len(chain.chain), previous_hash=chain.chain[-1].hash, data=transactions, criterion=criterion, timestamp=str(len(chain.chain)))
+        assert chain.add_block(block)
+
+@pytest.fixture
+def transactions():
+    return [
+        [signed("Alice", "Bob", 10), signed("Bob", "Carol", 5)],
+        [signed("Alice", "Bob", 10)], # the same payment again, with a new signature
+        [signed("Carol", "Carol", 1)],
+    ]
+
+def check_index(chain: Blockchain, transactions):
+    assert chain.height_of(chain.chain[2].hash) == 2
+    assert chain.height_of("ab" * 32) is None
+    assert chain.index.locate_transaction(transactions[0][0].hash_transaction()) == [(1, 0), (2, 0)]
+    assert chain.index.transactions_of("Bob") == [(1, 0), (1, 1), (2, 0)]
+    assert chain.index.transactions_of("Carol") == [(1, 1), (3, 0)] # a self transfer is listed once
+    assert chain.transaction_at(1, 1)["receiver"] == "Carol"
+
+    assert chain.index.is_replay(transactions[1][0])
+    replay = Transaction("Alice", "Bob", 10, signature=(transactions[1][0].signature[0], secp256k1.n - transactions[1][0].signature[1]))
+    assert chain.index.is_replay(replay) # the malleated signature is a replay too
+    assert not chain.index.is_replay(signed("Alice", "Bob", 10))
+
+def test_index_updated_by_add_block(transactions):
+    chain = Blockchain(criterion=criterion)
+    extend(chain, transactions)
+    check_index(chain, transactions)
+
+def test_index_rebuilt_on_load(transactions, tmp_path):
+    chain = Blockchain(criterion=criterion)
+    chain.attach_store(BlockStore(tmp_path))
+    extend(chain, transactions)
+    chain.store.close()
+
+    reloaded = Blockchain(criterion=criterion)
+    reloaded.attach_store(BlockStore(tmp_path))
+    assert reloaded._index is None # built on the first lookup
+    stored = reloaded.store.read_dict(1, tx_hashes=True)
+    assert stored["tx_hashes"] == [f"{tx.hash_transaction():064x}" for tx in transactions[0]]
+    assert "tx_hashes" not in reloaded.store.read_dict(1)
+    check_index(reloaded, transactions)
+    reloaded.store.close()
+
+def test_index_built_in_a_thread_while_blocks_are_added(transactions, tmp_path):
+    chain = Blockchain(criterion=criterion)
+    chain.attach_store(BlockStore(tmp_path))
+    extend(chain, transactions)
+    extend(chain, [[signed("Dave", "Erin", i)] for i in range(30)])
+    chain.store.close()
+
+    reloaded = Blockchain(criterion=criterion)
+    reloaded.attach_store(BlockStore(tmp_path))
+    builder = threading.Thread(target=reloaded.build_index)
+    builder.start()
+    added = [[signed("Erin", "Dave", i)] for i in range(10)]
+    extend(reloaded, added) # NOTE: indexed by add_block or by the build, whichever comes first
+    builder.join()
+    assert reloaded.index_built and len(reloaded.index) == len(reloaded.chain) == 44
+    assert reloaded.index.transactions_of("Erin") == [(height, 0) for height in range(4, 44)]
+    check_index(reloaded, transactions)
+    reloaded.store.close()
+
+def test_engine_awaits_the_background_index_build(transactions, tmp_path):
+    from app.engine.engine import Engine
+    from app.configs import logger
+
+    chain = Blockchain(criterion=criterion)
+    chain.attach_store(BlockStore(tmp_path))
+    extend(chain, transactions)
+    chain.store.close()
+
+    reloaded = Blockchain(criterion=criterion)
+    reloaded.attach_store(BlockStore(tmp_path))
+    engine = Engine(reloaded, logger)
+
+    async def run():
+        engine.build_index_in_background()
+        assert engine._index_build is not None
+        await engine.wait_for_index()
+
+    asyncio.run(run())
+    assert reloaded.index_built
+    check_index(reloaded, transactions)
+    reloaded.store.close()
+
+def test_submit_transaction_rejects_replays():
+    from app.engine.engine import Engine
+    from app.models.actions import SubmitTransaction
+    from app.models.user import User
+    from app.configs import logger
+
+    engine = Engine(Blockchain(criterion=criterion), logger)
+    engine.max_pending_transactions = 10
+    engine.add_user(User(username="Alice", public_key=secp256k1.scalar_multiply(private_key, secp256k1.G)))
+    engine.add_user(User(username="Bob", public_key=secp256k1.scalar_multiply(private_key + 1, secp256k1.G)))
+
+    def submit(tx):
+        data = {"sender": tx.sender, "receiver": tx.receiver, "amount": tx.amount, "signature": [str(v) for v in tx.signature]}
+        return SubmitTransaction(action_type="submit_transaction", action_data=data)(engine)
+
+    tx = signed("Alice", "Bob", 10)
+    assert submit(tx)
+    assert not submit(tx) # pending already
+    extend(engine.blockchain, [[tx]])
+    engine.pending_replay_keys.clear()
+    assert not submit(tx) # in the chain
+    assert submit(signed("Alice", "Bob", 10))
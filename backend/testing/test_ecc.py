@@ -14,7 +14,7 @@ from pathlib import Path
 parent_dir = Path.cwd().parent
 sys.path.append(str(parent_dir))
 
-from app.blockchain.digital_signature.ecc import ECC, secp256k1
+from app.blockchain.digital_signature.ecc import ECC, secp256k1, nist_p192, toy_curve
 
 # Official ecdsa implementation
 ecdsa_curve = curves.SECP256k1.curve
@@ -68,3 +68,106 @@ def test_key_generation(d):
     """Test that private_key * G matches ecdsa public key"""
     public_key = secp256k1.scalar_multiply(d, secp256k1.G)
 
+
+
+# Jacobian coordinates vs the affine implementation:
+def affine_scalar_multiply(curve: ECC, k, P):
+    """Reference double-and-add with affine add_points/double_point."""
+    result = (0, 0)
+    while k:
+        if k & 1:
+            result = curve.add_points(result, P)
+        P = curve.double_point(P)
+        k >>= 1
+    return result
+
+@pytest.mark.parametrize("curve, scalars", [
+    (secp256k1, [1, 2, 3, 7, 2**128 + 1, secp256k1.n - 1] + [random.randint(1, secp256k1.n - 1) for _ in range(3)]),
+    (nist_p192, [1, 2, 3, 7, nist_p192.n - 1] + [random.randint(1, nist_p192.n - 1) for _ in range(3)]),
+    (toy_curve, [1, 2, 3, 4]),
+])
+def test_jacobian_scalar_multiplication(curve, scalars):
+    for k in scalars:
+        assert curve.scalar_multiply(k, curve.G) == affine_scalar_multiply(curve, k, curve.G)
+
+@pytest.mark.parametrize("curve", [secp256k1, nist_p192, toy_curve])
+def test_scalar_multiplication_by_order(curve):
+    """n * G is the infinity point, (n + 1) * G = G."""
+    assert curve.scalar_multiply(curve.n, curve.G) == (0, 0)
+    assert curve.scalar_multiply(curve.n + 1, curve.G) == curve.G
+    assert curve.scalar_multiply(0, curve.G) == (0, 0)
+
+@pytest.mark.parametrize("curve", [secp256k1, nist_p192])
+def test_scalar_multiplication_other_point(curve):
+    """Non-generator points go through the Jacobian double-and-add."""
+    P = curve.double_point(curve.G)
+    k = random.randint(1, curve.n - 1)
+    assert curve.scalar_multiply(k, P) == affine_scalar_multiply(curve, k, P)
+
+@pytest.mark.parametrize("curve", [secp256k1, nist_p192])
+def test_generator_table(curve):
+    table = curve.generator_table()
+    w = curve.FIXED_BASE_WINDOW
+    for i in [0, 1, len(table) - 1]:
+        for j in [1, 2, 2**w - 1]:
+            assert table[i][j] == affine_scalar_multiply(curve, j * 2**(w * i), curve.G)
+    assert table[0][0] == (0, 0)
+
+# Multi-scalar multiplication:
+@pytest.mark.parametrize("k", [1, 2, 15, 16, 17, 2**255 - 1, random.randint(1, secp256k1.n - 1)])
+def test_wnaf(k):
+    for w in [2, 4, 5, 7]:
+        digits = ECC.wnaf(k, w)
+        assert sum(d * 2**i for i, d in enumerate(digits)) == k
+        assert all(d == 0 or (d % 2 == 1 and abs(d) < 2**(w - 1)) for d in digits)
+
+@pytest.mark.parametrize("curve", [secp256k1, nist_p192])
+def test_multi_scalar_multiply(curve):
+    Q = curve.scalar_multiply(random.randint(1, curve.n - 1), curve.G)
+    R = curve.scalar_multiply(random.randint(1, curve.n - 1), curve.G)
+    u1, u2, u3 = (random.randint(1, curve.n - 1) for _ in range(3))
+
+    expected = curve.add_points(curve.scalar_multiply(u1, curve.G), curve.scalar_multiply(u2, Q))
+    assert curve.multi_scalar_multiply([(u1, curve.G), (u2, Q)]) == expected
+    expected = curve.add_points(expected, curve.scalar_multiply(u3, R))
+    assert curve.multi_scalar_multiply([(u1, curve.G), (u2, Q), (u3, R)]) == expected
+
+def test_multi_scalar_multiply_edge_cases():
+    G, n = secp256k1.G, secp256k1.n
+    assert secp256k1.multi_scalar_multiply([]) == (0, 0)
+    assert secp256k1.multi_scalar_multiply([(5, G), (n - 5, G)]) == (0, 0) # 5G - 5G
+    assert secp256k1.multi_scalar_multiply([(3, G), (0, G), (2, (0, 0))]) == secp256k1.scalar_multiply(3, G)
+    for k in range(1, toy_curve.n):
+        assert toy_curve.multi_scalar_multiply([(k, toy_curve.G)]) == toy_curve.scalar_multiply(k, toy_curve.G)
+
+@pytest.mark.parametrize("curve", [secp256k1, nist_p192, toy_curve])
+def test_recover_point(curve):
+    """recover_point finds the point from its x-coordinate (sqrt mod p, p = 97 covers Tonelli-Shanks)."""
+    for k in range(1, 5):
+        x, y = curve.scalar_multiply(k, curve.G)
+        assert curve.recover_point(x) in [(x, y), (x, -y % curve.p)]
+        assert curve.recover_point(x)[1] % 2 == 0
+
+# Public key table cache:
+def test_point_cache():
+    curve = ECC(a=secp256k1.a, b=secp256k1.b, p=secp256k1.p, G=secp256k1.G, n=secp256k1.n) # separate cache from the shared instance
+    curve.enable_point_cache(capacity=2, build_after=2)
+    keys = [curve.scalar_multiply(random.randint(1, curve.n - 1), curve.G) for _ in range(3)]
+    u1, u2 = random.randint(1, curve.n - 1), random.randint(1, curve.n - 1)
+    expected = [curve.add_points(curve.scalar_multiply(u1, curve.G), affine_scalar_multiply(curve, u2, Q)) for Q in keys]
+
+    for _ in range(3):
+        for Q, value in zip(keys[:2], expected):
+            assert curve.multi_scalar_multiply([(u1, curve.G), (u2, Q)], cacheable=(Q,)) == value
+    assert curve.point_cache.stats() == {"capacity": 2, "size": 2, "hits": 2, "misses": 4}
+    assert curve.scalar_multiply(u2, keys[0]) == affine_scalar_multiply(curve, u2, keys[0])
+
+    # a third key evicts the least recently used one (keys[1]):
+    for _ in range(2):
+        assert curve.multi_scalar_multiply([(u1, curve.G), (u2, keys[2])], cacheable=(keys[2],)) == expected[2]
+    assert keys[2] in curve.point_cache and keys[0] in curve.point_cache and keys[1] not in curve.point_cache
+
+    # not cacheable points are never cached:
+    curve.multi_scalar_multiply([(u2, keys[1])])
+    curve.multi_scalar_multiply([(u2, keys[1])])
+    assert keys[1] not in curve.point_cache
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+
+Tests for the mempool (hash ordering, duplicates, per-sender limits, eviction and expiry).
+
+"""
+
+import random
+import pytest
+
+import sys
+from pathlib import Path
+parent_dir = Path.cwd().parent
+sys.path.append(str(parent_dir))
+sys.path.append(str(parent_dir / "app"))
+
+from app.blockchain.block import Transaction
+from app.engine.mempool import Mempool
+
+def transaction(sender="Alice", amount=1, r=1):
+    return Transaction(sender, "Bob", amount, signature=(r, 1)) # NOTE: only r is part of the key, the signatures aren't checked here
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+def test_take_block_in_hash_order():
+    pool = Mempool()
+    transactions = [transaction(amount=i) for i in range(50)]
+    for tx in transactions:
+        pool.add(tx)
+    expected = sorted(transactions, key=lambda tx: tx.replay_key())
+    assert list(pool) == expected
+    assert pool.preview(5) == expected[:5] and len(pool) == 50
+    assert pool.take_block(20) == expected[:20]
+    assert len(pool) == 30 and expected[0] not in pool
+    assert pool.take_block(100) == expected[20:]
+    assert pool.take_block(1) == []
+
+def test_duplicates_and_sender_limit():
+    pool = Mempool(max_per_sender=2)
+    pool.add(transaction(amount=1))
+    with pytest.raises(ValueError):
+        pool.add(transaction(amount=1))
+    pool.add(transaction(amount=1, r=2)) # the same payment with another signature
+    with pytest.raises(ValueError):
+        pool.add(transaction(amount=3))
+    pool.add(transaction(sender="Carol"))
+    assert pool.pending_of("Alice") == 2
+
+    assert pool.remove(transaction(amount=1))
+    assert not pool.remove(transaction(amount=1))
+    pool.add(transaction(amount=3))
+    assert pool.pending_of("Alice") == 2 and len(pool) == 3
+
+def test_eviction_and_expiry():
+    clock = Clock()
+    pool = Mempool(capacity=3, ttl=10, clock=clock)
+    transactions = [transaction(amount=i) for i in range(5)]
+    for tx in transactions[:3]:
+        pool.add(tx)
+        clock.now += 1
+    assert pool.add(transactions[3]) == [transactions[0]] # the oldest one
+
+    pool.remove(transactions[1])
+    pool.add(transactions[4])
+    clock.now = 12.5 # transactions[2] was added at 2
+    assert pool.expire() == [transactions[2]]
+    assert set(pool) == {transactions[3], transactions[4]}
+    clock.now = 100
+    assert sorted(pool.expire(), key=lambda tx: tx.amount) == transactions[3:]
+    assert len(pool) == 0 and pool.pending_of("Alice") == 0
+
+def test_matches_reference_model():
+    rng = random.Random(0)
+    pool, reference = Mempool(capacity=200), {}
+    transactions = [transaction(sender=f"user{i % 7}", amount=i) for i in range(500)]
+    for _ in range(5000):
+        tx = rng.choice(transactions)
+        operation = rng.random()
+        if operation < 0.6:
+            if tx.replay_key() in reference:
+                continue
+            for evicted in pool.add(tx):
+                del reference[evicted.replay_key()]
+            reference[tx.replay_key()] = tx
+        elif operation < 0.9:
+            assert pool.remove(tx) == (reference.pop(tx.replay_key(), None) is not None)
+        else:
+            n = rng.randrange(10)
+            taken = pool.take_block(n)
+            assert taken == [reference.pop(key) for key in sorted(reference)[:n]]
+        assert len(pool) == len(reference) <= 200
+        assert pool.preview(5) == [reference[key] for key in sorted(reference)[:5]]
+    assert list(pool) == [reference[key] for key in sorted(reference)]
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+
+Tests for the Merkle tree and the versioned block hashing.
+
+"""
+
+import pytest
+import hashlib
+
+import sys
+from pathlib import Path
+parent_dir = Path.cwd().parent
+sys.path.append(str(parent_dir))
+sys.path.append(str(parent_dir / "app"))
+
+from app.blockchain.merkle import MerkleTree
+from app.blockchain.block import Block, Transaction, BLOCK_VERSION_LEGACY, BLOCK_VERSION_MERKLE
+from app.models.mining_criterion import MiningCriterion
+
+# Block 1 of the stored chain, saved before the block versioning (no version field)
+LEGACY_BLOCK = {
+    "id": "1fd45452-11c0-482d-b307-6cc2d0401d10",
+    "previous_hash": "61d759f67e094c55c8f2386d0571a683e0071195afdf53050f8b2549c76cfb32",
+    "hash": "000f0af57cd2ec295b0089e35c8c0d17ddd0519b1593865f26b21240b40fba68",
+    "timestamp": "1744044616.879765",
+    "finalized": True,
+    "nonce": 5,
+    "transactions": [{"sender": "hakmak", "receiver": "hakmak", "amount": 100, "signature": [
+        51252951712518678603055421739236852615798431899963746910894549228160296251385,
+        87111185780649117996124570611605783611167445616891740006911915074199775896876
+    ]}],
+    "criterion": {"type": "leading_zeros", "difficulty": 3}
+}
+
+def make_leaves(n):
+    return [hashlib.sha256(str(i).encode()).digest() for i in range(n)]
+
+def reference_root(leaves):
+    """Straightforward recursive definition of the root."""
+    if not leaves:
+        return hashlib.sha256(b"").digest()
+    level = [hashlib.sha256(b"\x00" + leaf).digest() for leaf in leaves]
+    while len(level) > 1:
+        parents = [hashlib.sha256(b"\x01" + level[i] + level[i+1]).digest() for i in range(0, len(level) - 1, 2)]
+        if len(level) % 2 == 1:
+            parents.append(level[-1])
+        level = parents
+    return level[0]
+
+@pytest.mark.parametrize("n", [0, 1, 2, 3, 5, 8, 33, 100])
+def test_root_matches_reference(n):
+    leaves = make_leaves(n)
+    assert MerkleTree(leaves).root == reference_root(leaves)
+
+@pytest.mark.parametrize("n", [1, 2, 3, 7, 16, 45])
+def test_every_proof_verifies(n):
+    leaves = make_leaves(n)
+    tree = MerkleTree(leaves)
+    for i, leaf in enumerate(leaves):
+        proof = tree.proof(i)
+        assert len(proof) <= max(1, (n - 1).bit_length())
+        assert MerkleTree.verify_proof(leaf, proof, tree.root_hex)
+
+def test_tampered_proof_fails():
+    leaves = make_leaves(10)
+    tree = MerkleTree(leaves)
+    proof = tree.proof(3)
+    assert not MerkleTree.verify_proof(leaves[4], proof, tree.root_hex)
+    sibling, side = proof[0]
+    flipped = [(sibling, "left" if side == "right" else "right")] + proof[1:]
+    assert not MerkleTree.verify_proof(leaves[3], flipped, tree.root_hex)
+    with pytest.raises(IndexError):
+        tree.proof(10)
+
+def test_odd_node_is_not_duplicated():
+    """Duplicating the last leaf must change the root (no CVE-2012-2459 style collision)."""
+    leaves = make_leaves(3)
+    assert MerkleTree(leaves).root != MerkleTree(leaves + leaves[-1:]).root
+
+def test_legacy_block_still_validates():
+    block = Block.load_from_dict(LEGACY_BLOCK)
+    assert block.version == BLOCK_VERSION_LEGACY
+    assert block.hash == LEGACY_BLOCK["hash"]
+
+def test_merkle_block_hash():
+    transactions = [Transaction("Alice", "Bob", i) for i in range(5)]
+    block = Block("1", "0" * 64, transactions, MiningCriterion(type="leading_zeros", difficulty=1), timestamp="1", version=BLOCK_VERSION_MERKLE)
+    expected_root = MerkleTree([tx.hash_transaction().to_bytes(32, "big") for tx in transactions]).root_hex
+    assert block.merkle_root == expected_root
+    assert block.hash == hashlib.sha256(f"{'0' * 64}1{expected_root}0".encode()).hexdigest()
+    proof = block.transaction_proof(2)
+    assert MerkleTree.verify_proof(transactions[2].hash_transaction().to_bytes(32, "big"), proof, block.merkle_root)
+
+    reloaded = Block.load_from_dict(block.json_serialize())
+    assert reloaded.version == BLOCK_VERSION_MERKLE
+    assert reloaded.hash == block.hash
+
+def test_merkle_tree_built_once():
+    transactions = [Transaction("Alice", "Bob", i) for i in range(5)]
+    block = Block("1", "0" * 64, transactions, MiningCriterion(type="leading_zeros", difficulty=1), timestamp="1", version=BLOCK_VERSION_MERKLE)
+    tree = block.merkle_tree
+    block.nonce = 5
+    block.json_serialize()
+    assert block.merkle_tree is tree
+
+    block.data = transactions[:3]
+    assert block.merkle_tree is not tree
+    assert block.merkle_root == MerkleTree([tx.hash_transaction().to_bytes(32, "big") for tx in transactions[:3]]).root_hex
+    assert block.hash == hashlib.sha256(f"{'0' * 64}1{block.merkle_root}5".encode()).hexdigest()
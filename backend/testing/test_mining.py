@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+
+Tests for the Proof-of-Work nonce search.
+
+"""
+
+import pytest
+
+import sys
+from pathlib import Path
+parent_dir = Path.cwd().parent
+sys.path.append(str(parent_dir))
+sys.path.append(str(parent_dir / "app"))
+
+from app.blockchain.block import Block, Transaction
+from app.blockchain.mining import BlockMiner, ParallelMiner
+from app.models.mining_criterion import MiningCriterion
+
+criterion = MiningCriterion(type="leading_zeros", difficulty=2)
+
+def make_block(n_transactions: int) -> Block:
+    transactions = [Transaction(f"user{i}", f"user{i+1}", i) for i in range(n_transactions)]
+    return Block(index=1, previous_hash="ab" * 32, data=transactions, criterion=criterion, timestamp="1744038097.574308")
+
+@pytest.mark.parametrize("n_transactions", [0, 1, 3, 20])
+def test_midstate_hash_matches_block_hash(n_transactions):
+    block = make_block(n_transactions)
+    miner = BlockMiner(block)
+    for nonce in [0, 1, 9, 10, 12345, 10**12]:
+        block.nonce = nonce
+        assert miner.hash_for_nonce(nonce) == block.compute_hash()
+
+def test_search_finds_first_valid_nonce():
+    block = make_block(5)
+    nonce, block_hash = BlockMiner(block).search(criterion.check)
+
+    # brute force with the block's own hashing:
+    first = next(n for n in range(nonce + 1) if criterion.check(Block(1, block.previous_hash, block.data, criterion, block.timestamp, n).hash))
+    assert nonce == first
+    block.nonce = nonce
+    assert block.hash == block_hash
+
+def test_search_respects_max_iterations():
+    block = make_block(1)
+    assert BlockMiner(block).search(lambda h: False, max_iterations=10) is None
+
+def test_block_mine():
+    block = make_block(2)
+    block_hash = block.mine(criterion.check, max_iterations=100000)
+    assert block_hash is not None and criterion.check(block_hash)
+    assert block.hash == block.compute_hash() == block_hash
+    assert block.finalized
+
+
+# Parallel miner:
+@pytest.fixture(scope="module")
+def parallel_miner():
+    with ParallelMiner(workers=2, chunk_size=64) as miner:
+        yield miner
+
+def test_parallel_matches_serial(parallel_miner):
+    block = make_block(3)
+    serial_criterion = MiningCriterion(type="leading_zeros", difficulty=3)
+    expected = BlockMiner(block).search(serial_criterion.check)
+
+    result = parallel_miner.mine(block, serial_criterion)
+    assert (result.nonce, result.hash) == expected
+    assert result.attempts >= result.nonce + 1
+    assert result.hashes_per_second > 0
+
+def test_parallel_start_nonce(parallel_miner):
+    block = make_block(1)
+    first = BlockMiner(block).search(criterion.check)[0]
+    expected = BlockMiner(block).search(criterion.check, start_nonce=first + 1)
+
+    result = parallel_miner.mine(block, criterion, start_nonce=first + 1)
+    assert (result.nonce, result.hash) == expected
+
+def test_parallel_budget(parallel_miner):
+    block = make_block(1)
+    impossible = MiningCriterion(type="leading_zeros", difficulty=64)
+
+    result = parallel_miner.mine(block, impossible, max_iterations=300)
+    assert result.nonce is None and result.attempts == 300
+
+    result = parallel_miner.mine(block, impossible, timeout=0.5)
+    assert result.nonce is None and result.elapsed < 5
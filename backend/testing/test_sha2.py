@@ -7,13 +7,15 @@ Tests for the manual implementation of the SHA-256 hashing algorithm.
 """
 
 import hashlib
+import pytest
 
 import sys
 from pathlib import Path
 parent_dir = Path.cwd().parent
 sys.path.append(str(parent_dir))
 
-from app.blockchain.hashing.sha2 import SHA256
+from app.blockchain.hashing import sha2
+from app.blockchain.hashing.sha2 import SHA256, SHA256Hasher
 
 # ✅ Function to compare our SHA-256 against Python's hashlib
 def reference_sha256(message: str) -> str:
@@ -48,4 +50,56 @@ def test_symbols():
 
 def test_unicode():
     text = "こんにちは世界"  # "Hello World" in Japanese
-    assert SHA256.digest(text) == reference_sha256(text)
\ No newline at end of file
+    assert SHA256.digest(text) == reference_sha256(text)
+
+# ✅ Bytes path, around the padding boundaries (55/56 bytes fit/overflow the length field, 64 is a full block)
+@pytest.mark.parametrize("length", [0, 1, 55, 56, 63, 64, 65, 119, 120, 128, 1000])
+def test_digest_bytes(length):
+    data = bytes(i % 251 for i in range(length))
+    assert SHA256.digest_bytes(data) == hashlib.sha256(data).digest()
+    assert SHA256.hexdigest(data) == hashlib.sha256(data).hexdigest()
+
+def test_digest_memoryview():
+    data = b"The quick brown fox jumps over the lazy dog" * 3
+    assert SHA256.hexdigest(memoryview(data)) == hashlib.sha256(data).hexdigest()
+
+def test_binary_string_reference():
+    text = "SHA-256 is a cryptographic hash function that produces a fixed-size hash output."
+    assert SHA256.digest_binary_string(text) == SHA256.digest(text)
+
+
+# ✅ Incremental hasher
+@pytest.mark.parametrize("chunk_size", [1, 7, 63, 64, 65, 200])
+def test_hasher_chunked_updates(chunk_size):
+    data = bytes(i % 256 for i in range(1000))
+    hasher = SHA256Hasher()
+    for i in range(0, len(data), chunk_size):
+        hasher.update(data[i:i+chunk_size])
+    assert hasher.hexdigest() == hashlib.sha256(data).hexdigest()
+
+def test_hasher_copy_midstate():
+    prefix = b"previous_hash" * 10
+    midstate = SHA256Hasher(prefix)
+    for nonce in range(5):
+        clone = midstate.copy().update(str(nonce).encode())
+        assert clone.hexdigest() == hashlib.sha256(prefix + str(nonce).encode()).hexdigest()
+    # the midstate itself is untouched, and digest() can be called repeatedly:
+    assert midstate.digest() == hashlib.sha256(prefix).digest()
+    assert midstate.digest() == hashlib.sha256(prefix).digest()
+
+
+# ✅ Batch hashing
+def test_digest_many():
+    messages = [f"message {i}" * (i % 20) for i in range(500)] + ["", "こんにちは世界", b"raw bytes"]
+    expected = [reference_sha256(m) if isinstance(m, str) else hashlib.sha256(m).hexdigest() for m in messages]
+    assert SHA256.digest_many(messages) == expected
+
+def test_hexdigest_many_midstate():
+    prefix = b"x" * 150
+    suffixes = [str(nonce).encode() for nonce in range(200)]
+    assert SHA256Hasher(prefix).hexdigest_many(suffixes) == [hashlib.sha256(prefix + s).hexdigest() for s in suffixes]
+
+def test_digest_many_without_numpy(monkeypatch):
+    monkeypatch.setattr(sha2, "np", None)
+    messages = ["a" * i for i in range(100)]
+    assert SHA256.digest_many(messages) == [reference_sha256(m) for m in messages]
@@ -46,4 +46,71 @@ def test_invalid_signature():
     tx = Transaction("Alice", "Bob", 42)
     tx.sign(priv1, secp256k1)
 
-    assert not tx.verify(pub2, secp256k1), "Verification should fail with a different public key"
\ No newline at end of file
+    assert not tx.verify(pub2, secp256k1), "Verification should fail with a different public key"
+
+# Batch verification:
+def make_signed_transactions(n_transactions: int, n_senders: int):
+    keys = [random.randint(1, secp256k1.n - 1) for _ in range(n_senders)]
+    public = [secp256k1.scalar_multiply(k, secp256k1.G) for k in keys]
+    transactions, public_keys = [], []
+    for i in range(n_transactions):
+        tx = Transaction(f"sender{i % n_senders}", "Bob", i)
+        tx.sign(keys[i % n_senders], secp256k1)
+        transactions.append(tx)
+        public_keys.append(public[i % n_senders])
+    return transactions, public_keys
+
+def test_signature_has_even_r():
+    transactions, public_keys = make_signed_transactions(5, 1)
+    for tx, public_key in zip(transactions, public_keys):
+        r, s = tx.signature
+        s_inv = pow(s, -1, secp256k1.n)
+        h = tx.hash_transaction() % secp256k1.n
+        R = secp256k1.multi_scalar_multiply([(h * s_inv, secp256k1.G), (r * s_inv, public_key)])
+        assert R[1] % 2 == 0 and R == secp256k1.recover_point(r)
+
+@pytest.mark.parametrize("n_transactions, n_senders", [(1, 1), (10, 10), (25, 3)])
+def test_verify_batch_valid(n_transactions, n_senders):
+    transactions, public_keys = make_signed_transactions(n_transactions, n_senders)
+    assert Transaction.verify_batch(transactions, public_keys, secp256k1) == [True] * n_transactions
+
+def test_verify_batch_locates_invalid():
+    transactions, public_keys = make_signed_transactions(20, 4)
+    bad = {3, 11, 12}
+    for i in bad:
+        r, s = transactions[i].signature
+        transactions[i].signature = (r, (s + 1) % secp256k1.n)
+    public_keys[19] = None # unknown sender
+    expected = [i not in bad and i != 19 for i in range(20)]
+    assert Transaction.verify_batch(transactions, public_keys, secp256k1) == expected
+
+def test_verify_batch_other_r_parity():
+    """(r, n - s) is still a valid signature, it only falls back to the single verification."""
+    transactions, public_keys = make_signed_transactions(8, 2)
+    for tx in transactions[::2]:
+        r, s = tx.signature
+        tx.signature = (r, secp256k1.n - s)
+    assert all(tx.verify(pk, secp256k1) for tx, pk in zip(transactions, public_keys))
+    assert Transaction.verify_batch(transactions, public_keys, secp256k1) == [True] * 8
+
+
+# Cached canonical serialization and hash:
+def test_hash_is_cached_and_invalidated():
+    tx = Transaction("Alice", "Bob", 10)
+    h = tx.hash_transaction()
+    assert tx.canonical_json() == '{"amount":10,"receiver":"Bob","sender":"Alice"}'
+    assert tx.hash_transaction() is h
+
+    tx.signature = (1, 2) # not hashed
+    assert tx.hash_transaction() is h
+
+    tx.amount = 11
+    assert tx.hash_transaction() != h
+    assert tx.hash_transaction() == Transaction("Alice", "Bob", 11).hash_transaction()
+    tx.amount = 10
+    assert tx.hash_transaction() == h
+
+def test_transaction_slots():
+    tx = Transaction("Alice", "Bob", 10)
+    with pytest.raises(AttributeError):
+        tx.extra_field = 1
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+
+Tests for the user registry of the engine (public key index, listing).
+
+"""
+
+import pytest
+
+import sys
+from pathlib import Path
+parent_dir = Path.cwd().parent
+sys.path.append(str(parent_dir))
+sys.path.append(str(parent_dir / "app"))
+
+from app.blockchain.blockchain import Blockchain
+from app.engine.engine import Engine
+from app.models.mining_criterion import MiningCriterion
+from app.models.user import User
+from app.configs import logger
+
+@pytest.fixture
+def engine():
+    engine = Engine(Blockchain(criterion=MiningCriterion(type="leading_zeros", difficulty=0)), logger)
+    for i in range(10):
+        engine.add_user(User(username=f"user{i}", public_key=(i, i + 1)))
+    return engine
+
+def test_lookup_by_public_key(engine):
+    assert engine.get_user((3, 4)).username == "user3"
+    assert engine.get_user([3, 4]).username == "user3" # as sent in JSON
+    with pytest.raises(ValueError):
+        engine.get_user((4, 4))
+
+def test_index_kept_in_sync(engine):
+    with pytest.raises(ValueError):
+        engine.add_user(User(username="someone", public_key=(3, 4))) # key already registered
+    with pytest.raises(ValueError):
+        engine.add_user(User(username="user3", public_key=(100, 100))) # name already taken
+    assert len(engine.users_by_key) == len(engine.current_users) == 10
+
+    engine.remove_user(engine.current_users["user3"])
+    with pytest.raises(ValueError):
+        engine.get_user((3, 4))
+    engine.add_user(User(username="someone", public_key=(3, 4)))
+    assert engine.get_user((3, 4)).username == "someone"
+    assert engine.usernames == [f"user{i}" for i in range(10) if i != 3] + ["someone"]
+
+def test_list_users(engine):
+    assert [user.username for user in engine.list_users(0, 3)] == ["user0", "user1", "user2"]
+    assert [user.username for user in engine.list_users(8, 5)] == ["user8", "user9"]
+    assert engine.list_users(10, 5) == []
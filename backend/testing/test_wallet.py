@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+
+Tests for the balance ledger.
+
+"""
+
+import pytest
+import json
+
+import sys
+from pathlib import Path
+parent_dir = Path.cwd().parent
+sys.path.append(str(parent_dir))
+sys.path.append(str(parent_dir / "app"))
+
+from app.blockchain.block import Block, Transaction
+from app.blockchain.blockchain import Blockchain
+from app.blockchain.digital_signature.ecc import secp256k1
+from app.models.mining_criterion import MiningCriterion
+from app.models.wallet import Ledger
+
+criterion = MiningCriterion(type="leading_zeros", difficulty=0)
+
+def signed(sender, receiver, amount):
+    tx = Transaction(sender, receiver, amount)
+    tx.sign(777, secp256k1)
+    return tx
+
+def build_chain(n_blocks: int) -> Blockchain:
+    chain = Blockchain(criterion=criterion)
+    for i in range(1, n_blocks + 1):
+        transactions = [signed("Alice", "Bob", i), signed("Bob", "Carol", 1)]
+        block = Block(index=i, previous_hash=chain.chain[-1].hash, data=transactions, criterion=criterion, timestamp=str(i))
+        assert chain.add_block(block)
+    return chain
+
+def expected_balances(n_blocks: int) -> dict:
+    paid = n_blocks * (n_blocks + 1) // 2
+    return {"Alice": -paid, "Bob": paid - n_blocks, "Carol": n_blocks}
+
+def test_pending_and_confirmed():
+    ledger = Ledger()
+    ledger.apply_block(0, "genesis", [])
+    tx = signed("Alice", "Bob", 30)
+    ledger.add_pending(tx)
+    assert (ledger.balance("Alice"), ledger.pending_delta("Alice"), ledger.available("Bob")) == (0, -30, 30)
+
+    ledger.apply_block(1, "block1", [tx, signed("Carol", "Alice", 5)])
+    assert ledger.balance("Alice") == -25 and ledger.balance("Bob") == 30
+    assert ledger.pending == {}
+    with pytest.raises(ValueError):
+        ledger.apply_block(5, "block5", [])
+
+def test_restore_from_snapshot(tmp_path):
+    chain = build_chain(12)
+    snapshot = tmp_path / "ledger.json"
+    ledger = Ledger(snapshot_path=snapshot, snapshot_every=5)
+    ledger.restore(chain)
+    assert ledger.height == 13
+    assert {user: ledger.balance(user) for user in ["Alice", "Bob", "Carol"]} == expected_balances(12)
+
+    restored = Ledger(snapshot_path=snapshot, snapshot_every=5)
+    restored.restore(chain)
+    assert restored.balances == ledger.balances and restored.height == 13
+
+def test_snapshot_of_another_chain_is_ignored(tmp_path):
+    snapshot = tmp_path / "ledger.json"
+    snapshot.write_text(json.dumps({"height": 2, "block_hash": "ab" * 32, "balances": {"Alice": 1000}}))
+    ledger = Ledger(snapshot_path=snapshot, snapshot_every=100)
+    ledger.restore(build_chain(4))
+    assert {user: ledger.balance(user) for user in ["Alice", "Bob", "Carol"]} == expected_balances(4)
@@ -3,7 +3,7 @@
 * Inventory module
 =======================================================================
 
-* Queries the backend for the current state of the blockchain and gathers the owned coins.
+* Queries the backend for the balance (owned coins) of the user.
 
 */
 
@@ -15,48 +15,27 @@ import styles from "./Inventory.module.css";
 
 export const Inventory = () => {
     const { user } = useUser();
-    const [blockchainState, setBlockchainState] = useState<any>(null);
+    const [balanceState, setBalanceState] = useState<any>(null);
     const [inventory, setInventory] = useState<number>(0);
 
-    const retrieveBlockchainState = async () => {
+    const retrieveBalance = async (user: User) => {
         try {
-            const response = await axios.get("/api/blockchain");
-            const blockchainState = response.data.blockchain;
-            setBlockchainState(blockchainState);
-            console.log("Blockchain state:", blockchainState);
-            return blockchainState;
+            // Served by the ledger of the backend, no need to walk the chain:
+            const response = await axios.get(`/api/balance/${encodeURIComponent(user.username)}`);
+            console.log("Balance:", response.data);
+            return response.data;
         } catch (error) {
-            console.error("Error retrieving blockchain state:", error);
+            console.error("Error retrieving the balance:", error);
         }
     }
 
-    const getInventory = (user: User, state: any) => {
-        //if (!blockchainState) return null;
-        let inventory: number = 0;
-
-        // Iterate over the blocks and transactions to calculate the inventory:
-        for (const block of state.blocks) {
-            for (const transaction of block.transactions) {
-                if (transaction.sender === user.username) {
-                    inventory -= transaction.amount;
-                    //console.log("Subtracting from:", user.username, "amount:", transaction.amount);
-                }
-                if (transaction.receiver === user.username) {
-                    //console.log("Adding to:", user.username, "amount:", transaction.amount);
-                    inventory += transaction.amount;
-                }
-            }
-        }
-        console.log("Inventory:", inventory);
-        setInventory(inventory);
-        return inventory;
-    }
-
     const refreshInventory = async () => {
-        const state = await retrieveBlockchainState();
         console.log("User:", user?.username);
-        if (!user || !state) return;
-        getInventory(user, state);
+        if (!user) return;
+        const balance = await retrieveBalance(user);
+        if (!balance) return;
+        setBalanceState(balance);
+        setInventory(balance.balance);
     }
 
     useEffect(() => {
@@ -68,7 +47,7 @@ export const Inventory = () => {
     // Return the inventory information:
     return (
         <div className={styles.inventoryContainer}>
-            {blockchainState ? (
+            {balanceState ? (
                 <p className={styles.inventoryText}>🪙 {inventory} coins</p>
             ) : (
                 <p className={styles.inventoryText}>Loading...</p>
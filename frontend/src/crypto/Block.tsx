@@ -56,6 +56,8 @@ export class Block {
         public criterion: MiningCriterion,
         public timestamp: string,
         public nonce: string,
+        public version: number = 1,
+        public merkleRoot: string = "",
     ) {
         // Required for proper serialization
         this.index = index;
@@ -64,9 +66,16 @@ export class Block {
         this.criterion = criterion;
         this.timestamp = timestamp;
         this.nonce = nonce;
+        this.version = version;
+        this.merkleRoot = merkleRoot;
     }
 
     computeHash(): string {
+        // Version 2 blocks commit to the transactions through the merkle root (computed by the backend)
+        if (this.version === 2) {
+            return SHA256(`${this.previousHash}${this.timestamp}${this.merkleRoot}${this.nonce}`).toString();
+        }
+
         const txHashes = this.data
             .map((tx) => BigInt("0x" + tx.hash()).toString(16)) // hex string
             .map((hex) => hex.replace(/^0x/, "")) // just in case
@@ -102,7 +111,9 @@ export class Block {
             transactions,
             criterion,
             blockJson.timestamp,
-            "0" // We'll update nonce when mining begins
+            "0", // We'll update nonce when mining begins
+            blockJson.version ?? 1,
+            blockJson.merkleRoot ?? ""
         );
     }
 
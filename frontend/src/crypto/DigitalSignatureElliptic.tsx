@@ -62,6 +62,11 @@ export const manualSign = (message: string, privateKey: string): [string, string
         const d = BigInt(privateKey); // private key as bigint
         s = (kInv * (h + d * r)) % BigInt(n.toString(10));
         if (s === 0n) continue;
+
+        // (r, n - s) belongs to -R, pick the signature with even R.y (mirrors the backend, needed for batch verification):
+        if (R.getY().isOdd()) {
+            s = BigInt(n.toString(10)) - s;
+        }
     }
 
     return [r.toString(), s.toString()];